@@ -6,3 +6,7 @@ import yaml
 
 class AttendanceConfig(AppConfig):
     name = 'attendance'
+
+    def ready(self):
+        from .garden_config import install_reload_signal
+        install_reload_signal()
@@ -0,0 +1,154 @@
+"""
+ASGI 용 비동기 Garden
+조회는 asyncpg 풀로 해서 한 이벤트 루프에서 여러 요청을 동시에 처리한다.
+PostgreSQL 저장소가 아니면(sqlite, replica) 동기 Garden 의 조회를 스레드에서 실행한다.
+수집은 views.collect 와 같은 작업 큐(jobs.py)에서 동기 Garden 으로 한다.
+"""
+import asyncio
+from datetime import timedelta
+
+import asyncpg
+from asgiref.sync import sync_to_async
+
+from .garden import get_attendance_date, get_message_window
+from .garden_config import get_garden
+from .postgres_storage import ATTENDANCE_BY_USER_QUERY, ATTENDANCE_DAYS_QUERY, FETCH_SIZE, PostgresStorage
+
+# 이벤트 루프별 asyncpg 풀. 풀은 만든 루프에서만 쓸 수 있음
+_pools = {}
+
+
+async def get_async_pool(garden):
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = await asyncpg.create_pool(
+            host=garden.pg_host,
+            port=int(garden.pg_port),
+            database=garden.pg_database,
+            user=garden.pg_user,
+            password=garden.pg_password,
+            ssl=garden.pg_sslmode,
+            min_size=garden.pg_pool_min,
+            max_size=garden.pg_pool_max,
+            # 스키마는 커넥션마다 한번만 설정
+            server_settings={'search_path': garden.pg_schema},
+            # Supabase pooler(pgbouncer transaction mode)에서는 prepared statement 캐시를 쓸 수 없음
+            statement_cache_size=0,
+        )
+        _pools[loop] = pool
+    return pool
+
+
+def to_asyncpg_query(query, names):
+    """postgres_storage.py 의 쿼리를 같이 쓰도록 psycopg2 의 %(name)s 파라미터를 asyncpg 의 $1, $2 ... 로"""
+    for idx, name in enumerate(names, start=1):
+        query = query.replace(f"%({name})s", f"${idx}")
+    return query
+
+
+ATTENDANCE_BY_USER_ASYNC_QUERY = to_asyncpg_query(ATTENDANCE_BY_USER_QUERY, ("user", "start", "end"))
+ATTENDANCE_DAYS_ASYNC_QUERY = to_asyncpg_query(ATTENDANCE_DAYS_QUERY, ("user", "from", "to", "limit"))
+
+
+class AsyncGarden:
+    def __init__(self, garden=None):
+        """
+        @param garden 설정에 쓸 동기 Garden. 없으면 공유 Garden
+        """
+        self.garden = garden or get_garden()
+        # asyncpg 는 조회를 PostgreSQL 에서 하는 경우에만
+        self.use_asyncpg = isinstance(self.garden.storage, PostgresStorage)
+
+    async def find_attendance_by_user(self, user, from_date=None, to_date=None):
+        """Garden.find_attendance_by_user 와 같은 결과 {date: [{"ts", "message"}]}"""
+        if not self.use_asyncpg:
+            return await asyncio.to_thread(self.garden.find_attendance_by_user, user, from_date, to_date)
+
+        return {attendance_date: attends
+                async for attendance_date, attends in self.iter_attendance_by_user(user, from_date, to_date)}
+
+    async def iter_attendance_by_user(self, user, from_date=None, to_date=None):
+        """Garden.iter_attendance_by_user 와 같은 결과. (date, [{"ts", "message"}]) async generator"""
+        if not self.use_asyncpg:
+            # SQLite 연결은 스레드별이므로 만들고 읽는 것을 모두 같은 스레드에서
+            days = await sync_to_async(self.garden.iter_attendance_by_user)(user, from_date, to_date)
+            try:
+                while (day := await sync_to_async(next)(days, None)) is not None:
+                    yield day
+            finally:
+                await sync_to_async(days.close)()
+            return
+
+        window_start, window_end = get_message_window(from_date, to_date)
+        attended_dates = set()
+        pool = await get_async_pool(self.garden)
+
+        async with pool.acquire() as conn:
+            if from_date:
+                # from_date 0시 ~ 4시 커밋이 전날 출석인지는 전날이 그 전에 출석했는지에 달림
+                day_before = from_date - timedelta(days=1)
+                if await conn.fetchval("SELECT 1 FROM attendance"
+                                       " WHERE author_name = $1 AND attendance_date = $2 AND first_ts < $3",
+                                       user, day_before, window_start):
+                    attended_dates.add(day_before)
+
+            # garden.group_attendance_by_date 와 같은 규칙. 같은 날짜의 메시지는 연달아 나옴
+            current_date, attends = None, []
+            async with conn.transaction():
+                async for record in conn.cursor(ATTENDANCE_BY_USER_ASYNC_QUERY, user, window_start, window_end,
+                                                prefetch=FETCH_SIZE):
+                    ts_datetime = record['ts_for_db']
+                    attendance_date = get_attendance_date(ts_datetime, self.garden.start_date, attended_dates)
+                    attended_dates.add(attendance_date)
+
+                    if attendance_date != current_date:
+                        if attends:
+                            yield current_date, attends
+                        current_date, attends = attendance_date, []
+
+                    if (from_date and attendance_date < from_date) or (to_date and attendance_date > to_date):
+                        continue
+                    attends.append({"ts": ts_datetime, "message": list(record['commits'])})
+
+            if attends:
+                yield current_date, attends
+
+    async def find_attendance_days(self, user, from_date=None, to_date=None, limit=None):
+        """Garden.find_attendance_days 와 같은 결과 [(date, first_ts)]"""
+        if not self.use_asyncpg:
+            return await asyncio.to_thread(self.garden.find_attendance_days, user, from_date, to_date, limit)
+
+        pool = await get_async_pool(self.garden)
+        rows = await pool.fetch(ATTENDANCE_DAYS_ASYNC_QUERY, user, from_date, to_date, limit)
+        return [(row['attendance_date'], row['first_ts']) for row in rows]
+
+    async def find_first_attendances(self, users=None):
+        """Garden.find_first_attendances 와 같은 결과 {user: {date: first_ts}}"""
+        users = list(users if users is not None else self.garden.users)
+        if not self.use_asyncpg:
+            return await asyncio.to_thread(self.garden.find_first_attendances, users)
+
+        pool = await get_async_pool(self.garden)
+
+        result = {user: {} for user in users}
+        rows = await pool.fetch("""
+            SELECT author_name, attendance_date, first_ts
+            FROM attendance
+            WHERE author_name = ANY($1::text[])
+            ORDER BY author_name, attendance_date
+        """, users)
+        for row in rows:
+            result[row['author_name']][row['attendance_date']] = row['first_ts']
+
+        return result
+
+    async def get_attendance(self, selected_date):
+        if not self.use_asyncpg:
+            return await asyncio.to_thread(self.garden.get_attendance, selected_date)
+
+        pool = await get_async_pool(self.garden)
+        rows = await pool.fetch("SELECT author_name, first_ts FROM attendance WHERE attendance_date = $1",
+                                selected_date)
+        first_ts_by_user = {row['author_name']: row['first_ts'] for row in rows}
+        return [{"user": user, "first_ts": first_ts_by_user.get(user)} for user in self.garden.users]
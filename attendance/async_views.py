@@ -0,0 +1,106 @@
+"""
+ASGI 용 비동기 API
+uvicorn garden5.asgi:application 으로 띄웠을 때 DB/Slack 응답을 기다리는 동안 다른 요청을 처리한다.
+응답은 views.py 의 같은 이름의 API 와 같음
+"""
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+
+from . import jobs
+from .async_garden import AsyncGarden
+from .garden_config import get_garden
+from .http_cache import cached_api
+from .views import (calendar_response, commits_response, paginate_days, parse_user_api_params, render_commits,
+                    wants_stream, with_next_link)
+
+
+async def aiter_json_array(rows, to_item):
+    """views.iter_json_array 의 async 버전. rows 는 async generator"""
+    encoder = DjangoJSONEncoder()
+    try:
+        yield "["
+        idx = 0
+        async for row in rows:
+            yield (", " if idx else "") + encoder.encode(to_item(*row))
+            idx += 1
+        yield "]"
+    finally:
+        await rows.aclose()
+
+
+# 유저의 출석데이터. 파라미터와 응답은 views.user_api 와 같음
+@cached_api
+async def user_api(request, user):
+    garden = AsyncGarden()
+
+    try:
+        from_date, to_date, limit = parse_user_api_params(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    next_link = None
+    days = None
+    if limit:
+        days, next_link = paginate_days(request, await garden.find_attendance_days(user, from_date, to_date, limit + 1),
+                                        limit)
+
+    if request.GET.get("calendar") == "1":
+        if days is None:
+            days = await garden.find_attendance_days(user, from_date, to_date)
+        return with_next_link(calendar_response(days), next_link)
+
+    if days is not None:
+        if not days:
+            return JsonResponse([], safe=False)
+        from_date, to_date = days[0][0], days[-1][0]
+
+    if wants_stream(request):
+        response = StreamingHttpResponse(
+            aiter_json_array(garden.iter_attendance_by_user(user, from_date, to_date), render_commits),
+            content_type="application/json")
+    else:
+        response = commits_response(await garden.find_attendance_by_user(user, from_date, to_date))
+
+    return with_next_link(response, next_link)
+
+
+# slack_messages 수집. views.collect 와 같은 작업 큐에 등록하고 바로 응답
+async def collect(request):
+    oldest = datetime.strptime(request.GET.get('start'), "%Y-%m-%d").timestamp()
+    latest = datetime.strptime(request.GET.get('end'), "%Y-%m-%d").timestamp()
+
+    garden = get_garden()
+    job, created = jobs.submit_collect(garden.collect_slack_messages, oldest, latest)
+
+    result = job.to_dict()
+    result["created"] = created
+    return JsonResponse(result, status=202)
+
+
+# 특정일의 출석 데이터 불러오기
+@cached_api
+async def get(request, date):
+    garden = AsyncGarden()
+    result = await garden.get_attendance(datetime.strptime(date, "%Y%m%d").date())
+    return JsonResponse(result, safe=False)
+
+
+# 전체 출석부 조회
+@cached_api
+async def gets(request):
+    garden = AsyncGarden()
+
+    result = []
+
+    users = garden.garden.get_member()
+    attend_dict = await garden.find_first_attendances(users)
+    for user in users:
+        attendances = {}
+        for (key_date, first_ts) in attend_dict[user].items():
+            attendances[key_date.strftime("%Y-%m-%d")] = first_ts
+
+        result.append({"user": user, "attendances": attendances})
+
+    return JsonResponse(result, safe=False)
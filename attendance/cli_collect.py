@@ -1,6 +1,17 @@
-from garden import Garden
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.garden import Garden
 from datetime import date, datetime, timedelta
 
+parser = argparse.ArgumentParser(description="slack_messages 수집")
+parser.add_argument("--incremental", action="store_true",
+                    help="마지막으로 수집한 메시지 이후만 수집 (처음 실행시에는 어제부터)")
+args = parser.parse_args()
+
 garden = Garden()
 
 today = datetime.today()
@@ -10,4 +21,9 @@ tomorrow = today + timedelta(days=1)
 oldest = yesterday.timestamp()
 latest = tomorrow.timestamp()
 
-garden.collect_slack_messages(oldest, latest)
\ No newline at end of file
+if args.incremental:
+    stats = garden.collect_new_slack_messages(oldest)
+    print(f"last_ts: {stats['last_ts']}")
+else:
+    stats = garden.collect_slack_messages(oldest, latest)
+print(f"pages: {stats['pages']}, inserted: {stats['inserted']}, skipped: {stats['skipped']}")
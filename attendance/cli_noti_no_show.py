@@ -1,6 +1,10 @@
-from garden import Garden
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.garden import Garden
 from datetime import date, datetime, timedelta
-import slack
 
 garden = Garden()
 
@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.garden import Garden
+
+garden = Garden()
+
+count = garden.rebuild_attendance()
+print(f"attendance rebuilt: {count} rows")
@@ -0,0 +1,56 @@
+"""
+저장해둔 Slack Events API payload 를 서명해서 로컬 서버에 다시 보냄
+Slack 없이 /attendance/slack/events 를 확인할 때 사용
+
+e.g.)
+python attendance/cli_replay_events.py events.json --url http://localhost:8000/attendance/slack/events
+events.json 은 payload 하나, payload 리스트, 또는 한 줄에 payload 하나씩(jsonl)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slack_sdk.signature import SignatureVerifier
+from attendance.garden_config import get_config
+
+
+def read_payloads(path):
+    with open(path) as file:
+        content = file.read()
+
+    try:
+        payloads = json.loads(content)
+    except json.JSONDecodeError:
+        # jsonl
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    return payloads if isinstance(payloads, list) else [payloads]
+
+
+parser = argparse.ArgumentParser(description="Slack Events API payload 재전송")
+parser.add_argument("path", help="payload json 파일")
+parser.add_argument("--url", default="http://localhost:8000/attendance/slack/events")
+parser.add_argument("--secret", default=None, help="기본값은 config.ini 의 SLACK_SIGNING_SECRET")
+args = parser.parse_args()
+
+verifier = SignatureVerifier(args.secret or get_config().slack_signing_secret)
+
+for payload in read_payloads(args.path):
+    body = json.dumps(payload)
+    timestamp = str(int(time.time()))
+    request = urllib.request.Request(args.url, data=body.encode("utf-8"), method="POST", headers={
+        "Content-Type": "application/json",
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": verifier.generate_signature(timestamp=timestamp, body=body),
+    })
+
+    started = time.monotonic()
+    with urllib.request.urlopen(request) as response:
+        elapsed = (time.monotonic() - started) * 1000
+        event = payload.get("event") or {}
+        print(f"{response.status} {elapsed:.1f}ms {payload.get('type')} {event.get('ts', '')}")
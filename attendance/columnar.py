@@ -0,0 +1,35 @@
+"""
+출석부 API 의 compact(columnar) 응답
+Accept: application/vnd.garden5.columnar+json 또는 ?format=columnar 로 요청하면
+유저별 {날짜: 시각} dict 대신 날짜 배열 + 유저별 비트셋/분 단위 시각 배열로 응답한다.
+orjson 이 설치되어 있으면 orjson 으로, 없으면 json 으로 직렬화한다.
+"""
+import json
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+COLUMNAR_CONTENT_TYPE = "application/vnd.garden5.columnar+json"
+
+
+def wants_columnar(request):
+    return (request.GET.get("format") == "columnar"
+            or COLUMNAR_CONTENT_TYPE in request.headers.get("Accept", ""))
+
+
+def dumps(data):
+    """@return bytes"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def columnar_response(data):
+    response = HttpResponse(dumps(data), content_type=COLUMNAR_CONTENT_TYPE)
+    patch_vary_headers(response, ("Accept",))
+    return response
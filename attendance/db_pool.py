@@ -0,0 +1,190 @@
+"""
+PostgreSQL 커넥션 풀
+프로세스 전체에서 하나의 풀을 공유해서 요청마다 TCP/TLS 연결을 새로 맺지 않도록 한다.
+"""
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeout(Exception):
+    """풀에서 커넥션을 빌리지 못함"""
+
+
+class ConnectionPool:
+    def __init__(self, min_size, max_size, schema, check_interval=30, timeout=30, **connect_kwargs):
+        """
+        @param min_size 유지할 최소 커넥션 수
+        @param max_size 최대 커넥션 수. 모두 사용 중이면 반납될 때까지 기다림
+        @param schema 커넥션 생성시 한번만 설정할 search_path
+        @param check_interval 이 시간(초) 이상 쉬었던 커넥션은 빌려주기 전에 SELECT 1 로 확인
+        @param timeout 커넥션을 기다리는 최대 시간(초)
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.schema = schema
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+
+        self._lock = threading.Condition()
+        self._idle = []  # [(conn, last_used)]
+        self._size = 0  # 열려 있는 커넥션 수 (idle + borrowed)
+
+        # 통계
+        self._borrowed = 0
+        self._borrow_count = 0
+        self._wait_count = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._health_check_failures = 0
+
+        for _ in range(min_size):
+            conn = self._connect()
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+                self._size += 1
+                self._created += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        # 스키마는 커넥션마다 한번만 설정. commit 해야 rollback 되어도 유지됨
+        cursor = conn.cursor()
+        cursor.execute(f"SET search_path TO {self.schema}")
+        cursor.close()
+        conn.commit()
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        started = time.monotonic()
+        waited = False
+
+        with self._lock:
+            while not self._idle and self._size >= self.max_size:
+                waited = True
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"no connection available within {self.timeout}s")
+                self._lock.wait(remaining)
+
+            if self._idle:
+                conn, last_used = self._idle.pop()
+            else:
+                conn, last_used = None, None
+                self._size += 1
+
+            self._borrowed += 1
+            self._borrow_count += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self._wait_count += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+
+        # 연결/헬스체크는 lock 밖에서. 통계만 lock 안에서 갱신
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._close_quietly(conn)
+                conn = None
+                with self._lock:
+                    self._health_check_failures += 1
+            if conn is None:
+                conn = self._connect()
+                with self._lock:
+                    self._created += 1
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._borrowed -= 1
+                self._lock.notify()
+            raise
+
+        return conn
+
+    def putconn(self, conn):
+        # 끝나지 않은 트랜잭션은 정리해서 반납
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._close_quietly(conn)
+
+        with self._lock:
+            self._borrowed -= 1
+            if conn.closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def closeall(self):
+        with self._lock:
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._size -= len(self._idle)
+            self._idle = []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "borrowed": self._borrowed,
+                "idle": len(self._idle),
+                "borrow_count": self._borrow_count,
+                "wait_count": self._wait_count,
+                "wait_time_total": round(self._wait_time_total, 6),
+                "wait_time_max": round(self._wait_time_max, 6),
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "health_check_failures": self._health_check_failures,
+            }
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(**kwargs):
+    """프로세스 공용 풀. 처음 호출할 때의 설정으로 생성됨"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**kwargs)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
@@ -1,75 +1,211 @@
-import configparser
-from datetime import date, timedelta, datetime
+from datetime import date, timedelta, datetime, time
+from functools import cached_property
 from slack_sdk import WebClient
-import psycopg2
-import psycopg2.extras
-import json
-import os
-import yaml
+from .garden_config import get_config
+from .matrix import AttendanceMatrix
+from .metrics import timed
+from .stats import get_season_dates
+
+
+# 증분 수집시 마지막 ts 보다 이만큼(초) 앞에서부터 다시 가져옴. 늦게 올라온 메시지 대비
+COLLECT_OVERLAP = 600
+
+
+def get_attendance_date(ts_datetime, start_date, attended_dates):
+    """
+    커밋 시각이 인정되는 출석일
+    새벽 4시 이전 커밋은 전날 출석이 아직 없으면 전날 출석으로 인정한다.
+    @param ts_datetime 커밋 시각 (KST)
+    @param start_date 출석 체크 시작일
+    @param attended_dates 지금까지 출석한 날짜들 (in 연산 지원)
+    """
+    # current date and date before day1
+    date = ts_datetime.date()
+    date_before_day1 = date - timedelta(days=1)
+    hour = ts_datetime.hour
+
+    # check before day1. if exists, before day1 is already done.
+    if date_before_day1 >= start_date and hour < 4 and date_before_day1 not in attended_dates:
+        return date_before_day1
+
+    return date
+
+
+def get_message_window(from_date=None, to_date=None):
+    """
+    출석일이 from_date ~ to_date 인 커밋이 있을 수 있는 메시지 시각 범위 [start, end)
+    to_date 다음날 새벽 4시 전 커밋은 to_date 출석일 수 있음. 없는 쪽은 None
+    """
+    start = datetime.combine(from_date, time.min) if from_date else None
+    end = datetime.combine(to_date + timedelta(days=1), time(4)) if to_date else None
+    return start, end
+
+
+def group_attendance_by_date(rows, start_date, attended_dates, from_date=None, to_date=None):
+    """
+    ts 순으로 정렬된 (ts_for_db, commits) 를 출석일별로 묶음
+    메시지는 ts 순이고 출석일도 ts 순으로 정해지므로 같은 날짜의 메시지는 연달아 나옴
+    @param attended_dates 이미 출석한 날짜 set. from_date 부터 조회하면 from_date 전날이 그 전에 출석했는지
+    @return (date, [{"ts", "message"}]) generator. from_date ~ to_date 밖의 날짜는 제외
+    """
+    current_date, attends = None, []
+    for ts_datetime, commits in rows:
+        attendance_date = get_attendance_date(ts_datetime, start_date, attended_dates)
+        attended_dates.add(attendance_date)
+
+        if attendance_date != current_date:
+            if attends:
+                yield current_date, attends
+            current_date, attends = attendance_date, []
+
+        if (from_date and attendance_date < from_date) or (to_date and attendance_date > to_date):
+            continue
+        attends.append({"ts": ts_datetime, "message": commits})
+
+    if attends:
+        yield current_date, attends
+
+
+def get_ts_for_db(ts):
+    """Slack 타임스탬프를 datetime으로 변환하고 KST로 저장"""
+    utc_time = datetime.fromtimestamp(float(ts))
+    return utc_time + timedelta(hours=9)  # UTC → KST
+
+
+def build_attendance(rows, attended_dates, start_date):
+    """
+    ts 순으로 정렬된 (ts, ts_for_db, author_name) 에서 출석 데이터 생성
+    @param attended_dates {author_name: 이미 출석한 날짜 set}. 새로 출석한 날짜가 추가됨
+    @return {(author_name, attendance_date): [first_ts, commit_count]}
+    """
+    attendance = {}
+    for _, ts_for_db, author_name in rows:
+        dates = attended_dates.setdefault(author_name, set())
+        attendance_date = get_attendance_date(ts_for_db, start_date, dates)
+        dates.add(attendance_date)
+
+        key = (author_name, attendance_date)
+        if key not in attendance:
+            attendance[key] = [ts_for_db, 0]
+        attendance[key][0] = min(attendance[key][0], ts_for_db)
+        attendance[key][1] += 1
+
+    return attendance
+
+
+def parse_delta_version(since, fingerprint):
+    """
+    delta API 버전 "generation-설정 fingerprint" 에서 generation
+    명단이 바뀌었거나(fingerprint 다름) 형식이 다르면 0. 새 멤버의 기존 출석도 받도록 전체를 보냄
+    """
+    generation, _, since_fingerprint = str(since or "").partition("-")
+    if since_fingerprint != fingerprint:
+        return 0
+    try:
+        return int(generation)
+    except ValueError:
+        return 0
+
+
+def get_recompute_windows(rows):
+    """
+    새로 저장한 커밋 (ts, ts_for_db, author_name) 때문에 출석부를 다시 계산해야 하는 작성자별 시작 시각
+    새 커밋보다 늦은 커밋은 새벽 4시 규칙 때문에 출석일이 바뀔 수 있으므로, 가장 이른 새 커밋의 전날 0시부터.
+    그 전 커밋들의 출석일은 바뀌지 않음
+    @return {author_name: datetime}
+    """
+    first_days = {}
+    for _, ts_for_db, author_name in rows:
+        day = ts_for_db.date()
+        if author_name not in first_days or day < first_days[author_name]:
+            first_days[author_name] = day
+    return {author_name: datetime.combine(day - timedelta(days=1), time.min)
+            for author_name, day in first_days.items()}
+
+
+def recompute_attendance(rows, attended_dates, windows, start_date):
+    """
+    작성자별 시작 시각 이후의 커밋으로 출석부 다시 계산
+    @param rows 시작 시각 이후의 (ts, ts_for_db, author_name). ts 순
+    @param attended_dates {author_name: 시작일 전날이 그 전에 출석했으면 {전날}}
+    @param windows get_recompute_windows 결과
+    @return build_attendance 와 같음. 시작일보다 앞선 출석일은 바뀌지 않으므로 제외
+    """
+    attendance = build_attendance(rows, attended_dates, start_date)
+    return {(author_name, attendance_date): value
+            for (author_name, attendance_date), value in attendance.items()
+            if attendance_date >= windows[author_name].date()}
 
 
 class Garden:
-    def __init__(self):
-        config = configparser.ConfigParser()
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        path = os.path.join(BASE_DIR, 'config.ini')
-        config.read(path)
-
-        # Use environment variables if available, otherwise fallback to config file
-        slack_api_token = os.getenv('SLACK_API_TOKEN', config['DEFAULT']['SLACK_API_TOKEN'])
-        self.slack_client = WebClient(token=slack_api_token)
-
-        self.channel_id = os.getenv('CHANNEL_ID', config['DEFAULT']['CHANNEL_ID'])
-
-        # PostgreSQL settings - prioritize environment variables
-        if 'POSTGRESQL' in config:
-            self.pg_database = os.getenv('DB_NAME', config['POSTGRESQL']['DATABASE'])
-            self.pg_host = os.getenv('DB_HOST', config['POSTGRESQL']['HOST'])
-            self.pg_port = os.getenv('DB_PORT', config['POSTGRESQL']['PORT'])
-            self.pg_user = os.getenv('DB_USER', config['POSTGRESQL']['USER'])
-            self.pg_password = os.getenv('DB_PASSWORD', config['POSTGRESQL']['PASSWORD'])
-            self.pg_schema = os.getenv('DB_SCHEMA', config['POSTGRESQL']['SCHEMA'])
-        else:
-            # Default values if POSTGRESQL section doesn't exist
-            self.pg_database = os.getenv('DB_NAME', 'postgres')
-            self.pg_host = os.getenv('DB_HOST', 'localhost')
-            self.pg_port = os.getenv('DB_PORT', '5432')
-            self.pg_user = os.getenv('DB_USER', 'postgres')
-            self.pg_password = os.getenv('DB_PASSWORD', '')
-            self.pg_schema = os.getenv('DB_SCHEMA', 'garden5')
-
-        self.gardening_days = os.getenv('GARDENING_DAYS', config['DEFAULT']['GARDENING_DAYS'])
-
-        # users list ['junho85', 'user2', 'user3']
-        # self.users = config['GITHUB']['USERS'].split(',')
+    def __init__(self, config=None):
+        """
+        @param config GardenConfig. 없으면 캐시된 설정 사용
+        """
+        # 저장소들이 garden.py 의 출석 계산 함수를 쓰므로 여기서 import
+        from .storage import create_storage
+
+        if config is None:
+            config = get_config()
+        self.config = config
+
+        self.slack_client = WebClient(token=config.slack_api_token)
+        self.slack_signing_secret = config.slack_signing_secret
+
+        self.channel_id = config.channel_id
+
+        # PostgreSQL settings
+        self.pg_database = config.pg_database
+        self.pg_host = config.pg_host
+        self.pg_port = config.pg_port
+        self.pg_user = config.pg_user
+        self.pg_password = config.pg_password
+        self.pg_schema = config.pg_schema
+        self.pg_pool_min = config.pg_pool_min
+        self.pg_pool_max = config.pg_pool_max
+        self.pg_sslmode = config.pg_sslmode
+
+        self.gardening_days = config.gardening_days
 
         # users_with_slackname
-        path = os.path.join(BASE_DIR, 'users.yaml')
+        self.users_with_slackname = config.users_with_slackname
+
+        self.users = config.users
+
+        self.start_date = config.start_date  # start_date e.g.) 2020-03-02
 
-        with open(path) as file:
-            self.users_with_slackname = yaml.safe_load(file)
+        # postgresql, sqlite, replica. 메시지 저장과 출석부 조회는 storage 가 함 (storage.py)
+        self.storage_backend = config.storage_backend
+        self.storage = create_storage(config)
 
-        self.users = list(self.users_with_slackname.keys())
+        # (데이터 버전, 오늘) 별로 만들어둔 출석 비트맵
+        self._matrix_cache = None
 
-        self.start_date = datetime.strptime(config['DEFAULT']['START_DATE'],
-                                            "%Y-%m-%d").date()  # start_date e.g.) 2020-03-02
+    @cached_property
+    def postgres(self):
+        """PostgreSQL 저장소. 스키마 생성, 적재, 벤치마크처럼 PostgreSQL 에 직접 접속하는 곳에서 사용"""
+        from .postgres_storage import PostgresStorage
+
+        if isinstance(self.storage, PostgresStorage):
+            return self.storage
+        if isinstance(getattr(self.storage, "primary", None), PostgresStorage):
+            return self.storage.primary
+        return PostgresStorage(self.config)
+
+    def get_pool(self):
+        """프로세스 공용 PostgreSQL 커넥션 풀"""
+        return self.postgres.get_pool()
 
     def connect_postgres(self):
-        """PostgreSQL 연결 생성"""
-        conn = psycopg2.connect(
-            host=self.pg_host,
-            port=self.pg_port,
-            database=self.pg_database,
-            user=self.pg_user,
-            password=self.pg_password,
-            sslmode='require',
-            gssencmode='disable'
-        )
-        # 연결 후 스키마 설정
-        cursor = conn.cursor()
-        cursor.execute(f"SET search_path TO {self.pg_schema}")
-        cursor.close()
-        return conn
+        """풀에서 PostgreSQL 연결 빌리기. 사용 후 release_postgres 로 반납"""
+        return self.postgres.connect()
+
+    def release_postgres(self, conn):
+        """빌린 연결 반납. 끝나지 않은 트랜잭션은 rollback 됨"""
+        self.postgres.release(conn)
+
+    def get_pool_stats(self):
+        return self.get_pool().stats()
 
     def get_database(self):
         return self.connect_postgres()
@@ -87,166 +223,135 @@ class Garden:
     def get_members(self):
         return self.users_with_slackname
 
-    # 특정 유저의 전체 출석부를 생성함
-    # TODO 출석부를 DB에 넣고 마지막 생성된 출석부 이후의 데이터로 추가 출석부 만들도록 하자
-    def find_attendance_by_user(self, user):
-        return self._find_attendance_by_user_postgres(user)
-
-    def _find_attendance_by_user_postgres(self, user):
-        """PostgreSQL을 사용한 출석부 조회"""
-        conn = self.connect_postgres()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        result = {}
-        start_date = self.start_date
-
-        try:
-            # PostgreSQL JSONB 쿼리: 사용자별 첨부파일이 있는 메시지 조회
-            query = """
-                SELECT ts, ts_for_db, attachments
-                FROM slack_messages 
-                WHERE attachments @> %s
-                ORDER BY ts
-            """
-            
-            # JSONB 쿼리 파라미터
-            param = json.dumps([{"author_name": user}])
-            cursor.execute(query, (param,))
-            
-            for message in cursor.fetchall():
-                # make attend
-                commits = []
-                attachments = message['attachments']
-                if attachments:
-                    for attachment in attachments:
-                        if attachment.get('author_name') == user and attachment.get('text'):
-                            commits.append(attachment.get('text', ''))
-
-                # skip - if there is no commits
-                if len(commits) == 0:
-                    continue
-
-                # DB의 ts_for_db는 이미 KST로 저장되어 있음
-                # 추가 타임존 변환 불필요
-                ts_datetime = message['ts_for_db']
-                attend = {"ts": ts_datetime, "message": commits}
-
-                # current date and date before day1
-                date = ts_datetime.date()
-                date_before_day1 = date - timedelta(days=1)
-                hour = ts_datetime.hour
-
-                if date_before_day1 >= start_date and hour < 4 and date_before_day1 not in result:
-                    # check before day1. if exists, before day1 is already done.
-                    result[date_before_day1] = []
-                    result[date_before_day1].append(attend)
-                else:
-                    # create date commits array
-                    if date not in result:
-                        result[date] = []
-
-                    result[date].append(attend)
-
-        except Exception as e:
-            print(f"Error in _find_attendance_by_user_postgres: {e}")
-        finally:
-            cursor.close()
-            conn.close()
-
+    # 특정 유저의 전체 출석부를 생성함. from_date, to_date 가 있으면 그 기간의 출석일만
+    def find_attendance_by_user(self, user, from_date=None, to_date=None):
+        return self.storage.find_attendance_by_user(user, from_date, to_date)
+
+    # 특정 유저의 출석부를 날짜 순으로 하루씩. 스트리밍 응답용
+    def iter_attendance_by_user(self, user, from_date=None, to_date=None):
+        return self.storage.iter_attendance_by_user(user, from_date, to_date)
+
+    # 특정 유저의 출석일과 첫 커밋 시각. 커밋 내용 없이 출석부(attendance)만 조회
+    def find_attendance_days(self, user, from_date=None, to_date=None, limit=None):
+        return self.storage.find_attendance_days(user, from_date, to_date, limit)
+
+    # 전체 유저의 출석부를 한번에 조회함. 유저별 날짜 - 첫 커밋 시각
+    def find_first_attendances(self, users=None):
+        return self.storage.find_first_attendances(users if users is not None else self.users)
+
+    # 유저별 출석부를 유저 순서대로 한명씩. 스트리밍 응답용
+    def iter_first_attendances(self, users=None):
+        return self.storage.iter_first_attendances(users if users is not None else self.users)
+
+    # 특정일의 출석부. 유저별 첫 커밋 시각
+    def find_attendance_by_date(self, selected_date):
+        return self.storage.find_attendance_by_date(selected_date)
+
+    # 데이터 버전 (generation, updated_at). 캐시된 API 응답이 최신인지 확인용
+    def get_data_version(self):
+        return self.storage.get_data_version()
+
+    # since 버전 이후 바뀐 출석부 행들
+    def find_attendance_changes(self, since, users=None):
+        """
+        @param since 클라이언트가 가진 버전 ("generation-fingerprint"). 없거나 명단이 바뀌었으면 전체
+        @return {"version": 현재 버전, "reset": 전체를 보내는지 여부, "changes": [(user, date, first_ts)]}
+        """
+        users = users if users is not None else self.users
+        since = parse_delta_version(since, self.config.fingerprint)
+        result = self.storage.find_attendance_changes(since, users)
+        result["version"] = f"{result['version']}-{self.config.fingerprint}"
         return result
 
+    """
+    attendance 테이블을 slack_messages 로부터 새로 생성
+    """
+    def rebuild_attendance(self):
+        return self.storage.rebuild_attendance()
 
     # github 봇으로 모은 slack message 들을 DB에 저장
-    def collect_slack_messages(self, oldest, latest):
-        return self._collect_slack_messages_postgres(oldest, latest)
-
-    def _collect_slack_messages_postgres(self, oldest, latest):
-        """PostgreSQL에 Slack 메시지 저장"""
-        response = self.slack_client.conversations_history(
-            channel=self.channel_id,
-            latest=str(latest),
-            oldest=str(oldest),
-            limit=1000
-        )
-
-        conn = self.connect_postgres()
-        cursor = conn.cursor()
-
-        for message in response["messages"]:
-            # Slack 타임스탬프를 datetime으로 변환하고 KST로 저장
-            utc_time = datetime.fromtimestamp(float(message["ts"]))
-            ts_for_db = utc_time + timedelta(hours=9)  # UTC → KST
-            
-            # PostgreSQL INSERT 쿼리
-            insert_query = """
-                INSERT INTO slack_messages (
-                    ts, ts_for_db, bot_id, type, text, "user", team, 
-                    bot_profile, attachments
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s
-                ) ON CONFLICT (ts) DO NOTHING
-            """
-            
-            try:
-                cursor.execute(insert_query, (
-                    message.get("ts"),
-                    ts_for_db,
-                    message.get("bot_id"),
-                    message.get("type"),
-                    message.get("text"),
-                    message.get("user"),
-                    message.get("team"),
-                    json.dumps(message.get("bot_profile")) if message.get("bot_profile") else None,
-                    json.dumps(message.get("attachments")) if message.get("attachments") else None
-                ))
-            except Exception as err:
-                print(f"Error inserting message: {err}")
-                continue
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-
+    def collect_slack_messages(self, oldest, latest, progress=None):
+        """
+        @param progress 페이지를 저장할 때마다 그때까지의 stats 로 호출할 함수
+        @return {"pages": 가져온 페이지 수, "fetched": 가져온 메시지 수, "inserted": 저장한 수, "skipped": 이미 있던 수}
+        """
+        stats, _ = self.storage.collect_messages(self.iter_slack_history(oldest, latest), progress)
+        return stats
+
+    # 마지막으로 수집한 메시지 이후의 메시지만 수집
+    def collect_new_slack_messages(self, default_oldest, overlap=COLLECT_OVERLAP, name="slack_messages"):
+        """
+        @param default_oldest 수집 기록이 없을 때 시작 시각 (timestamp)
+        @return collect_slack_messages 의 stats 에 oldest, last_ts 추가
+        """
+        stats, _ = self.storage.collect_new_messages(self.iter_slack_history, default_oldest, overlap, name)
+        return stats
+
+    # replica: PostgreSQL 의 메시지를 SQLite 로 전체 복사. 다른 경로로 PostgreSQL 에 넣은 경우 (load_bson)
+    def sync_local_storage(self):
+        """@return SQLite 에 새로 저장된 메시지 수. replica 가 아니면 0"""
+        if not hasattr(self.storage, "sync"):
+            return 0
+        return self.storage.sync()
+
+    def iter_slack_history(self, oldest, latest, limit=1000):
+        """
+        conversations_history 를 next_cursor 가 없을 때까지 따라가며 페이지 단위로 메시지 리스트 반환
+        """
+        cursor = None
+        while True:
+            with timed("slack", "conversations_history"):
+                response = self.slack_client.conversations_history(
+                    channel=self.channel_id,
+                    latest=str(latest),
+                    oldest=str(oldest),
+                    limit=limit,
+                    cursor=cursor
+                )
+            yield response["messages"]
+
+            cursor = (response.get("response_metadata") or {}).get("next_cursor")
+            if not response.get("has_more") or not cursor:
+                break
+
+    # Slack Events API 로 받은 메시지 저장
+    def save_slack_messages(self, messages):
+        """@return 새로 저장된 메시지 수"""
+        return len(self.storage.save_messages(messages))
 
     """
     db 에 수집한 slack 메시지 삭제
     """
     def remove_all_slack_messages(self):
-        conn = self.connect_postgres()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM slack_messages")
-        conn.commit()
-        cursor.close()
-        conn.close()
+        self.storage.remove_all()
 
     """
     특정일의 출석 데이터 불러오기
     @param selected_date
     """
     def get_attendance(self, selected_date):
-        attend_dict = {}
-
-        # get all users attendance info
-        for user in self.users:
-            attends = self.find_attendance_by_user(user)
-            attend_dict[user] = attends
-
-        result = {}
-        result_attendance = []
+        first_ts_by_user = self.find_attendance_by_date(selected_date)
 
-        # make users - dates - first_ts
-        for user in attend_dict:
-            if user not in result:
-                result[user] = {}
+        # make users - first_ts
+        return [{"user": user, "first_ts": first_ts_by_user.get(user)} for user in self.users]
 
-            result[user][selected_date] = None
-
-            if selected_date in attend_dict[user]:
-                result[user][selected_date] = attend_dict[user][selected_date][0]["ts"]
+    """
+    시즌 시작일 ~ 오늘 까지의 출석 비트맵
+    데이터 버전과 날짜가 같으면 만들어둔 것을 재사용
+    @param today
+    """
+    def get_attendance_matrix(self, today):
+        version = self.get_data_version()
+        key = (version, today)
 
-            result_attendance.append({"user": user, "first_ts": result[user][selected_date]})
+        cached = self._matrix_cache
+        if version is not None and cached is not None and cached[0] == key:
+            return cached[1]
 
-        return result_attendance
+        dates = get_season_dates(self.start_date, today, int(self.gardening_days))
+        matrix = AttendanceMatrix.from_attendances(self.users, self.find_first_attendances(), dates)
+        self._matrix_cache = (key, matrix)
+        return matrix
 
     def send_no_show_message(self):
         members = self.get_members()
@@ -258,11 +363,12 @@ class Garden:
             if result["first_ts"] is None:
                 message += "@%s " % members[result["user"]]["slack"]
 
-        self.slack_client.chat_postMessage(
-            channel='#gardening-for-100days',
-            text=message,
-            link_names=1
-        )
+        with timed("slack", "chat_postMessage"):
+            self.slack_client.chat_postMessage(
+                channel='#gardening-for-100days',
+                text=message,
+                link_names=1
+            )
 
     def test_slack(self):
         # self.slack_client.chat_postMessage(
@@ -0,0 +1,175 @@
+"""
+Garden 설정 (config.ini, users.yaml, 환경변수)
+프로세스마다 한번만 읽고, 파일이 바뀌었거나(mtime) SIGHUP 을 받으면 다시 읽는다.
+"""
+import configparser
+import hashlib
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, date
+from functools import cached_property
+from types import MappingProxyType
+
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config.ini')
+USERS_PATH = os.path.join(BASE_DIR, 'users.yaml')
+
+# 파일 mtime 확인 주기(초). 요청마다 stat 하지 않도록
+CHECK_INTERVAL = 5
+
+
+@dataclass(frozen=True)
+class GardenConfig:
+    slack_api_token: str
+    slack_signing_secret: str
+    channel_id: str
+
+    pg_database: str
+    pg_host: str
+    pg_port: str
+    pg_user: str
+    pg_password: str
+    pg_schema: str
+    pg_pool_min: int
+    pg_pool_max: int
+    pg_sslmode: str
+
+    # postgresql, sqlite, replica (storage.py 참고)
+    storage_backend: str
+    sqlite_path: str
+
+    gardening_days: str
+    start_date: date
+
+    # github userid - slack username
+    users_with_slackname: MappingProxyType
+    # users list ('junho85', 'user2', 'user3')
+    users: tuple
+
+    # 읽어들인 파일들의 mtime. 변경 확인용
+    mtimes: tuple
+
+    @cached_property
+    def fingerprint(self):
+        """출석부 응답에 영향을 주는 설정(시작일, 기간, 명단)의 짧은 해시. 명단이 바뀌면 ETag 도 바뀌도록"""
+        source = "\n".join([self.start_date.isoformat(), self.gardening_days,
+                             *(f"{user}:{slackname}" for user, slackname in self.users_with_slackname.items())])
+        return hashlib.sha1(source.encode()).hexdigest()[:8]
+
+    @property
+    def modified_at(self):
+        """설정 파일을 마지막으로 고친 시각(timestamp). 파일이 없으면 None"""
+        mtimes = [mtime for mtime in self.mtimes if mtime is not None]
+        return max(mtimes) // 10 ** 9 if mtimes else None
+
+
+def _get_mtimes():
+    return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None
+                 for path in (CONFIG_PATH, USERS_PATH))
+
+
+def load_config():
+    """config.ini, users.yaml, 환경변수를 읽어서 GardenConfig 생성"""
+    mtimes = _get_mtimes()
+
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+
+    # PostgreSQL settings - prioritize environment variables
+    if 'POSTGRESQL' in config:
+        postgresql = config['POSTGRESQL']
+    else:
+        # Default values if POSTGRESQL section doesn't exist
+        postgresql = {'DATABASE': 'postgres', 'HOST': 'localhost', 'PORT': '5432',
+                      'USER': 'postgres', 'PASSWORD': '', 'SCHEMA': 'garden5'}
+
+    storage = config['STORAGE'] if 'STORAGE' in config else {}
+    sqlite_path = os.getenv('SQLITE_PATH', storage.get('SQLITE_PATH', 'garden5.sqlite3'))
+    if sqlite_path != ':memory:':
+        # 상대 경로는 attendance 디렉토리 기준. cron 등 실행 위치와 상관 없도록
+        sqlite_path = os.path.join(BASE_DIR, sqlite_path)
+
+    with open(USERS_PATH) as file:
+        users_with_slackname = yaml.safe_load(file)
+
+    return GardenConfig(
+        # Use environment variables if available, otherwise fallback to config file
+        slack_api_token=os.getenv('SLACK_API_TOKEN', config['DEFAULT']['SLACK_API_TOKEN']),
+        slack_signing_secret=os.getenv('SLACK_SIGNING_SECRET', config['DEFAULT'].get('SLACK_SIGNING_SECRET', '')),
+        channel_id=os.getenv('CHANNEL_ID', config['DEFAULT']['CHANNEL_ID']),
+        pg_database=os.getenv('DB_NAME', postgresql['DATABASE']),
+        pg_host=os.getenv('DB_HOST', postgresql['HOST']),
+        pg_port=os.getenv('DB_PORT', postgresql['PORT']),
+        pg_user=os.getenv('DB_USER', postgresql['USER']),
+        pg_password=os.getenv('DB_PASSWORD', postgresql['PASSWORD']),
+        pg_schema=os.getenv('DB_SCHEMA', postgresql['SCHEMA']),
+        pg_pool_min=int(os.getenv('DB_POOL_MIN', postgresql.get('POOL_MIN', '1'))),
+        pg_pool_max=int(os.getenv('DB_POOL_MAX', postgresql.get('POOL_MAX', '10'))),
+        pg_sslmode=os.getenv('DB_SSLMODE', postgresql.get('SSLMODE', 'require')),
+        storage_backend=os.getenv('STORAGE_BACKEND', storage.get('BACKEND', 'postgresql')),
+        sqlite_path=sqlite_path,
+        gardening_days=os.getenv('GARDENING_DAYS', config['DEFAULT']['GARDENING_DAYS']),
+        start_date=datetime.strptime(config['DEFAULT']['START_DATE'],
+                                     "%Y-%m-%d").date(),  # start_date e.g.) 2020-03-02
+        users_with_slackname=MappingProxyType(users_with_slackname),
+        users=tuple(users_with_slackname.keys()),
+        mtimes=mtimes,
+    )
+
+
+_lock = threading.Lock()
+_config = None
+_checked_at = 0.0
+_reload_requested = False
+_garden = None
+
+
+def get_config():
+    """캐시된 설정. 파일이 바뀌었으면 다시 읽음"""
+    global _config, _checked_at, _reload_requested
+
+    now = time.monotonic()
+    if _config is not None and not _reload_requested and now - _checked_at < CHECK_INTERVAL:
+        return _config
+
+    with _lock:
+        if _config is None or _reload_requested or _config.mtimes != _get_mtimes():
+            _config = load_config()
+            _reload_requested = False
+        _checked_at = now
+
+    return _config
+
+
+def reload_config():
+    """다음 get_config 호출때 설정을 다시 읽도록 표시"""
+    global _reload_requested
+    _reload_requested = True
+
+
+def get_garden():
+    """설정이 같은 동안 공유하는 Garden 인스턴스"""
+    global _garden
+    from .garden import Garden
+
+    config = get_config()
+    garden = _garden
+    if garden is None or garden.config is not config:
+        garden = Garden(config)
+        _garden = garden
+    return garden
+
+
+def install_reload_signal():
+    """SIGHUP 을 받으면 설정을 다시 읽음. 메인 스레드에서만 등록 가능"""
+    if not hasattr(signal, 'SIGHUP'):
+        return
+    try:
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_config())
+    except ValueError:
+        pass
@@ -0,0 +1,185 @@
+"""
+출석부 API 응답 캐시
+응답은 수집된 데이터나 명단이 바뀔 때만 달라지므로 데이터 버전(data_version.generation)과
+설정 fingerprint 를 키로 캐시하고,
+ETag/Last-Modified 로 조건부 요청에는 304 로 응답한다.
+gzip 을 받는 클라이언트에는 압축해둔 응답을 캐시해서 요청마다 다시 압축하지 않는다.
+"""
+from calendar import timegm
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.text import compress_string
+
+from .columnar import wants_columnar
+from .garden_config import get_config, get_garden
+
+# 캐시 보관 시간(초). 버전이 바뀌면 키가 달라지므로 오래된 응답은 그냥 만료됨
+CACHE_TIMEOUT = getattr(settings, 'ATTENDANCE_CACHE_TIMEOUT', 60 * 60)
+
+# 이보다 작은 응답은 압축하지 않음 (GZipMiddleware 와 같은 기준)
+MIN_COMPRESS_LENGTH = 200
+
+
+def get_version_headers(version, config, today=None):
+    """
+    데이터 버전과 설정으로 ETag, Last-Modified(timestamp) 생성
+    @param config GardenConfig. users.yaml, config.ini 가 바뀌면 새 응답
+    @param today 날짜에 따라 달라지는 응답이면 오늘 날짜. 날짜가 바뀌면 새 응답
+    """
+    generation, updated_at = version
+    last_modified = timegm(updated_at.utctimetuple()) if updated_at else None
+    if config.modified_at is not None:
+        last_modified = max(last_modified or 0, config.modified_at)
+    if today is None:
+        return quote_etag(f"v{generation}-{config.fingerprint}"), last_modified
+
+    midnight = datetime.combine(today, datetime.min.time()).timestamp()
+    last_modified = max(last_modified or 0, int(midnight))
+    return quote_etag(f"v{generation}-{config.fingerprint}-{today:%Y%m%d}"), last_modified
+
+
+def cache_key(prefix, etag, request):
+    # Accept 에 따라 응답 포맷이 달라지는 API 가 있음 (columnar)
+    return f"attendance:{prefix}:{etag}:{request.get_full_path()}:{request.headers.get('Accept', '')}"
+
+
+def accepts_gzip(request):
+    return bool(re_accepts_gzip.search(request.headers.get('Accept-Encoding', '')))
+
+
+def compress_response(response):
+    """gzip 으로 압축한 응답 사본"""
+    compressed = HttpResponse(compress_string(response.content), status=response.status_code)
+    for header, value in response.headers.items():
+        compressed.headers[header] = value
+    compressed.headers['Content-Length'] = str(len(compressed.content))
+    compressed.headers['Content-Encoding'] = 'gzip'
+    patch_vary_headers(compressed, ('Accept-Encoding',))
+    return compressed
+
+
+def get_cached_response(view, key, request, *args, **kwargs):
+    """캐시된 응답. 없으면 view 를 호출하고 캐시. gzip 을 받는 요청이면 압축본"""
+    gzip = accepts_gzip(request)
+    if gzip:
+        response = cache.get(key + ':gzip')
+        if response is not None:
+            return response
+
+    response = cache.get(key)
+    if response is None:
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        cache.set(key, response, CACHE_TIMEOUT)
+
+    if gzip and len(response.content) >= MIN_COMPRESS_LENGTH:
+        response = compress_response(response)
+        cache.set(key + ':gzip', response, CACHE_TIMEOUT)
+    return response
+
+
+async def aget_cached_response(view, key, request, *args, **kwargs):
+    """get_cached_response 의 async view 버전"""
+    gzip = accepts_gzip(request)
+    if gzip:
+        response = await cache.aget(key + ':gzip')
+        if response is not None:
+            return response
+
+    response = await cache.aget(key)
+    if response is None:
+        response = await view(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        await cache.aset(key, response, CACHE_TIMEOUT)
+
+    if gzip and len(response.content) >= MIN_COMPRESS_LENGTH:
+        response = compress_response(response)
+        await cache.aset(key + ':gzip', response, CACHE_TIMEOUT)
+    return response
+
+
+def get_request_validators(request, vary_on_date):
+    """@return (etag, last_modified). 데이터 버전을 모르면 (None, None)"""
+    version = get_garden().get_data_version()
+    if version is None:
+        return None, None
+
+    today = datetime.today().date() if vary_on_date else None
+    etag, last_modified = get_version_headers(version, get_config(), today)
+    if wants_columnar(request):
+        # 같은 URL 이어도 columnar 는 다른 표현이므로 ETag 도 달라야 다른 포맷의 304 를 받지 않음
+        etag = f'{etag[:-1]}-columnar"'
+    return etag, last_modified
+
+
+def finish_response(response, etag, last_modified):
+    # 에러 응답에 ETag 가 붙으면 다음 조건부 요청이 304 를 받아서 에러를 계속 재사용함
+    if response.status_code not in (200, 304):
+        return response
+    return set_version_headers(response, etag, last_modified)
+
+
+def set_version_headers(response, etag, last_modified):
+    # 압축본은 byte 가 다르므로 weak ETag. If-None-Match 는 weak 비교라 304 는 그대로
+    response.headers['ETag'] = f"W/{etag}" if response.get('Content-Encoding') else etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    # 매번 서버에 재검증하도록. 바뀐게 없으면 304
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def cached_api(view=None, vary_on_date=False):
+    """
+    데이터 버전 기준으로 응답을 캐시하고 조건부 요청을 처리하는 decorator
+    @cached_api 또는 오늘 날짜에 따라 달라지는 응답이면 @cached_api(vary_on_date=True)
+    async view 에도 쓸 수 있음
+    """
+    if view is None:
+        return lambda view: cached_api(view, vary_on_date=vary_on_date)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+
+            etag, last_modified = await sync_to_async(get_request_validators)(request, vary_on_date)
+            if etag is None:
+                # 버전을 모르면 캐시하지 않음
+                return await view(request, *args, **kwargs)
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await aget_cached_response(view, cache_key(view.__name__, etag, request),
+                                                      request, *args, **kwargs)
+            return finish_response(response, etag, last_modified)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        etag, last_modified = get_request_validators(request, vary_on_date)
+        if etag is None:
+            # 버전을 모르면 캐시하지 않음
+            return view(request, *args, **kwargs)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = get_cached_response(view, cache_key(view.__name__, etag, request), request, *args, **kwargs)
+        return finish_response(response, etag, last_modified)
+
+    return wrapper
@@ -0,0 +1,177 @@
+"""
+웹 프로세스 안에서 돌리는 백그라운드 작업
+요청은 바로 응답하고 DB 저장 같은 느린 작업은 worker thread 에 넘긴다.
+작업 상태는 프로세스 메모리에 있으므로 상태 조회는 작업을 등록한 프로세스에서만 된다.
+settings.ATTENDANCE_RUN_JOBS_INLINE 이면 등록한 자리에서 바로 실행한다 (테스트용).
+"""
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+# Slack 이벤트 저장용. 순서대로 저장되도록 worker 는 하나
+_event_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="garden-events")
+
+# slack_messages 수집용. 수집끼리 Slack API 와 DB 를 나눠쓰지 않도록 worker 는 하나
+_collect_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="garden-collect")
+
+# 끝난 작업은 최근 것만 상태 조회용으로 보관
+MAX_FINISHED_JOBS = 100
+
+_jobs_lock = threading.Lock()
+_jobs = {}
+# 대기중이거나 실행중인 수집 작업 id -> 그 작업이 Slack 에서 가져오는 구간들
+_active_collect_jobs = {}
+
+
+@dataclass
+class CollectJob:
+    id: str
+    oldest: float
+    latest: float
+    # 실제로 수집하는 구간 [(oldest, latest)]. 다른 작업이 가져오는 부분은 빠짐
+    windows: list = None
+    status: str = "queued"  # queued, running, done, failed
+    stats: dict = field(default_factory=lambda: {"pages": 0, "fetched": 0, "inserted": 0, "skipped": 0})
+    error: str = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+
+    def elapsed(self):
+        """실행 시간(초). 아직 시작 전이면 0"""
+        if self.started_at is None:
+            return 0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "oldest": self.oldest,
+            "latest": self.latest,
+            "windows": [list(window) for window in self.windows or []],
+            "pages": self.stats["pages"],
+            "rows": self.stats["inserted"],
+            "stats": dict(self.stats),
+            "elapsed": round(self.elapsed(), 3),
+            "error": self.error,
+        }
+
+
+def _run(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        print(f"Error in background job {getattr(fn, '__name__', fn)}: {e}")
+        traceback.print_exc()
+
+
+def run_inline():
+    """작업을 worker thread 대신 등록한 자리에서 실행할지. 테스트에서 저장이 끝난 뒤 확인하기 위함"""
+    return getattr(settings, "ATTENDANCE_RUN_JOBS_INLINE", False)
+
+
+def submit_event(fn, *args, **kwargs):
+    """Slack 이벤트 처리 작업 등록"""
+    if run_inline():
+        future = Future()
+        future.set_result(_run(fn, *args, **kwargs))
+        return future
+    return _event_executor.submit(_run, fn, *args, **kwargs)
+
+
+def _add_stats(total, stats):
+    return {key: total.get(key, 0) + value for key, value in stats.items()}
+
+
+def _run_collect(job, collect):
+    done = dict(job.stats)
+
+    def progress(stats):
+        job.stats = _add_stats(done, stats)
+
+    job.started_at = time.time()
+    job.status = "running"
+    try:
+        for oldest, latest in job.windows:
+            done = _add_stats(done, collect(oldest, latest, progress=progress))
+            job.stats = done
+        job.status = "done"
+    except Exception as e:
+        print(f"Error in collect job {job.id}: {e}")
+        traceback.print_exc()
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        job.finished_at = time.time()
+        with _jobs_lock:
+            _active_collect_jobs.pop(job.id, None)
+            _forget_finished_jobs()
+
+
+def _forget_finished_jobs():
+    finished = [job for job in _jobs.values() if job.finished_at is not None]
+    finished.sort(key=lambda job: job.finished_at)
+    for job in finished[:-MAX_FINISHED_JOBS]:
+        del _jobs[job.id]
+
+
+def subtract_windows(windows, covered):
+    """
+    구간들에서 covered 구간들과 겹치는 부분을 뺀 나머지
+    @param windows [(oldest, latest)]
+    @param covered [(oldest, latest)]
+    """
+    for covered_oldest, covered_latest in covered:
+        remaining = []
+        for oldest, latest in windows:
+            if covered_latest <= oldest or latest <= covered_oldest:
+                remaining.append((oldest, latest))
+                continue
+            if oldest < covered_oldest:
+                remaining.append((oldest, covered_oldest))
+            if covered_latest < latest:
+                remaining.append((covered_latest, latest))
+        windows = remaining
+    return windows
+
+
+def submit_collect(collect, oldest, latest):
+    """
+    slack_messages 수집 작업 등록
+    대기중이거나 실행중인 작업과 겹치는 구간은 빼고 나머지만 수집.
+    전부 겹치면 새로 등록하지 않고 겹치는 작업을 반환
+    @param collect Garden.collect_slack_messages
+    @return (CollectJob, 새로 등록했는지 여부)
+    """
+    with _jobs_lock:
+        windows = [(oldest, latest)]
+        overlapping = None
+        for job_id, active_windows in _active_collect_jobs.items():
+            remaining = subtract_windows(windows, active_windows)
+            if remaining != windows and overlapping is None:
+                overlapping = _jobs[job_id]
+            windows = remaining
+
+        if not windows and overlapping is not None:
+            return overlapping, False
+
+        job = CollectJob(id=uuid.uuid4().hex, oldest=oldest, latest=latest, windows=windows)
+        _jobs[job.id] = job
+        _active_collect_jobs[job.id] = windows
+
+    if run_inline():
+        _run_collect(job, collect)
+    else:
+        _collect_executor.submit(_run_collect, job, collect)
+    return job, True
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+
+from attendance.garden_config import get_garden
+from attendance.schema import (
+    BACKFILL_MESSAGE_AUTHORS_SQL, apply_schema, explain_hot_queries, find_legacy_objects, get_hot_queries,
+)
+
+
+class Command(BaseCommand):
+    help = "slack_messages 와 파생 테이블, 인덱스를 생성/갱신하고 자주 쓰는 쿼리가 인덱스를 타는지 확인"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drop-legacy", action="store_true",
+                            help="쓰지 않는 인덱스(idx_attachments_author, attachments GIN, attendance_day)와"
+                                 " slack_messages.attendance_day 컬럼 삭제. 없으면 남아있는 것만 출력")
+        parser.add_argument("--skip-backfill", action="store_true",
+                            help="message_authors 를 slack_messages 로부터 채우지 않음")
+        parser.add_argument("--verbose-plan", action="store_true", help="실행계획 전체 출력")
+
+    def handle(self, *args, **options):
+        garden = get_garden()
+        conn = garden.connect_postgres()
+        cursor = conn.cursor()
+
+        try:
+            apply_schema(cursor)
+            self.stdout.write("schema applied")
+
+            legacy_objects = find_legacy_objects(cursor)
+            for name, drop_sql in legacy_objects:
+                if options["drop_legacy"]:
+                    cursor.execute(drop_sql)
+                    self.stdout.write(self.style.WARNING(f"dropped legacy {name}"))
+                else:
+                    self.stdout.write(f"legacy {name} is kept")
+            if legacy_objects and not options["drop_legacy"]:
+                self.stdout.write("run with --drop-legacy to drop them")
+
+            if not options["skip_backfill"]:
+                cursor.execute(BACKFILL_MESSAGE_AUTHORS_SQL)
+                self.stdout.write(f"message_authors backfilled: {cursor.rowcount} rows")
+
+            conn.commit()
+
+            cursor.execute("ANALYZE slack_messages")
+            cursor.execute("ANALYZE message_authors")
+            cursor.execute("ANALYZE attendance")
+            conn.commit()
+
+            # 실제 데이터에 있는 유저와 날짜로 실행계획 확인. 없으면 설정의 첫 유저와 시작일
+            cursor.execute("SELECT author_name, ts_for_db::date FROM message_authors ORDER BY ts DESC LIMIT 1")
+            user, day = cursor.fetchone() or (garden.users[0], garden.start_date)
+            hot_queries = get_hot_queries(user, day, garden.users)
+
+            failed = 0
+            for name, uses_index, plan in explain_hot_queries(cursor, hot_queries):
+                if uses_index:
+                    self.stdout.write(self.style.SUCCESS(f"[index] {name}"))
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"[no index] {name}"))
+                if options["verbose_plan"] or not uses_index:
+                    self.stdout.write(plan)
+            conn.rollback()
+
+            if failed:
+                self.stdout.write(self.style.WARNING(f"{failed} queries do not use an index"))
+        finally:
+            cursor.close()
+            garden.release_postgres(conn)
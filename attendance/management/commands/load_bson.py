@@ -0,0 +1,205 @@
+import json
+import mmap
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import bson
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.garden_config import get_garden
+
+STAGING_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS slack_messages_staging (
+        ts VARCHAR(255),
+        ts_for_db TIMESTAMP,
+        bot_id VARCHAR(255),
+        type VARCHAR(50),
+        text TEXT,
+        "user" VARCHAR(255),
+        team VARCHAR(50),
+        bot_profile JSONB,
+        attachments JSONB
+    ) ON COMMIT DELETE ROWS
+"""
+
+COPY_SQL = """
+    COPY slack_messages_staging (ts, ts_for_db, bot_id, type, text, "user", team, bot_profile, attachments)
+    FROM STDIN
+"""
+
+# 같은 ts 가 덤프에 여러번 있어도 한 번만
+MERGE_SQL = """
+    INSERT INTO slack_messages (ts, ts_for_db, bot_id, type, text, "user", team, bot_profile, attachments)
+    SELECT DISTINCT ON (ts) ts, ts_for_db, bot_id, type, text, "user", team, bot_profile, attachments
+    FROM slack_messages_staging
+    ORDER BY ts
+    ON CONFLICT (ts) DO NOTHING
+    RETURNING ts
+"""
+
+# COPY text 포맷에서 이스케이프 해야 하는 문자
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def iter_bson_documents(buffer, offset=0):
+    """
+    BSON 덤프에서 문서를 하나씩 읽음. 파일 전체를 디코딩해서 들고 있지 않음
+    @param buffer mmap 등 bytes-like
+    @return (문서, 다음 문서의 byte offset) generator
+    """
+    end = len(buffer)
+    while offset < end:
+        size = int.from_bytes(buffer[offset:offset + 4], "little") if offset + 4 <= end else 0
+        if size < 5 or offset + size > end:
+            raise CommandError(f"broken BSON document at byte offset {offset}")
+        yield bson.decode(buffer[offset:offset + size]), offset + size
+        offset += size
+
+
+def to_ts_for_db(ts):
+    """Slack 타임스탬프를 KST TIMESTAMP 로. 서버의 타임존과 상관 없이"""
+    utc_time = datetime.fromtimestamp(float(ts), timezone.utc).replace(tzinfo=None)
+    return utc_time + timedelta(hours=9)
+
+
+def copy_value(value):
+    if value is None:
+        return "\\N"
+    return str(value).translate(COPY_ESCAPES)
+
+
+def to_copy_line(doc):
+    """MongoDB 문서를 COPY text 포맷 한 줄로. ts 가 없으면 None"""
+    ts = doc.get("ts")
+    if not ts:
+        return None
+
+    values = (
+        ts,
+        to_ts_for_db(ts).isoformat(sep=" "),
+        doc.get("bot_id"),
+        doc.get("type"),
+        doc.get("text"),
+        doc.get("user"),
+        doc.get("team"),
+        json.dumps(doc.get("bot_profile"), default=str) if doc.get("bot_profile") else None,
+        json.dumps(doc.get("attachments"), default=str) if doc.get("attachments") else None,
+    )
+    return "\t".join(copy_value(value) for value in values) + "\n"
+
+
+class CopySource:
+    """COPY FROM STDIN 에 넘길 file-like. 줄을 만드는 generator 에서 필요한 만큼만 읽음"""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+class Command(BaseCommand):
+    help = ("mongodump 의 slack_messages.bson 을 COPY 로 staging 테이블에 넣고 slack_messages 에 병합. "
+            "batch 마다 commit 하고 다음 byte offset 을 출력하므로 --offset 으로 이어서 적재할 수 있음")
+
+    def add_arguments(self, parser):
+        parser.add_argument("bson_file", help="e.g. archive/20250802_mongodb_dump/slack_messages.bson")
+        parser.add_argument("--offset", type=int, default=0, help="이 byte offset 부터 적재 (이전 실행의 마지막 offset)")
+        parser.add_argument("--batch-size", type=int, default=50000, help="한번에 COPY/병합/commit 할 문서 수")
+        parser.add_argument("--skip-rebuild", action="store_true",
+                            help="적재 후 출석부(attendance)를 다시 만들지 않음. message_authors 와 데이터 버전은 갱신")
+
+    def handle(self, *args, **options):
+        garden = get_garden()
+        batch_size = options["batch_size"]
+
+        # 빈 파일은 mmap 할 수 없음
+        if os.path.getsize(options["bson_file"]) == 0:
+            self.stdout.write(f"{options['bson_file']} is empty. nothing to load")
+            return
+
+        with open(options["bson_file"], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            total_bytes = len(buffer)
+            offset = options["offset"]
+            if offset > total_bytes:
+                raise CommandError(f"offset {offset} is larger than the file ({total_bytes} bytes)")
+
+            documents = iter_bson_documents(buffer, offset)
+            started = time.perf_counter()
+            start_offset = offset
+            totals = {"read": 0, "skipped": 0, "inserted": 0}
+
+            conn = garden.connect_postgres()
+            cursor = conn.cursor()
+            try:
+                while offset < total_bytes:
+                    # 트랜잭션 단위 pooler 에서도 같은 세션이도록 batch 트랜잭션마다 확인
+                    cursor.execute(STAGING_TABLE_SQL)
+                    batch = {"read": 0, "skipped": 0, "offset": offset}
+
+                    def lines():
+                        for doc, next_offset in documents:
+                            batch["read"] += 1
+                            batch["offset"] = next_offset
+                            line = to_copy_line(doc)
+                            if line is None:
+                                batch["skipped"] += 1
+                            else:
+                                yield line
+                            if batch["read"] >= batch_size:
+                                return
+
+                    cursor.copy_expert(COPY_SQL, CopySource(lines()))
+                    cursor.execute(MERGE_SQL)
+                    inserted_ts = [ts for (ts,) in cursor.fetchall()]
+                    inserted = len(inserted_ts)
+                    # --skip-rebuild 여도 message_authors 와 데이터 버전(ETag, delta)은 같은 트랜잭션에서 맞춤
+                    garden.postgres.add_loaded_messages(cursor, inserted_ts)
+                    conn.commit()
+
+                    offset = batch["offset"]
+                    totals["read"] += batch["read"]
+                    totals["skipped"] += batch["skipped"]
+                    totals["inserted"] += inserted
+
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"offset {offset}/{total_bytes} ({offset / total_bytes * 100:.1f}%)"
+                        f" read {totals['read']} inserted {totals['inserted']} skipped {totals['skipped']}"
+                        f" | {totals['read'] / elapsed:.0f} docs/s"
+                        f" {(offset - start_offset) / elapsed / 1024 / 1024:.1f} MB/s"
+                    )
+
+                    if batch["read"] == 0:
+                        break
+            except Exception:
+                conn.rollback()
+                self.stderr.write(f"stopped. resume with --offset {offset}")
+                raise
+            finally:
+                cursor.close()
+                garden.release_postgres(conn)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"loaded {totals['inserted']} new messages from {totals['read']} documents"
+            f" in {time.perf_counter() - started:.1f}s"))
+
+        if totals["inserted"] and not options["skip_rebuild"]:
+            # 덤프는 ts 순서가 아니므로 새벽 4시 규칙이 맞도록 출석부는 전체를 다시 계산
+            days = garden.rebuild_attendance()
+            self.stdout.write(f"attendance rebuilt: {days} rows")
+        elif totals["inserted"] and garden.storage_backend == "replica":
+            # PostgreSQL 에 직접 넣었으므로 조회용 SQLite 는 전체를 다시 복사. rebuild_attendance 는 복사까지 함
+            copied = garden.sync_local_storage()
+            self.stdout.write(f"replica synced: {copied} messages")
@@ -3,48 +3,65 @@ Python 3.11 호환 Markdown Slack Extension
 python-markdown-slack 패키지를 대체하는 간단한 구현
 """
 import re
+import threading
+from functools import lru_cache
+
+import markdown
 from markdown.extensions import Extension
 from markdown.preprocessors import Preprocessor
 
+from .metrics import timed
+
+
+# Slack 형식 토큰. 한번의 스캔으로 링크, 사용자 멘션, 채널 멘션을 찾음
+# 기존처럼 인라인 코드(`...`) 안의 토큰도 변환함
+SLACK_TOKEN_PATTERN = re.compile(
+    r'<(?P<url>https?://[^|>]+)\|(?P<link_text>[^>]+)>'  # <http://example.com|Link Text>
+    r'|<@(?P<user>[A-Z0-9]+)>'  # <@U12345>
+    r'|<#[A-Z0-9]+\|(?P<channel>[^>]+)>'  # <#C12345|channel-name>
+)
+
+# 화면용 Slack 링크 <url|text>. 마크다운을 거치지 않는 곳에서 씀
+SLACK_LINK_PATTERN = re.compile(r'<([^|>]+)\|([^>]+)>')
+
+INLINE_CODE_PATTERN = re.compile(r'`([^`]+)`')
+
+
+def _to_markdown(match):
+    if match.group('url') is not None:
+        return f"[{match.group('link_text')}]({match.group('url')})"
+    if match.group('user') is not None:
+        return f"@{match.group('user')}"
+    return f"#{match.group('channel')}"
+
+
+def _to_html(match):
+    # 백틱으로 둘러싸인 텍스트는 <code> 태그로 변환
+    text = INLINE_CODE_PATTERN.sub(r'<code>\1</code>', match.group(2))
+    return f'<a href="{match.group(1)}">{text}</a>'
+
+
+def slack_to_markdown(text):
+    """Slack 형식 토큰을 표준 마크다운으로 변환"""
+    return SLACK_TOKEN_PATTERN.sub(_to_markdown, text)
+
+
+def slack_to_html(text):
+    """Slack 링크 <url|text> 를 HTML 링크로 변환 (마크다운 변환 없이)"""
+    return SLACK_LINK_PATTERN.sub(_to_html, text)
+
 
 class SlackPreprocessor(Preprocessor):
     """Slack 형식의 마크다운을 HTML로 변환하는 전처리기"""
-    
+
     def run(self, lines):
-        new_lines = []
-        for line in lines:
-            # Slack 형식의 링크 변환: <http://example.com|Link Text>
-            line = re.sub(
-                r'<(https?://[^|>]+)\|([^>]+)>',
-                r'[\2](\1)',
-                line
-            )
-            
-            # Slack 형식의 사용자 멘션 변환: <@U12345>
-            line = re.sub(
-                r'<@([A-Z0-9]+)>',
-                r'@\1',
-                line
-            )
-            
-            # Slack 형식의 채널 멘션 변환: <#C12345|channel-name>
-            line = re.sub(
-                r'<#[A-Z0-9]+\|([^>]+)>',
-                r'#\1',
-                line
-            )
-            
-            # Slack 형식의 코드 블록 변환: ```code```
-            # (이미 표준 마크다운과 호환됨)
-            
-            new_lines.append(line)
-        
-        return new_lines
+        # Slack 형식의 코드 블록 ```code``` 은 이미 표준 마크다운과 호환됨
+        return [slack_to_markdown(line) for line in lines]
 
 
 class SlackMarkdownExtension(Extension):
     """Slack 형식의 마크다운을 처리하는 확장"""
-    
+
     def extendMarkdown(self, md):
         md.preprocessors.register(
             SlackPreprocessor(md),
@@ -55,4 +72,36 @@ class SlackMarkdownExtension(Extension):
 
 def makeExtension(**kwargs):
     """마크다운 확장을 생성하는 팩토리 함수"""
-    return SlackMarkdownExtension(**kwargs)
\ No newline at end of file
+    return SlackMarkdownExtension(**kwargs)
+
+
+# Markdown 인스턴스는 스레드간 공유할 수 없으므로 스레드마다 하나씩 만들어서 재사용
+_local = threading.local()
+
+
+def get_renderer():
+    """현재 스레드의 Slack 마크다운 렌더러"""
+    md = getattr(_local, 'md', None)
+    if md is None:
+        md = markdown.Markdown(extensions=[SlackMarkdownExtension()])
+        _local.md = md
+    return md
+
+
+def convert_slack_markdown(text):
+    """공유 렌더러로 변환. 문서마다 reset 해서 이전 문서의 상태가 남지 않도록 함"""
+    md = get_renderer()
+    try:
+        with timed("markdown", "convert"):
+            return md.convert(text)
+    finally:
+        md.reset()
+
+
+@lru_cache(maxsize=4096)
+def render_slack_markdown(text):
+    """
+    Slack 메시지를 HTML로 변환
+    수집된 커밋 메시지는 바뀌지 않으므로 변환 결과를 캐시해서 재사용
+    """
+    return convert_slack_markdown(text)
@@ -0,0 +1,180 @@
+"""
+출석 비트맵
+유저 x 시즌 날짜 출석 여부를 비트셋(int)으로, 첫 커밋 시각을 array 로 들고 있어서
+출석률, 연속 출석, 날짜별 미출석자, 순위 같은 계산을 dict 를 돌지 않고 한다.
+"""
+from array import array
+from datetime import datetime, timedelta
+
+# 출석하지 않은 날의 첫 커밋 시각 offset
+NO_COMMIT = -1
+ONE_MICROSECOND = timedelta(microseconds=1)
+ONE_MINUTE = 60 * 1000000
+ONE_HOUR = 3600 * 1000000
+
+
+class AttendanceMatrix:
+    def __init__(self, users, dates):
+        """
+        @param users 유저 리스트
+        @param dates 시즌 날짜 리스트 (연속된 날짜)
+        """
+        self.users = tuple(users)
+        self.dates = tuple(dates)
+        self.user_index = {user: idx for idx, user in enumerate(self.users)}
+        self.date_index = {day: idx for idx, day in enumerate(self.dates)}
+
+        # 유저별 출석 비트셋. j 번째 비트가 j 번째 날짜 출석
+        self.user_bits = [0] * len(self.users)
+        # 날짜별 출석 비트셋. i 번째 비트가 i 번째 유저 출석
+        self.day_bits = [0] * len(self.dates)
+        # 유저 x 날짜 첫 커밋 시각. 출석일 0시 기준 마이크로초 (새벽 커밋은 하루 이상)
+        self.first_offsets = array('q', [NO_COMMIT]) * (len(self.users) * len(self.dates))
+
+    @classmethod
+    def from_attendances(cls, users, attend_dict, dates):
+        """
+        @param attend_dict {user: {date: first_ts}}
+        """
+        matrix = cls(users, dates)
+        for user_idx, user in enumerate(matrix.users):
+            for day, first_ts in attend_dict.get(user, {}).items():
+                day_idx = matrix.date_index.get(day)
+                if day_idx is not None:
+                    matrix.set(user_idx, day_idx, first_ts)
+        return matrix
+
+    def set(self, user_idx, day_idx, first_ts):
+        self.user_bits[user_idx] |= 1 << day_idx
+        self.day_bits[day_idx] |= 1 << user_idx
+        midnight = datetime.combine(self.dates[day_idx], datetime.min.time())
+        self.first_offsets[user_idx * len(self.dates) + day_idx] = (first_ts - midnight) // ONE_MICROSECOND
+
+    def first_ts(self, user_idx, day_idx):
+        """첫 커밋 시각. 출석하지 않았으면 None"""
+        offset = self.first_offsets[user_idx * len(self.dates) + day_idx]
+        if offset == NO_COMMIT:
+            return None
+        return datetime.combine(self.dates[day_idx], datetime.min.time()) + timedelta(microseconds=offset)
+
+    def attendances(self, user_idx):
+        """유저의 {date: first_ts}"""
+        return {self.dates[day_idx]: self.first_ts(user_idx, day_idx)
+                for day_idx in iter_bits(self.user_bits[user_idx])}
+
+    def counts(self):
+        """유저별 출석 횟수"""
+        return [bits.bit_count() for bits in self.user_bits]
+
+    def rates(self):
+        """유저별 출석률 (%)"""
+        if not self.dates:
+            return [0] * len(self.users)
+        return [count / len(self.dates) * 100 for count in self.counts()]
+
+    def daily_counts(self):
+        """날짜별 출석 인원"""
+        return [bits.bit_count() for bits in self.day_bits]
+
+    def daily_rates(self):
+        """날짜별 출석률 (%)"""
+        if not self.users:
+            return [0] * len(self.dates)
+        return [count / len(self.users) * 100 for count in self.daily_counts()]
+
+    def attendees(self, day_idx):
+        """해당 날짜 출석한 유저들"""
+        return [self.users[user_idx] for user_idx in iter_bits(self.day_bits[day_idx])]
+
+    def no_shows(self, day_idx):
+        """해당 날짜 출석하지 않은 유저들"""
+        all_users = (1 << len(self.users)) - 1
+        return [self.users[user_idx] for user_idx in iter_bits(all_users & ~self.day_bits[day_idx])]
+
+    def longest_streak(self, user_idx):
+        """최장 연속 출석일. 비트셋을 자기 자신과 AND 하며 줄여나간 횟수"""
+        bits = self.user_bits[user_idx]
+        streak = 0
+        while bits:
+            bits &= bits >> 1
+            streak += 1
+        return streak
+
+    def current_streak(self, user_idx, day_idx=None):
+        """
+        day_idx 까지 이어지는 연속 출석일
+        day_idx 가 없으면 마지막 날 기준. 마지막 날 아직 출석 전이면 그 전날까지의 연속 출석
+        """
+        if not self.dates:
+            return 0
+        bits = self.user_bits[user_idx]
+        if day_idx is None:
+            day_idx = len(self.dates) - 1
+            if not bits >> day_idx & 1 and day_idx > 0:
+                day_idx -= 1
+
+        mask = (1 << (day_idx + 1)) - 1
+        missing = ~bits & mask
+        if missing >> day_idx & 1:
+            return 0
+        # 가장 최근에 빠진 날 다음부터 day_idx 까지
+        return day_idx + 1 - missing.bit_length()
+
+    def hourly_counts(self):
+        """첫 커밋 시각별 출석 횟수"""
+        counts = [0] * 24
+        for offset in self.first_offsets:
+            if offset != NO_COMMIT:
+                counts[offset // ONE_HOUR % 24] += 1
+        return counts
+
+    def ranks(self):
+        """유저별 출석 순위. 같은 횟수는 같은 순위"""
+        counts = self.counts()
+        rank_by_count = {}
+        for rank, count in enumerate(sorted(counts, reverse=True), start=1):
+            rank_by_count.setdefault(count, rank)
+        return [rank_by_count[count] for count in counts]
+
+    def leaderboard(self):
+        """순위 순으로 정렬된 유저별 출석 횟수, 출석률, 연속 출석"""
+        counts = self.counts()
+        rates = self.rates()
+        ranks = self.ranks()
+        rows = [{
+            "user": user,
+            "rank": ranks[idx],
+            "count": counts[idx],
+            "rate": rates[idx],
+            "current_streak": self.current_streak(idx),
+            "longest_streak": self.longest_streak(idx),
+        } for idx, user in enumerate(self.users)]
+        rows.sort(key=lambda row: (row["rank"], -row["longest_streak"]))
+        return rows
+
+    def to_columnar(self):
+        """
+        유저별 dict 대신 배열로 된 출석부
+        bits: 유저별 출석 비트셋 hex. j 번째 비트가 dates[j] 출석
+        minutes: 유저별 출석한 날의 첫 커밋 시각. 출석일 0시 기준 분 (새벽 커밋은 1440 이상). 비트 순서대로
+        """
+        day_count = len(self.dates)
+        minutes = []
+        for user_idx, bits in enumerate(self.user_bits):
+            base = user_idx * day_count
+            minutes.append([self.first_offsets[base + day_idx] // ONE_MINUTE for day_idx in iter_bits(bits)])
+
+        return {
+            "dates": [day.strftime("%Y-%m-%d") for day in self.dates],
+            "users": list(self.users),
+            "bits": [format(bits, "x") for bits in self.user_bits],
+            "minutes": minutes,
+        }
+
+
+def iter_bits(bits):
+    """켜진 비트의 위치"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
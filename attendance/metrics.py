@@ -0,0 +1,190 @@
+"""
+요청별 성능 측정
+TimingMiddleware 가 요청마다 측정 여부를 정하고, Garden 의 DB/Slack/Markdown 호출은 timed() 로 시간을 잰다.
+요청별 합계는 Server-Timing 헤더로, 누적 히스토그램은 /metrics 에서 Prometheus text 포맷으로 내보낸다.
+측정하지 않는 요청이나 cron 같은 요청 밖의 호출에서 timed() 는 아무것도 하지 않는다.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+import psycopg2.extensions
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# 초 단위 히스토그램 구간
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 측정중인 요청의 RequestTimings. 측정하지 않으면 None
+_current = ContextVar("garden_request_timings", default=None)
+_null_timer = nullcontext()
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        # labels -> [구간별 횟수..., 합계, 횟수]
+        self._series = {}
+
+    def observe(self, labels, seconds):
+        idx = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(BUCKETS) + [0.0, 0]
+            if idx < len(BUCKETS):
+                series[idx] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return "\n".join(lines)
+
+
+REQUEST_DURATION = Histogram("garden_request_duration_seconds", "Request latency by view",
+                             ("view", "method", "status"))
+BACKEND_DURATION = Histogram("garden_backend_duration_seconds", "DB, Slack and Markdown call latency",
+                             ("backend", "operation"))
+
+
+class RequestTimings:
+    """한 요청 동안의 backend 별 (합계 시간, 호출 수)"""
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, backend, seconds):
+        total, count = self.totals.get(backend, (0.0, 0))
+        self.totals[backend] = (total + seconds, count + 1)
+
+    def server_timing(self, total_seconds):
+        parts = [f'{backend};desc="{count} calls";dur={total * 1000:.1f}'
+                 for backend, (total, count) in self.totals.items()]
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class _Timer:
+    __slots__ = ("timings", "backend", "operation", "started")
+
+    def __init__(self, timings, backend, operation):
+        self.timings = timings
+        self.backend = backend
+        self.operation = operation
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        self.timings.add(self.backend, seconds)
+        BACKEND_DURATION.observe((self.backend, self.operation), seconds)
+        return False
+
+
+def timed(backend, operation):
+    """
+    with timed("db", "query"): ...
+    @param backend db, slack, markdown
+    """
+    timings = _current.get()
+    if timings is None:
+        return _null_timer
+    return _Timer(timings, backend, operation)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """execute 마다 시간을 재는 cursor. 커넥션의 cursor_factory 로 사용"""
+
+    def execute(self, query, vars=None):
+        with timed("db", "query"):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with timed("db", "query"):
+            return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        with timed("db", "copy"):
+            return super().copy_expert(sql, file, size)
+
+
+def render_metrics():
+    return REQUEST_DURATION.render() + "\n" + BACKEND_DURATION.render() + "\n"
+
+
+class TimingMiddleware:
+    """
+    요청 시간과 backend 호출 시간을 재서 Server-Timing 헤더와 /metrics 에 반영
+    settings.ATTENDANCE_METRICS_SAMPLE_RATE (0 ~ 1) 비율의 요청만 측정
+    ASGI 에서 async view 가 스레드로 옮겨지지 않도록 sync/async 둘 다 지원
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from django.conf import settings
+
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "ATTENDANCE_METRICS_SAMPLE_RATE", 1.0)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, started)
+
+    def _finish(self, request, response, timings, started):
+        seconds = time.perf_counter() - started
+
+        match = request.resolver_match
+        # url 패턴 기준. 유저명, 날짜별로 시계열이 늘어나지 않도록
+        view = match.route if match else "unmatched"
+        REQUEST_DURATION.observe((view, request.method, str(response.status_code)), seconds)
+        response.headers["Server-Timing"] = timings.server_timing(seconds)
+        return response
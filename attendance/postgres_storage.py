@@ -0,0 +1,666 @@
+"""
+PostgreSQL 저장소
+slack_messages 와 파생 테이블(message_authors, attendance, data_version, collect_state)을 PostgreSQL 에 두고
+Garden 의 메시지 저장, 출석부 조회, 삭제를 처리한다. 저장소 인터페이스는 storage.py 참고
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+
+import psycopg2.extras
+
+from .db_pool import get_pool
+from .garden import (build_attendance, get_message_window, get_recompute_windows, get_ts_for_db,
+                     group_attendance_by_date, recompute_attendance)
+from .metrics import TimedCursor, timed
+from .schema import BACKFILL_MESSAGE_AUTHORS_SQL, COLLECT_STATE_TABLE_SQL, create_derived_tables
+
+logger = logging.getLogger(__name__)
+
+# 서버 사이드 cursor 로 한번에 가져오는 행 수
+FETCH_SIZE = 1000
+
+# 다른 저장소(replica)로 복사할 slack_messages 컬럼
+MESSAGE_COLUMNS = ("ts", "ts_for_db", "bot_id", "type", "text", "user", "team", "bot_profile", "attachments")
+
+# 커밋 메시지가 있는 (메시지, 작성자) 쌍 조회. 첨부파일을 펼쳐서 작성자별로 한 행
+COMMIT_AUTHORS_QUERY = """
+    SELECT DISTINCT sm.ts, sm.ts_for_db, attachment->>'author_name' AS author_name
+    FROM slack_messages sm,
+         LATERAL jsonb_array_elements(sm.attachments) AS attachment
+    WHERE sm.attachments IS NOT NULL
+      AND COALESCE(attachment->>'text', '') <> ''
+      AND attachment->>'author_name' IS NOT NULL
+      {condition}
+    ORDER BY sm.ts
+"""
+
+# 유저의 커밋 메시지. message_authors (author_name, ts_for_db) 로 기간 안의 유저 메시지를 찾고,
+# 그 메시지의 첨부파일 중 유저의 커밋만 순서대로 모음. start, end 가 NULL 이면 전체 기간
+ATTENDANCE_BY_USER_QUERY = """
+    SELECT sm.ts_for_db, array_agg(a.attachment->>'text' ORDER BY a.ordinality) AS commits
+    FROM message_authors ma
+    JOIN slack_messages sm ON sm.ts = ma.ts,
+         LATERAL jsonb_array_elements(sm.attachments) WITH ORDINALITY AS a(attachment, ordinality)
+    WHERE ma.author_name = %(user)s
+      AND (%(start)s::timestamp IS NULL OR ma.ts_for_db >= %(start)s)
+      AND (%(end)s::timestamp IS NULL OR ma.ts_for_db < %(end)s)
+      AND a.attachment->>'author_name' = %(user)s
+      AND COALESCE(a.attachment->>'text', '') <> ''
+    GROUP BY sm.ts, sm.ts_for_db
+    ORDER BY sm.ts
+"""
+
+# 유저의 출석일과 첫 커밋 시각 (출석부만)
+ATTENDANCE_DAYS_QUERY = """
+    SELECT attendance_date, first_ts
+    FROM attendance
+    WHERE author_name = %(user)s
+      AND (%(from)s::date IS NULL OR attendance_date >= %(from)s)
+      AND (%(to)s::date IS NULL OR attendance_date <= %(to)s)
+    ORDER BY attendance_date
+    LIMIT %(limit)s
+"""
+
+# 유저들의 출석부
+FIRST_ATTENDANCES_QUERY = """
+    SELECT author_name, attendance_date, first_ts
+    FROM attendance
+    WHERE author_name = ANY(%(users)s)
+    ORDER BY author_name, attendance_date
+"""
+
+# 특정일의 출석부
+ATTENDANCE_BY_DATE_QUERY = """
+    SELECT author_name, first_ts
+    FROM attendance
+    WHERE attendance_date = %(date)s
+"""
+
+# since 이후 바뀐 출석부 행 (delta API). 조회 중에 바뀐 행은 다음 delta 에서 받도록 현재 버전까지만
+ATTENDANCE_CHANGES_QUERY = """
+    SELECT author_name, attendance_date, first_ts
+    FROM attendance
+    WHERE author_name = ANY(%(users)s) AND generation > %(since)s AND generation <= %(generation)s
+    ORDER BY author_name, attendance_date
+"""
+
+# 출석부를 다시 계산할 작성자별 시작 시각. unnest(작성자 배열, 시작 시각 배열)
+RECOMPUTE_WINDOWS_SQL = "unnest(%(authors)s::text[], %(starts)s::timestamp[]) AS w(author_name, recompute_from)"
+
+# 다시 계산하는 첫날의 전날이 그 전 메시지로 이미 출석했는지. 첫날 새벽 커밋의 출석일이 여기에 달림
+RECOMPUTE_SEED_QUERY = f"""
+    SELECT a.author_name, a.attendance_date
+    FROM attendance a
+    JOIN {RECOMPUTE_WINDOWS_SQL} ON a.author_name = w.author_name
+    WHERE a.attendance_date = w.recompute_from::date - 1
+      AND a.first_ts < w.recompute_from
+"""
+
+# 다시 계산할 커밋들. message_authors (author_name, ts_for_db) 로 작성자별로 읽음
+RECOMPUTE_MESSAGES_QUERY = f"""
+    SELECT ma.ts, ma.ts_for_db, ma.author_name
+    FROM message_authors ma
+    JOIN {RECOMPUTE_WINDOWS_SQL} ON ma.author_name = w.author_name
+    WHERE ma.ts_for_db >= w.recompute_from
+    ORDER BY ma.ts
+"""
+
+RECOMPUTE_DELETE_SQL = f"""
+    DELETE FROM attendance a
+    USING {RECOMPUTE_WINDOWS_SQL}
+    WHERE a.author_name = w.author_name
+      AND a.attendance_date >= w.recompute_from::date
+"""
+
+
+class PostgresStorage:
+    def __init__(self, config):
+        """
+        @param config GardenConfig. pg_* 접속 설정과 출석 체크 시작일
+        """
+        self.config = config
+        self.start_date = config.start_date
+
+    def get_pool(self):
+        """프로세스 공용 PostgreSQL 커넥션 풀"""
+        config = self.config
+        return get_pool(
+            min_size=config.pg_pool_min,
+            max_size=config.pg_pool_max,
+            schema=config.pg_schema,
+            host=config.pg_host,
+            port=config.pg_port,
+            database=config.pg_database,
+            user=config.pg_user,
+            password=config.pg_password,
+            sslmode=config.pg_sslmode,
+            gssencmode='disable',
+            # 쿼리별 시간 측정
+            cursor_factory=TimedCursor
+        )
+
+    def connect(self):
+        """풀에서 PostgreSQL 연결 빌리기. 사용 후 release 로 반납"""
+        with timed("db", "connect"):
+            return self.get_pool().getconn()
+
+    def release(self, conn):
+        """빌린 연결 반납. 끝나지 않은 트랜잭션은 rollback 됨"""
+        self.get_pool().putconn(conn)
+
+    def find_attendance_by_user(self, user, from_date=None, to_date=None):
+        """@return {date: [{"ts", "message"}]}"""
+        return dict(self.iter_attendance_by_user(user, from_date, to_date))
+
+    def iter_attendance_by_user(self, user, from_date=None, to_date=None):
+        """
+        유저의 커밋 메시지만 SQL 에서 골라내고, 서버 사이드 cursor 로 조금씩 읽어서 메모리 사용량을 일정하게 유지
+        기간이 있으면 그 기간의 메시지만 읽음 (idx_message_authors_author_ts_for_db)
+        @return (date, [{"ts", "message"}]) generator
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        window_start, window_end = get_message_window(from_date, to_date)
+        attended_dates = set()
+
+        try:
+            if from_date:
+                # from_date 0시 ~ 4시 커밋이 전날 출석인지는 전날이 그 전에 출석했는지에 달림
+                cursor.execute("""
+                    SELECT 1 FROM attendance
+                    WHERE author_name = %s AND attendance_date = %s AND first_ts < %s
+                """, (user, from_date - timedelta(days=1), window_start))
+                if cursor.fetchone():
+                    attended_dates.add(from_date - timedelta(days=1))
+            cursor.close()
+
+            cursor = conn.cursor(name="find_attendance_by_user")
+            cursor.itersize = FETCH_SIZE
+            cursor.execute(ATTENDANCE_BY_USER_QUERY, {"user": user, "start": window_start, "end": window_end})
+
+            # DB의 ts_for_db는 이미 KST로 저장되어 있음
+            # 추가 타임존 변환 불필요
+            yield from group_attendance_by_date(cursor, self.start_date, attended_dates, from_date, to_date)
+        finally:
+            cursor.close()
+            self.release(conn)
+
+    def find_attendance_days(self, user, from_date=None, to_date=None, limit=None):
+        """
+        @param limit 앞에서부터 최대 몇일
+        @return 날짜 순 [(date, first_ts)]
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        result = []
+
+        try:
+            cursor.execute(ATTENDANCE_DAYS_QUERY, {"user": user, "from": from_date, "to": to_date, "limit": limit})
+            result = cursor.fetchall()
+
+        except Exception:
+            logger.exception("Error in PostgresStorage.find_attendance_days")
+            raise
+        finally:
+            cursor.close()
+            self.release(conn)
+
+        return result
+
+    def find_first_attendances(self, users):
+        """
+        attendance 테이블에서 전체 유저의 출석부 조회
+        @return {user: {date: first_ts}}
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        result = {user: {} for user in users}
+
+        try:
+            cursor.execute(FIRST_ATTENDANCES_QUERY, {"users": list(users)})
+
+            for author_name, attendance_date, first_ts in cursor:
+                result[author_name][attendance_date] = first_ts
+
+        except Exception:
+            logger.exception("Error in PostgresStorage.find_first_attendances")
+            raise
+        finally:
+            cursor.close()
+            self.release(conn)
+
+        return result
+
+    def iter_first_attendances(self, users):
+        """
+        attendance 테이블을 users 순서로 서버 사이드 cursor 로 읽음
+        @return (user, {date: first_ts}) generator. 출석이 없는 유저도 포함
+        """
+        users = list(users)
+        conn = self.connect()
+        cursor = conn.cursor(name="iter_first_attendances")
+        cursor.itersize = FETCH_SIZE
+
+        try:
+            cursor.execute("""
+                SELECT author_name, attendance_date, first_ts
+                FROM attendance
+                WHERE author_name = ANY(%s)
+                ORDER BY array_position(%s, author_name), attendance_date
+            """, (users, users))
+
+            row = next(cursor, None)
+            for user in users:
+                attendances = {}
+                while row is not None and row[0] == user:
+                    attendances[row[1]] = row[2]
+                    row = next(cursor, None)
+                yield user, attendances
+        finally:
+            cursor.close()
+            self.release(conn)
+
+    def find_attendance_by_date(self, selected_date):
+        """
+        attendance 테이블에서 그날 출석한 유저만 조회 (idx_attendance_date)
+        새벽 4시 규칙은 출석부를 만들 때 이미 반영되어 있으므로 메시지를 다시 볼 필요 없음
+        @return {user: first_ts}
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        result = {}
+
+        try:
+            cursor.execute(ATTENDANCE_BY_DATE_QUERY, {"date": selected_date})
+
+            for author_name, first_ts in cursor:
+                result[author_name] = first_ts
+
+        except Exception:
+            logger.exception("Error in PostgresStorage.find_attendance_by_date")
+            raise
+        finally:
+            cursor.close()
+            self.release(conn)
+
+        return result
+
+    def get_data_version(self):
+        """@return (generation, updated_at). 조회하지 못하면 None"""
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT generation, updated_at FROM data_version WHERE id = 1")
+            row = cursor.fetchone()
+            return row if row else (0, None)
+        except Exception:
+            logger.exception("Error in PostgresStorage.get_data_version")
+            return None
+        finally:
+            cursor.close()
+            self.release(conn)
+
+    def _bump_data_version(self, cursor, reset=False):
+        """
+        데이터 버전 증가
+        @param reset 출석부를 새로 만들거나 지운 경우. 이전 버전의 delta 는 더이상 이어붙일 수 없음
+        @return 새 generation
+        """
+        cursor.execute("""
+            INSERT INTO data_version (id, generation, reset_generation, updated_at)
+            VALUES (1, 1, CASE WHEN %(reset)s THEN 1 ELSE 0 END, NOW())
+            ON CONFLICT (id) DO UPDATE SET
+                generation = data_version.generation + 1,
+                reset_generation = CASE WHEN %(reset)s THEN data_version.generation + 1
+                                        ELSE data_version.reset_generation END,
+                updated_at = EXCLUDED.updated_at
+            RETURNING generation
+        """, {"reset": reset})
+        return cursor.fetchone()[0]
+
+    def find_attendance_changes(self, since, users):
+        """
+        @param since 클라이언트가 가진 데이터 버전(generation). 0 이면 전체
+        @return {"version": 현재 generation, "reset": 전체를 보내는지 여부, "changes": [(user, date, first_ts)]}
+        reset 이면 클라이언트는 가진 것을 버리고 changes 로 대체해야 함
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT generation, reset_generation FROM data_version WHERE id = 1")
+            row = cursor.fetchone()
+            generation, reset_generation = row if row else (0, 0)
+
+            # 출석부를 새로 만든 뒤로는 이전 버전과 이어지지 않음. 다른 DB 의 버전이어도 전체
+            reset = since <= 0 or since < reset_generation or since > generation
+
+            cursor.execute(ATTENDANCE_CHANGES_QUERY,
+                           {"users": list(users), "since": -1 if reset else since, "generation": generation})
+
+            return {"version": generation, "reset": reset, "changes": cursor.fetchall()}
+        finally:
+            cursor.close()
+            self.release(conn)
+
+    def save_messages(self, messages):
+        """
+        메시지 저장 후 출석부 갱신
+        @return 새로 저장된 메시지의 ts 리스트
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        try:
+            inserted_ts = self._insert_messages(cursor, messages)
+            self._update_attendance(cursor, inserted_ts)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Error in PostgresStorage.save_messages")
+            raise
+        finally:
+            cursor.close()
+            self.release(conn)
+
+        return inserted_ts
+
+    def collect_messages(self, pages, progress=None):
+        """
+        Slack 에서 가져온 페이지들을 한 트랜잭션에서 저장
+        @param pages 메시지 리스트 iterable (Garden.iter_slack_history)
+        @param progress 페이지를 저장할 때마다 그때까지의 stats 로 호출할 함수
+        @return ({"pages": 가져온 페이지 수, "fetched": 가져온 메시지 수, "inserted": 저장한 수, "skipped": 이미 있던 수},
+                 새로 저장된 메시지의 ts 리스트)
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        try:
+            stats, inserted_ts, _ = self._collect_pages(cursor, pages, progress)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Error in PostgresStorage.collect_messages")
+            raise
+        finally:
+            cursor.close()
+            self.release(conn)
+
+        return stats, inserted_ts
+
+    def collect_new_messages(self, fetch_pages, default_oldest, overlap, name):
+        """
+        collect_state 의 last_ts - overlap 부터 지금까지 수집하고, 같은 트랜잭션에서 last_ts 를 갱신
+        @param fetch_pages (oldest, latest) 로 페이지 iterable 을 만드는 함수 (Garden.iter_slack_history)
+        @param default_oldest 수집 기록이 없을 때 시작 시각 (timestamp)
+        @return (collect_messages 의 stats 에 oldest, last_ts 추가, 새로 저장된 메시지의 ts 리스트)
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(COLLECT_STATE_TABLE_SQL)
+
+            # 동시에 실행된 수집과 겹치지 않도록 row lock
+            cursor.execute("SELECT last_ts FROM collect_state WHERE name = %s FOR UPDATE", (name,))
+            row = cursor.fetchone()
+            last_ts = row[0] if row else None
+            oldest = float(last_ts) - overlap if last_ts else default_oldest
+
+            stats, inserted_ts, max_ts = self._collect_pages(
+                cursor, fetch_pages(oldest, datetime.now().timestamp()))
+
+            if max_ts and (last_ts is None or float(max_ts) > float(last_ts)):
+                last_ts = max_ts
+            if last_ts:
+                cursor.execute("""
+                    INSERT INTO collect_state (name, last_ts, updated_at)
+                    VALUES (%s, %s, NOW())
+                    ON CONFLICT (name) DO UPDATE SET last_ts = EXCLUDED.last_ts, updated_at = EXCLUDED.updated_at
+                """, (name, last_ts))
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Error in PostgresStorage.collect_new_messages")
+            raise
+        finally:
+            cursor.close()
+            self.release(conn)
+
+        stats["oldest"] = oldest
+        stats["last_ts"] = last_ts
+        return stats, inserted_ts
+
+    def _collect_pages(self, cursor, pages, progress=None):
+        """
+        메시지를 페이지 단위로 저장하고 출석부 갱신. commit 은 호출한 쪽에서
+        @return (stats, 새로 저장된 메시지의 ts 리스트, 가져온 메시지 중 가장 최근 ts)
+        """
+        stats = {"pages": 0, "fetched": 0, "inserted": 0, "skipped": 0}
+        max_ts = None
+
+        inserted_ts = []
+        for messages in pages:
+            page_inserted_ts = self._insert_messages(cursor, messages)
+            inserted_ts.extend(page_inserted_ts)
+
+            stats["pages"] += 1
+            stats["fetched"] += len(messages)
+            stats["inserted"] += len(page_inserted_ts)
+            stats["skipped"] += len(messages) - len(page_inserted_ts)
+
+            for message in messages:
+                if max_ts is None or float(message["ts"]) > float(max_ts):
+                    max_ts = message["ts"]
+
+            if progress:
+                progress(dict(stats))
+
+        # 새로 저장된 메시지만 출석부에 반영
+        self._update_attendance(cursor, inserted_ts)
+
+        return stats, inserted_ts, max_ts
+
+    def _insert_messages(self, cursor, messages):
+        """
+        메시지들을 INSERT 한번으로 저장
+        @return 새로 저장된 메시지의 ts 리스트 (이미 있던 메시지는 제외)
+        """
+        if not messages:
+            return []
+
+        rows = []
+        for message in messages:
+            rows.append((
+                message.get("ts"),
+                get_ts_for_db(message["ts"]),
+                message.get("bot_id"),
+                message.get("type"),
+                message.get("text"),
+                message.get("user"),
+                message.get("team"),
+                json.dumps(message.get("bot_profile")) if message.get("bot_profile") else None,
+                json.dumps(message.get("attachments")) if message.get("attachments") else None
+            ))
+
+        # PostgreSQL INSERT 쿼리
+        insert_query = """
+            INSERT INTO slack_messages (
+                ts, ts_for_db, bot_id, type, text, "user", team,
+                bot_profile, attachments
+            ) VALUES %s
+            ON CONFLICT (ts) DO NOTHING
+            RETURNING ts
+        """
+        inserted = psycopg2.extras.execute_values(cursor, insert_query, rows, page_size=len(rows), fetch=True)
+
+        return [ts for (ts,) in inserted]
+
+    def _update_attendance(self, cursor, ts_list):
+        """
+        새로 저장한 메시지들로 attendance 테이블 갱신
+        @param cursor 메시지를 저장한 트랜잭션의 cursor
+        @param ts_list 새로 저장한 메시지의 ts 리스트
+        """
+        if not ts_list:
+            return
+
+        generation = self._bump_data_version(cursor)
+
+        rows = self._insert_message_authors(cursor, ts_list)
+        if not rows:
+            return
+
+        # 예전 메시지가 나중에 들어오면 (Events API 와 cron, 지난 구간 수집) 그 뒤 커밋들의 출석일이 바뀔 수 있음
+        # 이미 정한 행에 더하지 않고 작성자별로 바뀔 수 있는 날부터 message_authors 로 다시 계산
+        windows = get_recompute_windows(rows)
+        params = {"authors": list(windows), "starts": list(windows.values())}
+
+        # 동시에 저장하는 다른 트랜잭션(cron, Events API, 수집 작업)과 같은 작성자를 겹쳐서 다시 계산하지 않도록
+        # commit 까지 작성자별 lock. 데드락이 없도록 항상 같은 순서로 잡음.
+        # lock 을 잡은 뒤의 쿼리는 먼저 끝난 트랜잭션이 저장한 메시지와 출석부를 봄 (READ COMMITTED)
+        for author_name in sorted(windows):
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('attendance'), hashtext(%s))", (author_name,))
+
+        attended_dates = {author_name: set() for author_name in windows}
+        cursor.execute(RECOMPUTE_SEED_QUERY, params)
+        for author_name, attendance_date in cursor.fetchall():
+            attended_dates[author_name].add(attendance_date)
+
+        cursor.execute(RECOMPUTE_MESSAGES_QUERY, params)
+        attendance = recompute_attendance(cursor.fetchall(), attended_dates, windows, self.start_date)
+
+        cursor.execute(RECOMPUTE_DELETE_SQL, params)
+        self._upsert_attendance(cursor, attendance, generation)
+
+    def _insert_message_authors(self, cursor, ts_list):
+        """
+        새로 저장한 메시지의 커밋 작성자를 message_authors 에 추가
+        @return 커밋 (ts, ts_for_db, author_name). ts 순
+        """
+        cursor.execute(COMMIT_AUTHORS_QUERY.format(condition="AND sm.ts = ANY(%s)"), (list(ts_list),))
+        rows = cursor.fetchall()
+        if rows:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO message_authors (ts, author_name, ts_for_db) VALUES %s
+                ON CONFLICT DO NOTHING
+            """, [(ts, author_name, ts_for_db) for ts, ts_for_db, author_name in rows])
+        return rows
+
+    def add_loaded_messages(self, cursor, ts_list):
+        """
+        저장 메서드를 거치지 않고 넣은 메시지(load_bson 의 COPY)를 message_authors 와 데이터 버전에 반영
+        출석부는 바꾸지 않음. 순서 없이 들어온 메시지는 rebuild_attendance 로 한번에 계산
+        @param cursor 메시지를 넣은 트랜잭션의 cursor
+        """
+        if not ts_list:
+            return
+
+        self._bump_data_version(cursor)
+        self._insert_message_authors(cursor, ts_list)
+
+    def _upsert_attendance(self, cursor, attendance, generation):
+        """
+        다시 계산한 행으로 덮어씀. 행마다 그날의 커밋 전체로 계산한 값
+        @param generation 이번 변경의 데이터 버전. 바뀐 행에 기록
+        """
+        if not attendance:
+            return
+
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO attendance (author_name, attendance_date, first_ts, commit_count, generation)
+            VALUES %s
+            ON CONFLICT (author_name, attendance_date) DO UPDATE SET
+                first_ts = EXCLUDED.first_ts,
+                commit_count = EXCLUDED.commit_count,
+                generation = EXCLUDED.generation
+        """, [(author_name, attendance_date, first_ts, commit_count, generation)
+              for (author_name, attendance_date), (first_ts, commit_count) in attendance.items()])
+
+    def rebuild_attendance(self):
+        """
+        attendance 테이블을 slack_messages 로부터 새로 생성
+        @return 출석부 행 수
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        attendance = {}
+        try:
+            create_derived_tables(cursor)
+            cursor.execute(BACKFILL_MESSAGE_AUTHORS_SQL)
+            cursor.execute("DELETE FROM attendance")
+
+            # 전체 메시지를 서버 사이드 cursor 로 조금씩 읽으면서 출석부 생성
+            messages_cursor = conn.cursor(name="rebuild_attendance")
+            messages_cursor.itersize = FETCH_SIZE
+            messages_cursor.execute(COMMIT_AUTHORS_QUERY.format(condition=""))
+            attendance = build_attendance(messages_cursor, {}, self.start_date)
+            messages_cursor.close()
+
+            generation = self._bump_data_version(cursor, reset=True)
+            self._upsert_attendance(cursor, attendance, generation)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Error in PostgresStorage.rebuild_attendance")
+            raise
+        finally:
+            cursor.close()
+            self.release(conn)
+
+        return len(attendance)
+
+    def iter_messages(self, ts_list=None):
+        """
+        저장된 메시지를 ts 순으로 FETCH_SIZE 개씩. replica 로 복사할 때 사용
+        @param ts_list 이 메시지들만. None 이면 전체
+        @return [message dict] generator. ts_for_db 포함
+        """
+        condition = ""
+        params = ()
+        if ts_list is not None:
+            condition = "WHERE ts = ANY(%s)"
+            params = (list(ts_list),)
+
+        conn = self.connect()
+        cursor = conn.cursor(name="iter_messages")
+        cursor.itersize = FETCH_SIZE
+
+        try:
+            cursor.execute(f"""
+                SELECT ts, ts_for_db, bot_id, type, text, "user", team, bot_profile, attachments
+                FROM slack_messages
+                {condition}
+                ORDER BY ts
+            """, params)
+
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                yield [dict(zip(MESSAGE_COLUMNS, row)) for row in rows]
+        finally:
+            cursor.close()
+            self.release(conn)
+
+    def remove_all(self):
+        """수집한 slack 메시지와 출석부 삭제"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM slack_messages")
+            cursor.execute("DELETE FROM attendance")
+            self._bump_data_version(cursor, reset=True)
+            conn.commit()
+        finally:
+            cursor.close()
+            self.release(conn)
@@ -0,0 +1,199 @@
+"""
+slack_messages 와 파생 테이블 스키마
+manage.py init_schema 로 적용한다. 모든 문장은 여러번 실행해도 안전하다 (IF NOT EXISTS).
+"""
+from datetime import timedelta
+
+# Slack 메시지. MONGODB_TO_SUPABASE_MIGRATION.md 의 테이블과 같음
+SLACK_MESSAGES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS slack_messages (
+        ts VARCHAR(255) PRIMARY KEY,
+        ts_for_db TIMESTAMP,
+        bot_id VARCHAR(255),
+        type VARCHAR(50),
+        text TEXT,
+        "user" VARCHAR(255),
+        team VARCHAR(50),
+        bot_profile JSONB,
+        attachments JSONB
+    )
+"""
+
+# 메시지별 커밋 작성자. attachments 를 펼친 결과 (첨부파일의 순서와 상관 없음)
+# 유저별 커밋 메시지 조회와 출석부 재계산이 이 테이블에서 유저의 메시지를 찾음
+MESSAGE_AUTHORS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS message_authors (
+        ts VARCHAR(255) NOT NULL REFERENCES slack_messages (ts) ON DELETE CASCADE,
+        author_name VARCHAR(255) NOT NULL,
+        ts_for_db TIMESTAMP NOT NULL,
+        PRIMARY KEY (author_name, ts)
+    )
+"""
+
+# 출석부 테이블. slack_messages 에서 계산한 유저별 날짜별 첫 커밋 시각과 커밋 횟수
+ATTENDANCE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS attendance (
+        author_name VARCHAR(255) NOT NULL,
+        attendance_date DATE NOT NULL,
+        first_ts TIMESTAMP NOT NULL,
+        commit_count INTEGER NOT NULL DEFAULT 0,
+        generation BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (author_name, attendance_date)
+    )
+"""
+
+# 출석부 행이 마지막으로 바뀐 데이터 버전. delta API 에서 since 이후 바뀐 행만 보내기 위함
+ATTENDANCE_GENERATION_SQL = """
+    ALTER TABLE attendance ADD COLUMN IF NOT EXISTS generation BIGINT NOT NULL DEFAULT 0
+"""
+
+# 수집 상태 테이블. 마지막으로 수집한 메시지의 ts (high-water mark)
+COLLECT_STATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS collect_state (
+        name VARCHAR(50) PRIMARY KEY,
+        last_ts VARCHAR(20) NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )
+"""
+
+# 데이터 버전. 메시지/출석부가 바뀔 때마다 generation 증가. API 응답 캐시의 키로 사용
+DATA_VERSION_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id SMALLINT PRIMARY KEY DEFAULT 1,
+        generation BIGINT NOT NULL DEFAULT 0,
+        reset_generation BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+"""
+
+# 출석부를 새로 만들거나 지운 데이터 버전. 이보다 오래된 버전을 가진 클라이언트는 전체를 다시 받아야 함
+DATA_VERSION_RESET_SQL = """
+    ALTER TABLE data_version ADD COLUMN IF NOT EXISTS reset_generation BIGINT NOT NULL DEFAULT 0
+"""
+
+INDEX_SQLS = [
+    # 날짜 범위 조회용
+    "CREATE INDEX IF NOT EXISTS idx_ts_for_db ON slack_messages (ts_for_db)",
+    # 유저별 기간 조회용 (유저 페이지, 출석부 재계산)
+    "CREATE INDEX IF NOT EXISTS idx_message_authors_author_ts_for_db ON message_authors (author_name, ts_for_db)",
+    "CREATE INDEX IF NOT EXISTS idx_message_authors_ts ON message_authors (ts)",
+    # 특정일 출석부(미출석자 알림, get/<date>) 조회용
+    "CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (attendance_date)",
+    # delta API 조회용
+    "CREATE INDEX IF NOT EXISTS idx_attendance_generation ON attendance (generation)",
+]
+
+# 더 이상 쓰지 않는 인덱스와 컬럼. init_schema --drop-legacy 로만 삭제
+# (이름, 있는지 확인하는 쿼리, 삭제 쿼리)
+LEGACY_OBJECTS = [
+    # 첫번째 첨부파일의 작성자만 보는 인덱스. @> 조회에 쓰이지 않았음
+    ("index idx_attachments_author",
+     "SELECT to_regclass('idx_attachments_author') IS NOT NULL",
+     "DROP INDEX IF EXISTS idx_attachments_author"),
+    # attachments @> 조회용. 유저별 조회가 message_authors 를 쓰면서 필요 없어짐
+    ("index idx_slack_messages_attachments_path",
+     "SELECT to_regclass('idx_slack_messages_attachments_path') IS NOT NULL",
+     "DROP INDEX IF EXISTS idx_slack_messages_attachments_path"),
+    # 새벽 4시 기준 출석일 후보. 읽는 쿼리가 없음 (출석일은 attendance 테이블)
+    ("index idx_slack_messages_attendance_day",
+     "SELECT to_regclass('idx_slack_messages_attendance_day') IS NOT NULL",
+     "DROP INDEX IF EXISTS idx_slack_messages_attendance_day"),
+    ("column slack_messages.attendance_day",
+     """SELECT EXISTS (SELECT 1 FROM information_schema.columns
+         WHERE table_schema = current_schema() AND table_name = 'slack_messages' AND column_name = 'attendance_day')""",
+     "ALTER TABLE slack_messages DROP COLUMN IF EXISTS attendance_day"),
+]
+
+# 파생 테이블. slack_messages 가 있으면 만들 수 있는 것들
+DERIVED_TABLE_SQLS = [
+    MESSAGE_AUTHORS_TABLE_SQL,
+    ATTENDANCE_TABLE_SQL,
+    COLLECT_STATE_TABLE_SQL,
+    DATA_VERSION_TABLE_SQL,
+    ATTENDANCE_GENERATION_SQL,
+    DATA_VERSION_RESET_SQL,
+]
+
+SCHEMA_SQLS = [
+    SLACK_MESSAGES_TABLE_SQL,
+] + DERIVED_TABLE_SQLS + INDEX_SQLS
+
+# message_authors 를 slack_messages 로부터 채움
+BACKFILL_MESSAGE_AUTHORS_SQL = """
+    INSERT INTO message_authors (ts, author_name, ts_for_db)
+    SELECT DISTINCT sm.ts, attachment->>'author_name', sm.ts_for_db
+    FROM slack_messages sm,
+         LATERAL jsonb_array_elements(sm.attachments) AS attachment
+    WHERE sm.attachments IS NOT NULL
+      AND COALESCE(attachment->>'text', '') <> ''
+      AND attachment->>'author_name' IS NOT NULL
+    ON CONFLICT DO NOTHING
+"""
+
+def get_hot_queries(user, day, users):
+    """
+    인덱스를 타야 하는 자주 쓰는 쿼리들. postgres_storage.py 에서 실제로 실행하는 쿼리와 같은 것
+    @param user, day, users 실제 데이터에 있는 유저, 날짜, 명단
+    @return [(이름, 쿼리, 파라미터)]
+    """
+    from .garden import get_message_window
+    from .postgres_storage import (ATTENDANCE_BY_DATE_QUERY, ATTENDANCE_BY_USER_QUERY, ATTENDANCE_CHANGES_QUERY,
+                                   ATTENDANCE_DAYS_QUERY, FIRST_ATTENDANCES_QUERY, RECOMPUTE_MESSAGES_QUERY)
+
+    window_start, window_end = get_message_window(day, day + timedelta(days=6))
+    users = list(users)
+    return [
+        ("attendance by user",
+         ATTENDANCE_BY_USER_QUERY, {"user": user, "start": None, "end": None}),
+        ("attendance by user and range",
+         ATTENDANCE_BY_USER_QUERY, {"user": user, "start": window_start, "end": window_end}),
+        ("attendance days by user",
+         ATTENDANCE_DAYS_QUERY, {"user": user, "from": day, "to": None, "limit": 31}),
+        ("first attendances",
+         FIRST_ATTENDANCES_QUERY, {"users": users}),
+        ("attendance by date",
+         ATTENDANCE_BY_DATE_QUERY, {"date": day}),
+        ("attendance changes",
+         ATTENDANCE_CHANGES_QUERY, {"users": users, "since": 1, "generation": 2}),
+        ("recompute attendance",
+         RECOMPUTE_MESSAGES_QUERY, {"authors": [user], "starts": [window_start]}),
+    ]
+
+
+def apply_schema(cursor):
+    """테이블과 인덱스를 만들거나 컬럼을 추가. 아무것도 지우지 않음"""
+    for sql in SCHEMA_SQLS:
+        cursor.execute(sql)
+
+
+def find_legacy_objects(cursor):
+    """@return 아직 남아있는 LEGACY_OBJECTS 의 (이름, 삭제 쿼리)"""
+    found = []
+    for name, exists_sql, drop_sql in LEGACY_OBJECTS:
+        cursor.execute(exists_sql)
+        if cursor.fetchone()[0]:
+            found.append((name, drop_sql))
+    return found
+
+
+def create_derived_tables(cursor):
+    for sql in DERIVED_TABLE_SQLS:
+        cursor.execute(sql)
+
+
+def explain_hot_queries(cursor, hot_queries):
+    """
+    자주 쓰는 쿼리들의 실행계획 확인
+    데이터가 적으면 seq scan 을 고르므로 seq scan 을 끄고, 그래도 seq scan 이 남는 테이블이 없는지 확인
+    (인덱스가 없으면 seq scan 을 꺼도 seq scan 을 씀)
+    @param hot_queries get_hot_queries 결과
+    @return [(이름, 인덱스 사용 여부, 실행계획)]
+    """
+    results = []
+    cursor.execute("SET LOCAL enable_seqscan = off")
+    for name, query, params in hot_queries:
+        cursor.execute("EXPLAIN " + query, params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        results.append((name, "Seq Scan" not in plan, plan))
+    cursor.execute("SET LOCAL enable_seqscan = on")
+    return results
@@ -0,0 +1,438 @@
+"""
+SQLite 저장소
+PostgreSQL 과 같은 테이블(slack_messages, message_authors, attendance, data_version)을 로컬 파일에 두고
+Garden 의 메시지 저장, 출석부 조회, 삭제를 처리한다. 저장소 인터페이스는 storage.py 참고
+"""
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+from itertools import groupby
+
+from .garden import (build_attendance, get_message_window, get_recompute_windows, get_ts_for_db,
+                     group_attendance_by_date, recompute_attendance)
+
+# ":memory:" 이면 스레드끼리 공유하는 메모리 DB
+MEMORY_PATH = ":memory:"
+MEMORY_URI = "file:garden5?mode=memory&cache=shared"
+
+SCHEMA_SQLS = [
+    """
+    CREATE TABLE IF NOT EXISTS slack_messages (
+        ts TEXT PRIMARY KEY,
+        ts_for_db TEXT,
+        bot_id TEXT,
+        type TEXT,
+        text TEXT,
+        "user" TEXT,
+        team TEXT,
+        bot_profile TEXT,
+        attachments TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_ts_for_db ON slack_messages (ts_for_db)",
+    """
+    CREATE TABLE IF NOT EXISTS message_authors (
+        ts TEXT NOT NULL,
+        author_name TEXT NOT NULL,
+        ts_for_db TEXT NOT NULL,
+        PRIMARY KEY (author_name, ts)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS attendance (
+        author_name TEXT NOT NULL,
+        attendance_date TEXT NOT NULL,
+        first_ts TEXT NOT NULL,
+        commit_count INTEGER NOT NULL DEFAULT 0,
+        generation INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (author_name, attendance_date)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (attendance_date)",
+    """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY,
+        generation INTEGER NOT NULL,
+        reset_generation INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL
+    )
+    """,
+]
+
+# 예전 파일에 없는 컬럼 (테이블, 컬럼, 정의)
+ADDED_COLUMNS = [
+    ("attendance", "generation", "INTEGER NOT NULL DEFAULT 0"),
+    ("data_version", "reset_generation", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+INDEX_SQLS = [
+    "CREATE INDEX IF NOT EXISTS idx_attendance_generation ON attendance (generation)",
+    "CREATE INDEX IF NOT EXISTS idx_message_authors_author_ts_for_db ON message_authors (author_name, ts_for_db)",
+]
+
+
+def to_db_timestamp(value):
+    """문자열로 비교해도 시간 순서가 되도록 항상 마이크로초까지"""
+    return value.isoformat(sep=" ", timespec="microseconds")
+
+
+def from_db_timestamp(value):
+    return datetime.fromisoformat(value)
+
+
+def commit_authors(messages):
+    """
+    메시지들의 커밋 작성자. PostgresStorage 의 COMMIT_AUTHORS_QUERY 와 같은 결과
+    @param messages (ts, ts_for_db, attachments 리스트)
+    @return ts 순으로 정렬된 (ts, ts_for_db, author_name)
+    """
+    rows = set()
+    for ts, ts_for_db, attachments in messages:
+        for attachment in attachments or []:
+            if attachment.get("text") and attachment.get("author_name") is not None:
+                rows.add((ts, ts_for_db, attachment["author_name"]))
+    return sorted(rows)
+
+
+class SqliteStorage:
+    def __init__(self, path, start_date):
+        """
+        @param path SQLite 파일 경로. ":memory:" 이면 프로세스 메모리
+        @param start_date 출석 체크 시작일
+        """
+        self.path = path
+        self.start_date = start_date
+        self._local = threading.local()
+        self._keeper = None
+
+        if path == MEMORY_PATH:
+            # 마지막 연결이 닫히면 메모리 DB 가 사라지므로 하나는 계속 열어둠
+            self._keeper = sqlite3.connect(MEMORY_URI, uri=True, check_same_thread=False)
+
+        conn = self.connect()
+        with conn:
+            for sql in SCHEMA_SQLS:
+                conn.execute(sql)
+            for table, column, definition in ADDED_COLUMNS:
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            for sql in INDEX_SQLS:
+                conn.execute(sql)
+
+    def connect(self):
+        """스레드별 연결"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.path == MEMORY_PATH:
+                conn = sqlite3.connect(MEMORY_URI, uri=True)
+            else:
+                conn = sqlite3.connect(self.path)
+                # 쓰는 동안에도 다른 스레드/프로세스가 읽을 수 있도록
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def find_attendance_by_user(self, user, from_date=None, to_date=None):
+        """PostgresStorage.find_attendance_by_user 와 같은 결과 {date: [{"ts", "message"}]}"""
+        return dict(self.iter_attendance_by_user(user, from_date, to_date))
+
+    def iter_attendance_by_user(self, user, from_date=None, to_date=None):
+        """PostgresStorage.iter_attendance_by_user 와 같은 결과. (date, [{"ts", "message"}]) generator"""
+        conn = self.connect()
+        window_start, window_end = get_message_window(from_date, to_date)
+
+        attended_dates = set()
+        if from_date:
+            # from_date 0시 ~ 4시 커밋이 전날 출석인지는 전날이 그 전에 출석했는지에 달림
+            day_before = from_date - timedelta(days=1)
+            if conn.execute("SELECT 1 FROM attendance WHERE author_name = ? AND attendance_date = ? AND first_ts < ?",
+                            (user, day_before.isoformat(), to_db_timestamp(window_start))).fetchone():
+                attended_dates.add(day_before)
+
+        rows = conn.execute("""
+            SELECT sm.ts, sm.ts_for_db, json_extract(a.value, '$.text')
+            FROM message_authors ma
+            JOIN slack_messages sm ON sm.ts = ma.ts,
+                 json_each(sm.attachments) AS a
+            WHERE ma.author_name = ?
+              AND (? IS NULL OR ma.ts_for_db >= ?)
+              AND (? IS NULL OR ma.ts_for_db < ?)
+              AND json_extract(a.value, '$.author_name') = ?
+              AND COALESCE(json_extract(a.value, '$.text'), '') <> ''
+            ORDER BY sm.ts, a.key
+        """, (user,
+              *[to_db_timestamp(window_start) if window_start else None] * 2,
+              *[to_db_timestamp(window_end) if window_end else None] * 2,
+              user))
+
+        messages = ((from_db_timestamp(ts_for_db), [text for _, _, text in commits])
+                    for (_, ts_for_db), commits in groupby(rows, key=lambda row: (row[0], row[1])))
+        return group_attendance_by_date(messages, self.start_date, attended_dates, from_date, to_date)
+
+    def find_attendance_days(self, user, from_date=None, to_date=None, limit=None):
+        """PostgresStorage.find_attendance_days 와 같은 결과 [(date, first_ts)]"""
+        rows = self.connect().execute("""
+            SELECT attendance_date, first_ts
+            FROM attendance
+            WHERE author_name = ?
+              AND (? IS NULL OR attendance_date >= ?)
+              AND (? IS NULL OR attendance_date <= ?)
+            ORDER BY attendance_date
+            LIMIT ?
+        """, (user,
+              *[from_date.isoformat() if from_date else None] * 2,
+              *[to_date.isoformat() if to_date else None] * 2,
+              -1 if limit is None else limit))
+        return [(date.fromisoformat(attendance_date), from_db_timestamp(first_ts)) for attendance_date, first_ts in rows]
+
+    def find_first_attendances(self, users):
+        """@return {user: {date: first_ts}}"""
+        conn = self.connect()
+        result = {user: {} for user in users}
+        placeholders = ",".join("?" * len(result))
+        if not placeholders:
+            return result
+
+        rows = conn.execute(f"""
+            SELECT author_name, attendance_date, first_ts
+            FROM attendance
+            WHERE author_name IN ({placeholders})
+            ORDER BY author_name, attendance_date
+        """, list(result))
+        for author_name, attendance_date, first_ts in rows:
+            result[author_name][date.fromisoformat(attendance_date)] = from_db_timestamp(first_ts)
+
+        return result
+
+    def iter_first_attendances(self, users):
+        """(user, {date: first_ts}) generator. 유저마다 primary key 로 조회"""
+        conn = self.connect()
+        for user in users:
+            rows = conn.execute("SELECT attendance_date, first_ts FROM attendance"
+                                " WHERE author_name = ? ORDER BY attendance_date", (user,))
+            yield user, {date.fromisoformat(attendance_date): from_db_timestamp(first_ts)
+                         for attendance_date, first_ts in rows}
+
+    def find_attendance_by_date(self, selected_date):
+        """@return {user: first_ts}"""
+        rows = self.connect().execute("SELECT author_name, first_ts FROM attendance WHERE attendance_date = ?",
+                                      (selected_date.isoformat(),))
+        return {author_name: from_db_timestamp(first_ts) for author_name, first_ts in rows}
+
+    def get_data_version(self):
+        row = self.connect().execute("SELECT generation, updated_at FROM data_version WHERE id = 1").fetchone()
+        if row is None:
+            return 0, None
+        return row[0], datetime.fromisoformat(row[1])
+
+    def _bump_data_version(self, conn, reset=False):
+        """PostgresStorage._bump_data_version 와 같음. @return 새 generation"""
+        conn.execute("""
+            INSERT INTO data_version (id, generation, reset_generation, updated_at) VALUES (1, 1, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                generation = generation + 1,
+                reset_generation = CASE WHEN ? THEN generation + 1 ELSE reset_generation END,
+                updated_at = excluded.updated_at
+        """, (1 if reset else 0, datetime.now(timezone.utc).isoformat(), reset))
+        return conn.execute("SELECT generation FROM data_version WHERE id = 1").fetchone()[0]
+
+    def find_attendance_changes(self, since, users):
+        """PostgresStorage.find_attendance_changes 와 같은 결과"""
+        conn = self.connect()
+        row = conn.execute("SELECT generation, reset_generation FROM data_version WHERE id = 1").fetchone()
+        generation, reset_generation = row if row else (0, 0)
+        reset = since <= 0 or since < reset_generation or since > generation
+
+        users = list(users)
+        changes = []
+        if users:
+            rows = conn.execute(f"""
+                SELECT author_name, attendance_date, first_ts
+                FROM attendance
+                WHERE author_name IN ({",".join("?" * len(users))}) AND generation > ? AND generation <= ?
+                ORDER BY author_name, attendance_date
+            """, users + [-1 if reset else since, generation])
+            changes = [(author_name, date.fromisoformat(attendance_date), from_db_timestamp(first_ts))
+                       for author_name, attendance_date, first_ts in rows]
+
+        return {"version": generation, "reset": reset, "changes": changes}
+
+    def get_last_ts_for_db(self):
+        """가장 최근 메시지 시각. 없으면 None"""
+        row = self.connect().execute("SELECT MAX(ts_for_db) FROM slack_messages").fetchone()
+        return from_db_timestamp(row[0]) if row[0] else None
+
+    def save_messages(self, messages):
+        """
+        메시지 저장 후 출석부 갱신
+        @param messages Slack 메시지 dict. PostgreSQL 에서 복사한 경우 ts_for_db 포함
+        @return 새로 저장된 메시지의 ts 리스트
+        """
+        conn = self.connect()
+        with conn:
+            inserted = self._insert_messages(conn, messages)
+            if inserted:
+                generation = self._bump_data_version(conn)
+                self._update_attendance(conn, commit_authors(inserted), generation)
+
+        return [ts for ts, _, _ in inserted]
+
+    def replace_messages(self, pages):
+        """
+        저장된 메시지를 pages 의 메시지로 모두 바꾸고 출석부를 새로 생성 (replica 전체 복사)
+        한 트랜잭션이므로 중간에 실패하면 이전 내용이 그대로 남음. 그동안 다른 연결은 이전 내용을 읽음 (WAL)
+        @param pages 메시지 dict 리스트 iterable. ts_for_db 포함
+        @return 저장한 메시지 수
+        """
+        conn = self.connect()
+        count = 0
+        with conn:
+            conn.execute("DELETE FROM message_authors")
+            conn.execute("DELETE FROM attendance")
+            conn.execute("DELETE FROM slack_messages")
+            for messages in pages:
+                count += len(self._insert_messages(conn, messages))
+            self._rebuild_attendance(conn)
+
+        return count
+
+    def _insert_messages(self, conn, messages):
+        """@return 새로 저장된 메시지의 (ts, ts_for_db, attachments) 리스트"""
+        inserted = []
+        for message in messages:
+            ts_for_db = message.get("ts_for_db") or get_ts_for_db(message["ts"])
+            cursor = conn.execute("""
+                INSERT INTO slack_messages (ts, ts_for_db, bot_id, type, text, "user", team, bot_profile, attachments)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (ts) DO NOTHING
+            """, (
+                message.get("ts"),
+                to_db_timestamp(ts_for_db),
+                message.get("bot_id"),
+                message.get("type"),
+                message.get("text"),
+                message.get("user"),
+                message.get("team"),
+                json.dumps(message.get("bot_profile")) if message.get("bot_profile") else None,
+                json.dumps(message.get("attachments")) if message.get("attachments") else None,
+            ))
+            if cursor.rowcount:
+                inserted.append((message["ts"], ts_for_db, message.get("attachments")))
+
+        return inserted
+
+    def collect_messages(self, pages, progress=None):
+        """
+        PostgresStorage.collect_messages 와 같은 결과
+        새벽 4시 규칙이 맞도록 전체를 ts 순으로 정렬해서 한번에 저장
+        """
+        stats = {"pages": 0, "fetched": 0, "inserted": 0, "skipped": 0}
+        messages = []
+        for page in pages:
+            messages.extend(page)
+            stats["pages"] += 1
+            stats["fetched"] += len(page)
+            if progress:
+                progress(dict(stats))
+
+        messages.sort(key=lambda message: float(message["ts"]))
+        inserted_ts = self.save_messages(messages)
+        stats["inserted"] = len(inserted_ts)
+        stats["skipped"] = stats["fetched"] - stats["inserted"]
+        return stats, inserted_ts
+
+    def collect_new_messages(self, fetch_pages, default_oldest, overlap, name=None):
+        """
+        마지막 메시지 - overlap 부터 지금까지 수집. 수집 기록(collect_state) 대신 저장된 메시지로 정함
+        @return PostgresStorage.collect_new_messages 와 같음. last_ts 는 None
+        """
+        last_ts_for_db = self.get_last_ts_for_db()
+        if last_ts_for_db:
+            # ts_for_db 는 KST 로 저장되어 있음
+            oldest = (last_ts_for_db - timedelta(hours=9)).timestamp() - overlap
+        else:
+            oldest = default_oldest
+
+        stats, inserted_ts = self.collect_messages(fetch_pages(oldest, datetime.now().timestamp()))
+        stats["oldest"] = oldest
+        stats["last_ts"] = None
+        return stats, inserted_ts
+
+    def _update_attendance(self, conn, rows, generation):
+        """
+        새로 저장한 메시지의 (ts, ts_for_db, author_name) 로 attendance 갱신
+        SQLite 는 쓰기 트랜잭션이 하나씩만 실행되므로 PostgresStorage 처럼 작성자별 lock 이 필요 없음
+        """
+        if not rows:
+            return
+
+        conn.executemany("INSERT INTO message_authors (ts, author_name, ts_for_db) VALUES (?, ?, ?)"
+                         " ON CONFLICT DO NOTHING",
+                         [(ts, author_name, to_db_timestamp(ts_for_db)) for ts, ts_for_db, author_name in rows])
+
+        # 예전 메시지가 나중에 들어와도 rebuild 와 같도록 작성자별로 바뀔 수 있는 날부터 다시 계산
+        windows = get_recompute_windows(rows)
+        attended_dates = {}
+        recomputed = []
+        for author_name, recompute_from in windows.items():
+            day_before = recompute_from.date() - timedelta(days=1)
+            attended_dates[author_name] = set()
+            if conn.execute("SELECT 1 FROM attendance"
+                            " WHERE author_name = ? AND attendance_date = ? AND first_ts < ?",
+                            (author_name, day_before.isoformat(), to_db_timestamp(recompute_from))).fetchone():
+                attended_dates[author_name].add(day_before)
+
+            recomputed.extend((ts, from_db_timestamp(ts_for_db), author_name) for ts, ts_for_db in conn.execute(
+                "SELECT ts, ts_for_db FROM message_authors WHERE author_name = ? AND ts_for_db >= ? ORDER BY ts",
+                (author_name, to_db_timestamp(recompute_from))))
+            conn.execute("DELETE FROM attendance WHERE author_name = ? AND attendance_date >= ?",
+                         (author_name, recompute_from.date().isoformat()))
+
+        self._upsert_attendance(conn, recompute_attendance(recomputed, attended_dates, windows, self.start_date),
+                                generation)
+
+    def _upsert_attendance(self, conn, attendance, generation):
+        """다시 계산한 행으로 덮어씀. PostgresStorage._upsert_attendance 와 같음"""
+        conn.executemany("""
+            INSERT INTO attendance (author_name, attendance_date, first_ts, commit_count, generation)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (author_name, attendance_date) DO UPDATE SET
+                first_ts = excluded.first_ts,
+                commit_count = excluded.commit_count,
+                generation = excluded.generation
+        """, [(author_name, attendance_date.isoformat(), to_db_timestamp(first_ts), commit_count, generation)
+              for (author_name, attendance_date), (first_ts, commit_count) in attendance.items()])
+
+    def rebuild_attendance(self):
+        """attendance, message_authors 를 slack_messages 로부터 새로 생성. @return 출석부 행 수"""
+        conn = self.connect()
+        with conn:
+            return self._rebuild_attendance(conn)
+
+    def _rebuild_attendance(self, conn):
+        conn.execute("DELETE FROM message_authors")
+        conn.execute("DELETE FROM attendance")
+
+        messages = [(ts, from_db_timestamp(ts_for_db), json.loads(attachments) if attachments else None)
+                    for ts, ts_for_db, attachments
+                    in conn.execute("SELECT ts, ts_for_db, attachments FROM slack_messages")]
+        rows = commit_authors(messages)
+
+        conn.executemany("INSERT INTO message_authors (ts, author_name, ts_for_db) VALUES (?, ?, ?)",
+                         [(ts, author_name, to_db_timestamp(ts_for_db)) for ts, ts_for_db, author_name in rows])
+        attendance = build_attendance(rows, {}, self.start_date)
+        generation = self._bump_data_version(conn, reset=True)
+        self._upsert_attendance(conn, attendance, generation)
+
+        return len(attendance)
+
+    def remove_all(self):
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM message_authors")
+            conn.execute("DELETE FROM attendance")
+            conn.execute("DELETE FROM slack_messages")
+            self._bump_data_version(conn, reset=True)
@@ -0,0 +1,77 @@
+"""
+출석부 통계
+index.html 에서 그리는 진행률, 출석률 순위, 날짜별/요일별/시간별 출석 통계를 서버에서 한번에 계산
+"""
+from datetime import timedelta
+
+
+def get_season_dates(start_date, today, gardening_days):
+    """출석부 날짜 범위 시작일 ~ 오늘 (단, 마지막 날 까지만)"""
+    dates = []
+    day = start_date
+    while day <= today and len(dates) < gardening_days:
+        dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+
+def build_stats(matrix, start_date, today, gardening_days, include_attendances=True):
+    """
+    @param matrix 시즌 날짜로 만든 AttendanceMatrix
+    @param include_attendances False 면 유저별 출석 기록(attendances) 제외
+    @return index.html 에서 그대로 그릴 수 있는 통계
+    """
+    users = matrix.users
+    formatted_dates = [day.strftime("%Y-%m-%d") for day in matrix.dates]
+    # 요일. 일요일 0 ~ 토요일 6
+    weekdays = [(day.weekday() + 1) % 7 for day in matrix.dates]
+
+    daily_count = matrix.daily_counts()
+    daily_rates = matrix.daily_rates()
+
+    count_by_weekdays = [0] * 7
+    attendance_count_by_weekdays = [0] * 7
+    for day_idx, weekday in enumerate(weekdays):
+        count_by_weekdays[weekday] += len(users)
+        attendance_count_by_weekdays[weekday] += daily_count[day_idx]
+
+    counts = matrix.counts()
+    rates = matrix.rates()
+    ranks = matrix.ranks()
+    rows = []
+    for user_idx, user in enumerate(users):
+        row = {
+            "user": user,
+            "count": counts[user_idx],
+            "rate": rates[user_idx],
+            "rank": ranks[user_idx],
+        }
+        if include_attendances:
+            row["attendances"] = {day.strftime("%Y-%m-%d"): first_ts
+                                  for day, first_ts in matrix.attendances(user_idx).items()}
+        rows.append(row)
+
+    today_idx = matrix.date_index.get(today)
+    today_attendances = [{"name": user,
+                          "attend": matrix.first_ts(user_idx, today_idx) if today_idx is not None else None}
+                         for user_idx, user in enumerate(users)]
+
+    total_attend_count = sum(daily_count)
+
+    return {
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "today": today.strftime("%Y-%m-%d"),
+        "formatted_dates": formatted_dates,
+        "total_days": gardening_days,
+        "progressed_days": len(matrix.dates),
+        "total_attend_count": total_attend_count,
+        "total_noshow_count": len(matrix.dates) * len(users) - total_attend_count,
+        "daily_count": dict(zip(formatted_dates, daily_count)),
+        "daily_rate": [[formatted_date, rate, f"{rate}%"]
+                       for formatted_date, rate in zip(formatted_dates, daily_rates)],
+        "hourly_count": matrix.hourly_counts(),
+        "count_by_weekdays": count_by_weekdays,
+        "attendance_count_by_weekdays": attendance_count_by_weekdays,
+        "users": rows,
+        "today_attendances": today_attendances,
+    }
@@ -0,0 +1,142 @@
+"""
+메시지/출석부 저장소
+Garden 은 설정의 STORAGE BACKEND 에 맞는 저장소를 만들어서 저장과 조회를 맡긴다.
+
+STORAGE BACKEND 설정
+    postgresql  PostgreSQL 만 사용 (기본). PostgresStorage
+    sqlite      SQLite 만 사용. 오프라인 실행이나 벤치마크용. SqliteStorage
+    replica     저장은 PostgreSQL, 조회는 SQLite. 저장한 메시지를 SQLite 로 복사. ReplicaStorage
+
+저장소는 같은 메서드를 가진다
+    조회    find_attendance_by_user, iter_attendance_by_user, find_attendance_days, find_first_attendances,
+            iter_first_attendances, find_attendance_by_date, get_data_version, find_attendance_changes
+    저장    save_messages, collect_messages, collect_new_messages. 새로 저장된 메시지의 ts 를 돌려줌
+    관리    rebuild_attendance, remove_all
+"""
+import logging
+import threading
+
+from .postgres_storage import PostgresStorage
+from .sqlite_storage import SqliteStorage
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaStorage:
+    def __init__(self, primary, replica):
+        """
+        @param primary 저장하는 PostgresStorage
+        @param replica 조회하는 SqliteStorage. primary 에 새로 저장된 메시지만 복사받음
+        """
+        self.primary = primary
+        self.replica = replica
+        # 복사하지 못한 메시지 ts. 다음 sync 때 다시 복사
+        self._pending_ts = set()
+        self._lock = threading.Lock()
+
+    def find_attendance_by_user(self, user, from_date=None, to_date=None):
+        return self.replica.find_attendance_by_user(user, from_date, to_date)
+
+    def iter_attendance_by_user(self, user, from_date=None, to_date=None):
+        return self.replica.iter_attendance_by_user(user, from_date, to_date)
+
+    def find_attendance_days(self, user, from_date=None, to_date=None, limit=None):
+        return self.replica.find_attendance_days(user, from_date, to_date, limit)
+
+    def find_first_attendances(self, users):
+        return self.replica.find_first_attendances(users)
+
+    def iter_first_attendances(self, users):
+        return self.replica.iter_first_attendances(users)
+
+    def find_attendance_by_date(self, selected_date):
+        return self.replica.find_attendance_by_date(selected_date)
+
+    def get_data_version(self):
+        return self.replica.get_data_version()
+
+    def find_attendance_changes(self, since, users):
+        return self.replica.find_attendance_changes(since, users)
+
+    def save_messages(self, messages):
+        inserted_ts = self.primary.save_messages(messages)
+        self.sync(inserted_ts)
+        return inserted_ts
+
+    def collect_messages(self, pages, progress=None):
+        stats, inserted_ts = self.primary.collect_messages(pages, progress)
+        self.sync(inserted_ts)
+        return stats, inserted_ts
+
+    def collect_new_messages(self, fetch_pages, default_oldest, overlap, name):
+        stats, inserted_ts = self.primary.collect_new_messages(fetch_pages, default_oldest, overlap, name)
+        self.sync(inserted_ts)
+        return stats, inserted_ts
+
+    def rebuild_attendance(self):
+        """PostgreSQL 출석부를 새로 만들고, SQLite 는 PostgreSQL 전체 복사본으로 바꿈"""
+        count = self.primary.rebuild_attendance()
+        self.sync()
+        return count
+
+    def remove_all(self):
+        self.primary.remove_all()
+        self.replica.remove_all()
+        with self._lock:
+            self._pending_ts.clear()
+
+    @property
+    def pending_ts(self):
+        """복사하지 못해서 다음 sync 를 기다리는 메시지 ts"""
+        with self._lock:
+            return frozenset(self._pending_ts)
+
+    def sync(self, ts_list=None):
+        """
+        PostgreSQL 의 메시지를 ts 순으로 SQLite 로 복사
+        지난 구간 수집이나 load_bson 으로 예전 메시지가 들어와도 빠지지 않도록 시각이 아닌 저장된 ts 로 고름
+        @param ts_list 복사할 메시지. 지난번에 복사하지 못한 메시지도 같이 복사.
+                       None 이면 SQLite 전체를 한 트랜잭션에서 바꿈. 실패하면 예외가 나고 SQLite 는 그대로
+        @return SQLite 에 새로 저장된 메시지 수
+        """
+        if ts_list is None:
+            return self._sync_all()
+
+        with self._lock:
+            ts_list = self._pending_ts.union(ts_list)
+            self._pending_ts.clear()
+        if not ts_list:
+            return 0
+
+        # 이미 PostgreSQL 에 저장되었으므로 저장한 쪽은 실패로 돌리지 않고, 복사하지 못한 메시지는 다음 sync 때 다시
+        # 일부 batch 가 복사되었어도 전체를 다시 복사. 이미 있는 메시지는 건너뜀
+        inserted = 0
+        try:
+            for messages in self.primary.iter_messages(ts_list):
+                inserted += len(self.replica.save_messages(messages))
+        except Exception:
+            logger.exception("Error in ReplicaStorage.sync. %d messages will be copied at the next sync", len(ts_list))
+            with self._lock:
+                self._pending_ts.update(ts_list)
+
+        return inserted
+
+    def _sync_all(self):
+        with self._lock:
+            pending_ts = set(self._pending_ts)
+
+        count = self.replica.replace_messages(self.primary.iter_messages())
+
+        # 복사하는 동안 실패한 메시지는 전체 복사에 빠졌을 수 있으므로 남겨둠
+        with self._lock:
+            self._pending_ts -= pending_ts
+        return count
+
+
+def create_storage(config):
+    """@param config GardenConfig. storage_backend 에 맞는 저장소"""
+    if config.storage_backend == "sqlite":
+        return SqliteStorage(config.sqlite_path, config.start_date)
+    if config.storage_backend == "replica":
+        return ReplicaStorage(PostgresStorage(config), SqliteStorage(config.sqlite_path, config.start_date))
+    return PostgresStorage(config)
@@ -1,3 +1,1056 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from io import StringIO
+from types import MappingProxyType
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from slack_sdk.signature import SignatureVerifier
+
+from . import db_pool, garden_config, jobs
+from .garden import Garden, build_attendance, get_attendance_date, parse_delta_version
+from .garden_config import GardenConfig
+from .http_cache import get_version_headers
+from .management.commands import init_schema, load_bson
+from .markdown_slack_extension import convert_slack_markdown, slack_to_html, slack_to_markdown
+from .matrix import AttendanceMatrix
+from .metrics import TimingMiddleware
+from .sqlite_storage import SqliteStorage, from_db_timestamp
+from .stats import build_stats, get_season_dates
+from .storage import ReplicaStorage
+from .views import iter_json_array
+
+START_DATE = date(2020, 3, 2)
+TESTDATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+
+
+def kst(day, hour, minute=0):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour, minutes=minute)
+
+
+def make_config(users=("alice", "bob", "carol"), **fields):
+    """테스트용 GardenConfig. SQLite 백엔드"""
+    # users.yaml 과 같은 형식
+    users_with_slackname = MappingProxyType({user: {"slack": f"{user}-slack"} for user in users})
+    values = dict(
+        slack_api_token="xoxb-test", slack_signing_secret="test-signing-secret", channel_id="CTEST",
+        pg_database="postgres", pg_host="localhost", pg_port="5432", pg_user="postgres", pg_password="",
+        pg_schema="garden5", pg_pool_min=1, pg_pool_max=1, pg_sslmode="disable",
+        storage_backend="sqlite", sqlite_path=":memory:",
+        gardening_days="100", start_date=START_DATE,
+        users_with_slackname=users_with_slackname, users=tuple(users_with_slackname), mtimes=(None, None),
+    )
+    values.update(fields)
+    return GardenConfig(**values)
+
+
+def commit_message(ts_for_db, author_name):
+    return {
+        "ts": "%d.000100" % ts_for_db.timestamp(),
+        "ts_for_db": ts_for_db,
+        "type": "message",
+        "attachments": [{"author_name": author_name, "text": "commit"}],
+    }
+
+
+class AttendanceDateTest(SimpleTestCase):
+    """새벽 4시 규칙"""
+
+    def test_daytime_commit_is_same_day(self):
+        day = START_DATE + timedelta(days=3)
+        self.assertEqual(get_attendance_date(kst(day, 15), START_DATE, set()), day)
+
+    def test_early_commit_counts_for_previous_day(self):
+        day = START_DATE + timedelta(days=3)
+        self.assertEqual(get_attendance_date(kst(day, 3, 59), START_DATE, set()), day - timedelta(days=1))
+
+    def test_early_commit_after_previous_day_attended_is_same_day(self):
+        day = START_DATE + timedelta(days=3)
+        attended = {day - timedelta(days=1)}
+        self.assertEqual(get_attendance_date(kst(day, 2), START_DATE, attended), day)
+
+    def test_four_oclock_is_same_day(self):
+        day = START_DATE + timedelta(days=3)
+        self.assertEqual(get_attendance_date(kst(day, 4), START_DATE, set()), day)
+
+    def test_no_previous_day_before_start_date(self):
+        self.assertEqual(get_attendance_date(kst(START_DATE, 1), START_DATE, set()), START_DATE)
+
+
+class BuildAttendanceTest(SimpleTestCase):
+    def test_first_ts_and_commit_count(self):
+        day = START_DATE + timedelta(days=1)
+        rows = [
+            ("1", kst(day, 9), "alice"),
+            ("2", kst(day, 10), "bob"),
+            ("3", kst(day, 11), "alice"),
+        ]
+        attendance = build_attendance(rows, {}, START_DATE)
+        self.assertEqual(attendance, {
+            ("alice", day): [kst(day, 9), 2],
+            ("bob", day): [kst(day, 10), 1],
+        })
+
+    def test_only_first_early_commit_goes_to_previous_day(self):
+        day = START_DATE + timedelta(days=1)
+        next_day = day + timedelta(days=1)
+        rows = [
+            ("1", kst(next_day, 1), "alice"),
+            ("2", kst(next_day, 2), "alice"),
+        ]
+        attended_dates = {}
+        attendance = build_attendance(rows, attended_dates, START_DATE)
+        self.assertEqual(attendance, {
+            ("alice", day): [kst(next_day, 1), 1],
+            ("alice", next_day): [kst(next_day, 2), 1],
+        })
+        self.assertEqual(attended_dates, {"alice": {day, next_day}})
+
+    def test_already_attended_dates_are_respected(self):
+        day = START_DATE + timedelta(days=1)
+        next_day = day + timedelta(days=1)
+        attendance = build_attendance([("1", kst(next_day, 1), "alice")], {"alice": {day}}, START_DATE)
+        self.assertEqual(attendance, {("alice", next_day): [kst(next_day, 1), 1]})
+
+
+class SlackMarkdownTest(SimpleTestCase):
+    def test_slack_tokens(self):
+        self.assertEqual(
+            slack_to_markdown("<https://github.com/alice/TIL|TIL> by <@U0ALICE> in <#C0GARDEN5|garden>"),
+            "[TIL](https://github.com/alice/TIL) by @U0ALICE in #garden")
+
+    def test_tokens_inside_inline_code_are_converted(self):
+        # 한번의 스캔으로 바꾸기 전과 같이 인라인 코드 안도 변환
+        self.assertEqual(slack_to_markdown("see `<https://a.example|a>` and `<@U0ALICE>`"),
+                         "see `[a](https://a.example)` and `@U0ALICE`")
+        self.assertEqual(convert_slack_markdown("`<https://a.example|a>`"),
+                         "<p><code>[a](https://a.example)</code></p>")
+
+    def test_slack_to_html(self):
+        self.assertEqual(slack_to_html("<https://github.com/alice/TIL/commit/abc|`abc`> - fix `x`"),
+                         '<a href="https://github.com/alice/TIL/commit/abc"><code>abc</code></a> - fix `x`')
+        self.assertEqual(slack_to_html("<#C0GARDEN5|garden> <@U0ALICE>"), '<a href="#C0GARDEN5">garden</a> <@U0ALICE>')
+
+
+class AttendanceMatrixTest(SimpleTestCase):
+    def make_matrix(self, attend_dict, days=5, users=("alice", "bob", "carol")):
+        dates = [START_DATE + timedelta(days=n) for n in range(days)]
+        return AttendanceMatrix.from_attendances(users, attend_dict, dates)
+
+    def attend(self, *day_numbers, hour=9):
+        return {START_DATE + timedelta(days=n): kst(START_DATE + timedelta(days=n), hour) for n in day_numbers}
+
+    def test_counts_and_daily_counts(self):
+        matrix = self.make_matrix({"alice": self.attend(0, 1, 2), "bob": self.attend(1)})
+        self.assertEqual(matrix.counts(), [3, 1, 0])
+        self.assertEqual(matrix.daily_counts(), [1, 2, 1, 0, 0])
+        self.assertEqual(matrix.attendees(1), ["alice", "bob"])
+        self.assertEqual(matrix.no_shows(1), ["carol"])
+        self.assertEqual(matrix.no_shows(4), ["alice", "bob", "carol"])
+
+    def test_dates_outside_season_are_ignored(self):
+        matrix = self.make_matrix({"alice": self.attend(0, 10)})
+        self.assertEqual(matrix.counts(), [1, 0, 0])
+
+    def test_longest_streak(self):
+        matrix = self.make_matrix({"alice": self.attend(0, 1, 3, 4), "bob": self.attend(0, 1, 2, 3, 4)})
+        self.assertEqual([matrix.longest_streak(idx) for idx in range(3)], [2, 5, 0])
+
+    def test_current_streak_when_last_day_not_attended_yet(self):
+        # 오늘 아직 출석 전이면 어제까지의 연속 출석
+        matrix = self.make_matrix({"alice": self.attend(1, 2, 3), "bob": self.attend(2, 3, 4)})
+        self.assertEqual(matrix.current_streak(0), 3)
+        self.assertEqual(matrix.current_streak(1), 3)
+        self.assertEqual(matrix.current_streak(2), 0)
+
+    def test_current_streak_on_day(self):
+        matrix = self.make_matrix({"alice": self.attend(0, 1, 3)})
+        self.assertEqual(matrix.current_streak(0, 1), 2)
+        self.assertEqual(matrix.current_streak(0, 2), 0)
+        self.assertEqual(matrix.current_streak(0, 3), 1)
+
+    def test_ranks_share_rank_on_ties(self):
+        matrix = self.make_matrix({"alice": self.attend(0, 1), "bob": self.attend(2, 3), "carol": self.attend(0)})
+        self.assertEqual(matrix.ranks(), [1, 1, 3])
+        self.assertEqual([row["user"] for row in matrix.leaderboard()], ["alice", "bob", "carol"])
+
+    def test_empty_season(self):
+        matrix = self.make_matrix({"alice": self.attend(0)}, days=0)
+        self.assertEqual(matrix.counts(), [0, 0, 0])
+        self.assertEqual(matrix.rates(), [0, 0, 0])
+        self.assertEqual(matrix.current_streak(0), 0)
+        self.assertEqual(matrix.longest_streak(0), 0)
+        self.assertEqual(matrix.to_columnar(), {"dates": [], "users": ["alice", "bob", "carol"],
+                                                "bits": ["0", "0", "0"], "minutes": [[], [], []]})
+
+    def test_first_ts_round_trip(self):
+        first_ts = kst(START_DATE + timedelta(days=1), 13, 27) + timedelta(seconds=5, microseconds=7)
+        matrix = self.make_matrix({"alice": {START_DATE + timedelta(days=1): first_ts}})
+        self.assertEqual(matrix.first_ts(0, 1), first_ts)
+        self.assertIsNone(matrix.first_ts(0, 0))
+        self.assertEqual(matrix.attendances(0), {START_DATE + timedelta(days=1): first_ts})
+
+    def test_early_commit_offsets(self):
+        # 새벽 커밋으로 출석한 날은 출석일 0시 기준 24시간 이상
+        day = START_DATE + timedelta(days=2)
+        matrix = self.make_matrix({"alice": {day: kst(day + timedelta(days=1), 2, 30)}})
+        self.assertEqual(matrix.hourly_counts()[2], 1)
+        columnar = matrix.to_columnar()
+        self.assertEqual(columnar["bits"][0], "4")
+        self.assertEqual(columnar["minutes"][0], [24 * 60 + 150])
+
+    def test_to_columnar(self):
+        matrix = self.make_matrix({"alice": self.attend(0, 3), "bob": self.attend(4, hour=23)})
+        columnar = matrix.to_columnar()
+        self.assertEqual(columnar["dates"][0], "2020-03-02")
+        self.assertEqual(columnar["bits"], ["9", "10", "0"])
+        self.assertEqual(columnar["minutes"], [[540, 540], [1380], []])
+
+
+class StatsTest(SimpleTestCase):
+    def test_season_dates(self):
+        self.assertEqual(get_season_dates(START_DATE, START_DATE + timedelta(days=2), 100),
+                         [START_DATE + timedelta(days=n) for n in range(3)])
+        # 시즌이 끝난 뒤에는 마지막 날까지만
+        self.assertEqual(len(get_season_dates(START_DATE, START_DATE + timedelta(days=200), 100)), 100)
+        self.assertEqual(get_season_dates(START_DATE, START_DATE - timedelta(days=1), 100), [])
+
+    def test_build_stats(self):
+        # 2020-03-02(월) ~ 03-05(목). alice 월화수 9시, bob 화 23시 목 9시, carol/dave 출석 없음
+        dates = [START_DATE + timedelta(days=n) for n in range(4)]
+        matrix = AttendanceMatrix.from_attendances(["alice", "bob", "carol", "dave"], {
+            "alice": {day: kst(day, 9) for day in dates[:3]},
+            "bob": {dates[1]: kst(dates[1], 23), dates[3]: kst(dates[3], 9)},
+        }, dates)
+
+        stats = build_stats(matrix, START_DATE, dates[3], 100)
+
+        self.assertEqual(stats["formatted_dates"], ["2020-03-02", "2020-03-03", "2020-03-04", "2020-03-05"])
+        self.assertEqual((stats["total_days"], stats["progressed_days"]), (100, 4))
+        self.assertEqual((stats["total_attend_count"], stats["total_noshow_count"]), (5, 11))
+        self.assertEqual(stats["daily_count"], {"2020-03-02": 1, "2020-03-03": 2, "2020-03-04": 1, "2020-03-05": 1})
+        self.assertEqual(stats["daily_rate"][1], ["2020-03-03", 50.0, "50.0%"])
+        hourly_count = [0] * 24
+        hourly_count[9], hourly_count[23] = 4, 1
+        self.assertEqual(stats["hourly_count"], hourly_count)
+        # 일요일 0 ~ 토요일 6
+        self.assertEqual(stats["count_by_weekdays"], [0, 4, 4, 4, 4, 0, 0])
+        self.assertEqual(stats["attendance_count_by_weekdays"], [0, 1, 2, 1, 1, 0, 0])
+        self.assertEqual([(row["user"], row["count"], row["rate"], row["rank"]) for row in stats["users"]],
+                         [("alice", 3, 75.0, 1), ("bob", 2, 50.0, 2), ("carol", 0, 0.0, 3), ("dave", 0, 0.0, 3)])
+        self.assertEqual(stats["users"][1]["attendances"],
+                         {"2020-03-03": kst(dates[1], 23), "2020-03-05": kst(dates[3], 9)})
+        self.assertEqual([row["attend"] for row in stats["today_attendances"]], [None, kst(dates[3], 9), None, None])
+
+        self.assertNotIn("attendances", build_stats(matrix, START_DATE, dates[3], 100, False)["users"][0])
+
+
+class IncrementalAttendanceTest(SimpleTestCase):
+    """메시지가 ts 순서와 다르게 들어와도 출석부가 rebuild 와 같아야 함"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.storage = SqliteStorage(os.path.join(tmpdir.name, "garden5.sqlite3"), START_DATE)
+
+    def attendance_dates(self, user):
+        return [attendance_date for attendance_date, _ in self.storage.find_attendance_days(user)]
+
+    def ledger(self):
+        return self.storage.connect().execute(
+            "SELECT author_name, attendance_date, first_ts, commit_count FROM attendance"
+            " ORDER BY author_name, attendance_date").fetchall()
+
+    def assert_same_as_rebuild(self):
+        incremental = self.ledger()
+        self.storage.rebuild_attendance()
+        self.assertEqual(incremental, self.ledger())
+
+    def test_older_commit_saved_later(self):
+        day = START_DATE + timedelta(days=3)
+        self.storage.save_messages([commit_message(kst(day, 2), "alice")])
+        self.assertEqual(self.attendance_dates("alice"), [day - timedelta(days=1)])
+
+        # 전날 오후 커밋이 나중에 들어오면 새벽 커밋은 당일 출석
+        self.storage.save_messages([commit_message(kst(day - timedelta(days=1), 15), "alice")])
+        self.assertEqual(self.attendance_dates("alice"), [day - timedelta(days=1), day])
+        self.assert_same_as_rebuild()
+
+    def test_commit_counts_after_out_of_order_saves(self):
+        day = START_DATE + timedelta(days=3)
+        self.storage.save_messages([commit_message(kst(day, 10), "alice"), commit_message(kst(day, 1), "bob")])
+        self.storage.save_messages([commit_message(kst(day, 9), "alice"),
+                                    commit_message(kst(day - timedelta(days=1), 23), "bob")])
+        self.storage.save_messages([commit_message(kst(day, 9), "alice")])
+        self.assert_same_as_rebuild()
+        self.assertEqual(self.attendance_dates("bob"), [day - timedelta(days=1), day])
+        self.assertEqual(self.storage.find_attendance_days("alice"), [(day, kst(day, 9))])
+
+    def test_overlapping_batches(self):
+        day = START_DATE + timedelta(days=3)
+        messages = [commit_message(kst(day + timedelta(days=offset // 3), 1 + offset % 3 * 8), author)
+                    for offset in range(9) for author in ("alice", "bob")]
+        # 수집 구간이 겹쳐서 같은 메시지가 여러 batch 에 다시 들어옴
+        for start in (6, 0, 3, 9, 1):
+            self.storage.save_messages(messages[start:start + 8])
+        self.assert_same_as_rebuild()
+
+    def test_concurrent_overlapping_saves(self):
+        day = START_DATE + timedelta(days=3)
+        messages = [commit_message(kst(day, hour), author) for hour in range(0, 24, 2) for author in ("alice", "bob")]
+        batches = [messages[start:start + 10] for start in range(0, len(messages), 4)]
+
+        threads = [threading.Thread(target=self.storage.save_messages, args=(batch,)) for batch in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.storage.find_attendance_days("alice"), [(day - timedelta(days=1), kst(day, 0)),
+                                                                      (day, kst(day, 2))])
+        self.assert_same_as_rebuild()
+
+
+class SqlitePrimary(SqliteStorage):
+    """ReplicaStorage 테스트에서 PostgresStorage 대신 쓰는 primary"""
+
+    def iter_messages(self, ts_list=None):
+        rows = self.connect().execute("SELECT ts, ts_for_db, type, attachments FROM slack_messages ORDER BY ts")
+        yield [{"ts": ts, "ts_for_db": from_db_timestamp(ts_for_db), "type": message_type,
+                "attachments": json.loads(attachments) if attachments else None}
+               for ts, ts_for_db, message_type, attachments in rows if ts_list is None or ts in ts_list]
+
+
+class ReplicaStorageTest(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.primary = SqlitePrimary(os.path.join(tmpdir.name, "primary.sqlite3"), START_DATE)
+        self.replica = SqliteStorage(os.path.join(tmpdir.name, "replica.sqlite3"), START_DATE)
+        self.storage = ReplicaStorage(self.primary, self.replica)
+
+    def test_backfilled_messages_are_copied(self):
+        day = START_DATE + timedelta(days=10)
+        self.storage.save_messages([commit_message(kst(day, 15), "alice")])
+        # 지난 구간 수집. 마지막 메시지보다 훨씬 예전 메시지도 복사됨
+        self.storage.save_messages([commit_message(kst(START_DATE, 15), "alice")])
+        self.assertEqual([attendance_date for attendance_date, _ in self.storage.find_attendance_days("alice")],
+                         [START_DATE, day])
+
+    def test_rebuild_copies_messages_saved_elsewhere(self):
+        day = START_DATE + timedelta(days=3)
+        self.storage.save_messages([commit_message(kst(day, 15), "alice")])
+        # load_bson 처럼 primary 에 직접 저장
+        self.primary.save_messages([commit_message(kst(day, 16), "bob")])
+        self.assertEqual(self.storage.find_attendance_by_date(day), {"alice": kst(day, 15)})
+
+        self.storage.rebuild_attendance()
+        self.assertEqual(self.storage.find_attendance_by_date(day), {"alice": kst(day, 15), "bob": kst(day, 16)})
+
+    def test_failed_full_sync_keeps_replica(self):
+        day = START_DATE + timedelta(days=3)
+        self.storage.save_messages([commit_message(kst(day, 15), "alice")])
+        self.primary.save_messages([commit_message(kst(day, 16), "bob")])
+
+        def broken_pages(ts_list=None):
+            yield from SqlitePrimary.iter_messages(self.primary, ts_list)
+            raise ConnectionError("connection lost")
+
+        with mock.patch.object(self.primary, "iter_messages", broken_pages):
+            with self.assertRaises(ConnectionError):
+                self.storage.sync()
+        self.assertEqual(self.storage.find_attendance_by_date(day), {"alice": kst(day, 15)})
+
+    def test_failed_sync_is_retried(self):
+        day = START_DATE + timedelta(days=3)
+        message = commit_message(kst(day, 15), "alice")
+        with mock.patch.object(self.replica, "save_messages", side_effect=OSError("disk full")):
+            with self.assertLogs("attendance.storage", "ERROR"):
+                self.storage.save_messages([message])
+        self.assertEqual(self.storage.pending_ts, {message["ts"]})
+        self.assertEqual(self.storage.find_attendance_by_date(day), {})
+
+        self.storage.save_messages([commit_message(kst(day, 16), "bob")])
+        self.assertEqual(self.storage.pending_ts, set())
+        self.assertEqual(self.storage.find_attendance_by_date(day), {"alice": kst(day, 15), "bob": kst(day, 16)})
+
+
+class FakeConnection:
+    """psycopg2 커넥션 흉내. 풀 테스트용"""
+
+    def __init__(self):
+        self.closed = 0
+
+    def cursor(self):
+        return mock.MagicMock()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return db_pool.psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(db_pool.psycopg2, "connect", side_effect=lambda **kwargs: FakeConnection())
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuses_connections(self):
+        pool = db_pool.ConnectionPool(1, 2, "garden5")
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_exhausted_pool_times_out(self):
+        pool = db_pool.ConnectionPool(0, 1, "garden5", timeout=0.05)
+        conn = pool.getconn()
+
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.getconn()
+        stats = pool.stats()
+        self.assertEqual((stats["timeouts"], stats["borrowed"], stats["size"]), (1, 1, 1))
+
+        # 반납되면 기다리던 쪽이 받음
+        threading.Timer(0.05, pool.putconn, (conn,)).start()
+        pool.timeout = 5
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(pool.stats()["wait_count"], 1)
+
+    def test_closed_connection_is_replaced(self):
+        pool = db_pool.ConnectionPool(1, 1, "garden5")
+        conn = pool.getconn()
+        conn.close()
+        pool.putconn(conn)
+        self.assertEqual(pool.stats()["size"], 0)
+
+        self.assertIsNot(pool.getconn(), conn)
+        self.assertEqual(pool.stats()["connections_created"], 2)
+
+    def test_counters_under_concurrency(self):
+        pool = db_pool.ConnectionPool(0, 4, "garden5")
+
+        def borrow():
+            for _ in range(50):
+                pool.putconn(pool.getconn())
+
+        threads = [threading.Thread(target=borrow) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        self.assertEqual(stats["borrow_count"], 400)
+        self.assertEqual(stats["borrowed"], 0)
+        self.assertEqual(stats["connections_created"], self.connect.call_count)
+        self.assertEqual(stats["size"], stats["idle"])
+        self.assertLessEqual(stats["size"], 4)
+
+
+class TimingMiddlewareTest(SimpleTestCase):
+    def test_sync_response(self):
+        middleware = TimingMiddleware(lambda request: HttpResponse())
+        self.assertFalse(iscoroutinefunction(middleware))
+        response = middleware(RequestFactory().get("/"))
+        self.assertIn("total;dur=", response.headers["Server-Timing"])
+
+    def test_async_response_stays_async(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = TimingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertIn("total;dur=", response.headers["Server-Timing"])
+
+
+class VersionHeadersTest(SimpleTestCase):
+    version = (3, datetime(2020, 3, 5, 12, 0))
+
+    def test_roster_change_changes_etag(self):
+        config = make_config()
+        etag, _ = get_version_headers(self.version, config)
+        self.assertEqual(etag, get_version_headers(self.version, make_config())[0])
+        self.assertNotEqual(etag, get_version_headers(self.version, make_config(users=("alice", "bob")))[0])
+        self.assertNotEqual(etag, get_version_headers(self.version, replace(config, start_date=date(2020, 3, 3)))[0])
+        self.assertNotEqual(etag, get_version_headers((4, self.version[1]), config)[0])
+
+    def test_last_modified_includes_config_mtime(self):
+        config = replace(make_config(), mtimes=(2_000_000_000 * 10 ** 9, None))
+        _, last_modified = get_version_headers(self.version, config)
+        self.assertEqual(last_modified, 2_000_000_000)
+
+    def test_vary_on_date(self):
+        config = make_config()
+        etag, _ = get_version_headers(self.version, config, date(2020, 3, 6))
+        self.assertTrue(etag.endswith('-20200306"'))
+        self.assertNotEqual(etag, get_version_headers(self.version, config, date(2020, 3, 7))[0])
+
+
+class DeltaVersionTest(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.sqlite_path = os.path.join(tmpdir.name, "garden5.sqlite3")
+
+    def make_garden(self, users):
+        return Garden(make_config(users=users, sqlite_path=self.sqlite_path))
+
+    def test_parse_delta_version(self):
+        self.assertEqual(parse_delta_version("12-abcd1234", "abcd1234"), 12)
+        self.assertEqual(parse_delta_version("12-abcd1234", "ffff0000"), 0)
+        self.assertEqual(parse_delta_version("12", "abcd1234"), 0)
+        self.assertEqual(parse_delta_version("x-abcd1234", "abcd1234"), 0)
+        self.assertEqual(parse_delta_version(None, "abcd1234"), 0)
+
+    def test_new_member_resets_delta(self):
+        day = START_DATE + timedelta(days=1)
+        garden = self.make_garden(("alice",))
+        garden.save_slack_messages([commit_message(kst(day, 9), "alice"), commit_message(kst(day, 10), "bob")])
+
+        first = garden.find_attendance_changes(None)
+        self.assertTrue(first["reset"])
+        self.assertEqual([change[0] for change in first["changes"]], ["alice"])
+        self.assertEqual(garden.find_attendance_changes(first["version"]), dict(first, reset=False, changes=[]))
+
+        # bob 이 명단에 추가되면 bob 의 기존 출석도 받아야 함
+        garden = self.make_garden(("alice", "bob"))
+        delta = garden.find_attendance_changes(first["version"])
+        self.assertTrue(delta["reset"])
+        self.assertEqual([change[0] for change in delta["changes"]], ["alice", "bob"])
+        self.assertNotEqual(delta["version"], first["version"])
+
+
+class CollectJobTest(SimpleTestCase):
+    def test_subtract_windows(self):
+        self.assertEqual(jobs.subtract_windows([(2, 10)], [(5, 12)]), [(2, 5)])
+        self.assertEqual(jobs.subtract_windows([(2, 10)], [(4, 6), (8, 9)]), [(2, 4), (6, 8), (9, 10)])
+        self.assertEqual(jobs.subtract_windows([(2, 10)], [(0, 20)]), [])
+        self.assertEqual(jobs.subtract_windows([(2, 10)], [(10, 12)]), [(2, 10)])
+
+    def test_overlapping_windows_are_collected_once(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def collect(oldest, latest, progress=None):
+            calls.append((oldest, latest))
+            started.set()
+            release.wait(5)
+            return {"pages": 1, "fetched": 2, "inserted": 1, "skipped": 1}
+
+        first, created = jobs.submit_collect(collect, 2, 10)
+        self.assertTrue(created)
+        self.assertTrue(started.wait(5))
+
+        second, created = jobs.submit_collect(collect, 5, 12)
+        self.assertTrue(created)
+        self.assertEqual(second.windows, [(10, 12)])
+
+        same, created = jobs.submit_collect(collect, 3, 8)
+        self.assertFalse(created)
+        self.assertIs(same, first)
+
+        release.set()
+        jobs._collect_executor.submit(lambda: None).result(5)
+        self.assertEqual(calls, [(2, 10), (10, 12)])
+        self.assertEqual((first.status, second.status), ("done", "done"))
+        self.assertEqual(second.stats, {"pages": 1, "fetched": 2, "inserted": 1, "skipped": 1})
+
+        # 끝난 작업과는 겹쳐도 다시 수집
+        third, created = jobs.submit_collect(collect, 3, 8)
+        self.assertTrue(created)
+        self.assertEqual(third.windows, [(3, 8)])
+        jobs._collect_executor.submit(lambda: None).result(5)
+
+
+class LoadBsonTest(SimpleTestCase):
+    def test_iter_bson_documents(self):
+        first = load_bson.bson.encode({"ts": "1583150400.000100", "text": "a"})
+        second = load_bson.bson.encode({"ts": "1583150400.000200", "text": "b"})
+        buffer = first + second
+
+        self.assertEqual(list(load_bson.iter_bson_documents(buffer)), [
+            ({"ts": "1583150400.000100", "text": "a"}, len(first)),
+            ({"ts": "1583150400.000200", "text": "b"}, len(buffer)),
+        ])
+        # --offset 으로 이어서 읽기
+        self.assertEqual([offset for _, offset in load_bson.iter_bson_documents(buffer, len(first))], [len(buffer)])
+
+    def test_truncated_last_document(self):
+        first = load_bson.bson.encode({"ts": "1583150400.000100"})
+        second = load_bson.bson.encode({"ts": "1583150400.000200"})
+
+        for buffer in (first + second[:-3], first + second[:2]):
+            documents = load_bson.iter_bson_documents(buffer)
+            self.assertEqual(next(documents)[1], len(first))
+            with self.assertRaisesMessage(CommandError, f"broken BSON document at byte offset {len(first)}"):
+                next(documents)
+
+    def test_to_copy_line(self):
+        line = load_bson.to_copy_line({
+            "ts": "1583150400.000100", "type": "message", "text": "a\tb\nc\\d\re",
+            "bot_profile": {"name": "garden"},
+        })
+
+        self.assertTrue(line.endswith("\n"))
+        self.assertEqual(line[:-1].split("\t"), [
+            "1583150400.000100", "2020-03-02 21:00:00.000100", "\\N", "message", "a\\tb\\nc\\\\d\\re",
+            "\\N", "\\N", '{"name": "garden"}', "\\N",
+        ])
+        self.assertIsNone(load_bson.to_copy_line({"type": "message", "text": "no ts"}))
+
+    def test_empty_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".bson") as f, \
+                mock.patch.object(load_bson, "get_garden") as get_garden:
+            out = StringIO()
+            call_command("load_bson", f.name, stdout=out)
+
+        self.assertIn("nothing to load", out.getvalue())
+        get_garden.return_value.connect_postgres.assert_not_called()
+
+
+class InitSchemaTest(SimpleTestCase):
+    class LegacyCursor:
+        """레거시 인덱스와 컬럼이 모두 남아있는 DB 흉내. 실행한 쿼리를 기록"""
+
+        def __init__(self):
+            self.executed = []
+            self.result = None
+
+        def execute(self, sql, params=None):
+            self.executed.append(sql)
+            self.result = (True,) if "to_regclass" in sql or "information_schema" in sql else None
+
+        def fetchone(self):
+            return self.result
+
+        def close(self):
+            pass
+
+    def run_init_schema(self, *args):
+        cursor = self.LegacyCursor()
+        out = StringIO()
+        with mock.patch.object(init_schema, "get_garden") as get_garden, \
+                mock.patch.object(init_schema, "explain_hot_queries", return_value=[]):
+            get_garden.return_value.connect_postgres.return_value.cursor.return_value = cursor
+            get_garden.return_value.users = ["alice"]
+            get_garden.return_value.start_date = START_DATE
+            call_command("init_schema", "--skip-backfill", *args, stdout=out)
+        drops = [sql for sql in cursor.executed if "DROP" in sql]
+        return drops, out.getvalue()
+
+    def test_legacy_objects_are_kept_by_default(self):
+        drops, out = self.run_init_schema()
+
+        self.assertEqual(drops, [])
+        self.assertIn("legacy column slack_messages.attendance_day is kept", out)
+        self.assertIn("--drop-legacy", out)
+
+    def test_drop_legacy(self):
+        drops, out = self.run_init_schema("--drop-legacy")
+
+        self.assertEqual(len(drops), 4)
+        self.assertIn("dropped legacy index idx_attachments_author", out)
+
+
+class ConfigReloadTest(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.config_path = os.path.join(tmpdir.name, "config.ini")
+        self.users_path = os.path.join(tmpdir.name, "users.yaml")
+        with open(self.config_path, "w") as file:
+            file.write("[DEFAULT]\nSLACK_API_TOKEN = xoxb-test\nCHANNEL_ID = CTEST\n"
+                       "START_DATE = 2020-03-02\nGARDENING_DAYS = 100\n"
+                       "[STORAGE]\nBACKEND = sqlite\nSQLITE_PATH = :memory:\n")
+        self.write_users("alice", "bob")
+
+        patchers = [
+            mock.patch.multiple(garden_config, CONFIG_PATH=self.config_path, USERS_PATH=self.users_path,
+                                _config=None, _garden=None, _checked_at=0.0, _reload_requested=False),
+            mock.patch.dict(os.environ, {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": ":memory:"}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_users(self, *users):
+        with open(self.users_path, "w") as file:
+            file.writelines(f"{user}:\n  slack: {user}-slack\n" for user in users)
+        # mtime 해상도가 낮은 파일시스템에서도 바뀐 것으로 보이도록
+        mtime = time.time() + len(users)
+        os.utime(self.users_path, (mtime, mtime))
+
+    def test_config_is_shared_until_files_change(self):
+        config = garden_config.get_config()
+        garden = garden_config.get_garden()
+        self.assertEqual(config.users, ("alice", "bob"))
+        garden_config._checked_at = 0.0
+        self.assertIs(garden_config.get_config(), config)
+        self.assertIs(garden_config.get_garden(), garden)
+
+        self.write_users("alice", "bob", "carol")
+        # CHECK_INTERVAL 동안은 파일을 다시 확인하지 않음
+        self.assertIs(garden_config.get_config(), config)
+
+        garden_config._checked_at = 0.0
+        reloaded = garden_config.get_config()
+        self.assertEqual(reloaded.users, ("alice", "bob", "carol"))
+        self.assertNotEqual(reloaded.fingerprint, config.fingerprint)
+        self.assertIsNot(garden_config.get_garden(), garden)
+        self.assertEqual(garden_config.get_garden().users, reloaded.users)
+
+    def test_reload_config(self):
+        config = garden_config.get_config()
+
+        garden_config.reload_config()
+
+        reloaded = garden_config.get_config()
+        self.assertIsNot(reloaded, config)
+        self.assertEqual(reloaded, config)
+
+
+class GardenViewTestCase(SimpleTestCase):
+    """임시 SQLite 파일을 쓰는 Garden 으로 view 테스트"""
+    config_fields = {}
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        # mtimes 가 실제 파일과 같아야 get_config 가 config.ini 를 다시 읽지 않음
+        self.config = make_config(sqlite_path=os.path.join(tmpdir.name, "garden5.sqlite3"),
+                                  mtimes=garden_config._get_mtimes(), **self.config_fields)
+        patcher = mock.patch.multiple(garden_config, _config=self.config, _garden=None, _reload_requested=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.garden = garden_config.get_garden()
+
+
+class SlackCollectTest(GardenViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.garden.slack_client = mock.Mock()
+        self.history = self.garden.slack_client.conversations_history
+
+    def test_follows_history_cursors(self):
+        day = START_DATE + timedelta(days=1)
+        messages = [commit_message(kst(day, hour), "alice") for hour in range(9, 15)]
+        self.garden.save_slack_messages(messages[:1])
+        self.history.side_effect = [
+            {"messages": messages[:3], "has_more": True, "response_metadata": {"next_cursor": "page2"}},
+            {"messages": messages[2:5], "has_more": True, "response_metadata": {"next_cursor": "page3"}},
+            {"messages": messages[5:], "has_more": False, "response_metadata": {"next_cursor": ""}},
+        ]
+        progress = []
+
+        stats = self.garden.collect_slack_messages(100, 200, progress.append)
+
+        self.assertEqual([call.kwargs["cursor"] for call in self.history.call_args_list], [None, "page2", "page3"])
+        self.assertEqual(self.history.call_args.kwargs["oldest"], "100")
+        self.assertEqual(stats, {"pages": 3, "fetched": 7, "inserted": 5, "skipped": 2})
+        self.assertEqual([p["pages"] for p in progress], [1, 2, 3])
+        self.assertEqual(self.garden.find_attendance_days("alice"), [(day, kst(day, 9))])
+
+    def test_incremental_collection_starts_from_last_message(self):
+        day = START_DATE + timedelta(days=1)
+        first, second = commit_message(kst(day, 9), "alice"), commit_message(kst(day, 10), "alice")
+        self.history.return_value = {"messages": [first], "has_more": False}
+
+        # 저장된 메시지가 없으면 기본 시작 시각부터
+        stats = self.garden.collect_new_slack_messages(100, overlap=600)
+        self.assertEqual(self.history.call_args.kwargs["oldest"], "100")
+        self.assertEqual((stats["oldest"], stats["inserted"]), (100, 1))
+
+        # 다음 수집은 마지막 메시지 - overlap 부터. 겹친 메시지는 건너뜀
+        self.history.return_value = {"messages": [first, second], "has_more": False}
+        stats = self.garden.collect_new_slack_messages(100, overlap=600)
+        expected_oldest = (kst(day, 9) - timedelta(hours=9)).timestamp() - 600
+        self.assertEqual(self.history.call_args.kwargs["oldest"], str(expected_oldest))
+        self.assertEqual((stats["oldest"], stats["inserted"], stats["skipped"]), (expected_oldest, 1, 1))
+
+    def test_stops_without_next_cursor(self):
+        self.history.return_value = {"messages": [], "has_more": True, "response_metadata": {}}
+
+        stats = self.garden.collect_slack_messages(100, 200)
+
+        self.assertEqual(self.history.call_count, 1)
+        self.assertEqual(stats, {"pages": 1, "fetched": 0, "inserted": 0, "skipped": 0})
+
+
+class NoShowTest(GardenViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = START_DATE + timedelta(days=3)
+        self.garden.save_slack_messages([
+            commit_message(kst(self.day, 9), "alice"),
+            # 새벽 커밋은 전날 출석
+            commit_message(kst(self.day + timedelta(days=1), 2), "bob"),
+            commit_message(kst(self.day - timedelta(days=1), 20), "carol"),
+        ])
+
+    def test_get_attendance_matches_full_history(self):
+        for day in (self.day - timedelta(days=1), self.day, self.day + timedelta(days=1)):
+            history = self.garden.find_first_attendances()
+            expected = [{"user": user, "first_ts": history.get(user, {}).get(day)} for user in self.garden.users]
+            self.assertEqual(self.garden.get_attendance(day), expected)
+
+        self.assertEqual(self.garden.get_attendance(self.day), [
+            {"user": "alice", "first_ts": kst(self.day, 9)},
+            {"user": "bob", "first_ts": kst(self.day + timedelta(days=1), 2)},
+            {"user": "carol", "first_ts": None},
+        ])
+
+    def test_get_view(self):
+        response = self.client.get(f"/attendance/get/{self.day:%Y%m%d}")
+        self.assertEqual([row["first_ts"] is None for row in json.loads(response.content)], [False, False, True])
+
+    def test_send_no_show_message(self):
+        self.garden.slack_client = mock.Mock()
+        with mock.patch("attendance.garden.datetime") as mock_datetime:
+            mock_datetime.today.return_value = datetime.combine(self.day, datetime.min.time())
+            self.garden.send_no_show_message()
+
+        self.assertEqual(self.garden.slack_client.chat_postMessage.call_args.kwargs["text"],
+                         "[미출석자 알람]\n@carol-slack ")
+
+
+class ColumnarApiTest(GardenViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = START_DATE + timedelta(days=2)
+        self.garden.save_slack_messages([
+            commit_message(kst(START_DATE, 9, 15), "alice"),
+            commit_message(kst(self.day, 23, 59), "alice"),
+            # 새벽 커밋은 전날 출석. 출석일 0시 기준 1440분 이상
+            commit_message(kst(self.day + timedelta(days=2), 3, 30), "bob"),
+        ])
+
+    def decode_columnar(self, data):
+        """columnar 응답을 api/gets 의 유저별 {날짜: 첫 커밋 시각} 로 되돌림"""
+        dates = [date.fromisoformat(day) for day in data["dates"]]
+        result = []
+        for user, bits, minutes in zip(data["users"], data["bits"], data["minutes"]):
+            attended = [day for idx, day in enumerate(dates) if int(bits, 16) >> idx & 1]
+            self.assertEqual(len(attended), len(minutes))
+            result.append({"user": user, "attendances": {
+                day.strftime("%Y-%m-%d"): (datetime.combine(day, datetime.min.time())
+                                           + timedelta(minutes=minute)).isoformat()
+                for day, minute in zip(attended, minutes)}})
+        return result
+
+    def test_columnar_round_trip(self):
+        plain = self.client.get("/attendance/api/gets")
+        columnar = self.client.get("/attendance/api/gets", HTTP_ACCEPT="application/vnd.garden5.columnar+json")
+
+        self.assertEqual(columnar["Content-Type"], "application/vnd.garden5.columnar+json")
+        data = json.loads(columnar.content)
+        self.assertEqual(data["dates"][0], "2020-03-02")
+        self.assertEqual(data["minutes"][1], [24 * 60 + 3 * 60 + 30])
+        self.assertEqual(self.decode_columnar(data), json.loads(plain.content))
+        # 포맷이 다르면 ETag 도 달라서 다른 포맷의 ETag 로는 304 를 받지 않음
+        self.assertNotEqual(plain["ETag"], columnar["ETag"])
+        self.assertEqual(self.client.get("/attendance/api/gets", HTTP_ACCEPT="application/vnd.garden5.columnar+json",
+                                         HTTP_IF_NONE_MATCH=plain["ETag"]).status_code, 200)
+
+    def test_gzip_copy(self):
+        plain = self.client.get("/attendance/api/gets")
+        compressed = self.client.get("/attendance/api/gets", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertEqual(compressed["ETag"], f"W/{plain['ETag']}")
+        not_modified = self.client.get("/attendance/api/gets", HTTP_ACCEPT_ENCODING="gzip",
+                                       HTTP_IF_NONE_MATCH=compressed["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+
+class UserApiTest(GardenViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.days = [START_DATE + timedelta(days=n) for n in (0, 1, 3, 4, 6)]
+        self.garden.save_slack_messages([commit_message(kst(day, 9), "alice") for day in self.days])
+
+    def get_pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(json.loads(response.content))
+            link = response.headers.get("Link")
+            url = link[1:link.index(">")] if link else None
+        return pages
+
+    def test_limit_pages(self):
+        pages = self.get_pages("/attendance/api/users/alice/?limit=2")
+        self.assertEqual([[row["date"] for row in page] for page in pages],
+                         [["2020-03-02", "2020-03-03"], ["2020-03-05", "2020-03-06"], ["2020-03-08"]])
+
+    def test_calendar_limit_pages(self):
+        pages = self.get_pages("/attendance/api/users/alice/?calendar=1&limit=2")
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([row["date"] for page in pages for row in page],
+                         [day.isoformat() for day in self.days])
+
+    def test_bad_request_has_no_validators(self):
+        response = self.client.get("/attendance/api/users/alice/?limit=x")
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("ETag", response.headers)
+        self.assertNotIn("Last-Modified", response.headers)
+        self.assertIn("ETag", self.client.get("/attendance/api/users/alice/?limit=1").headers)
+
+    def test_async_user_api_matches_sync(self):
+        async def get(url):
+            response = await self.async_client.get(url)
+            if not response.streaming:
+                return response, response.content
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        for query in ("", "?limit=2", "?limit=2&after=2020-03-03", "?calendar=1&limit=2",
+                      "?from=2020-03-03&to=2020-03-06", "?stream=1", "?stream=1&limit=3", "?limit=0"):
+            with self.subTest(query=query):
+                expected = self.client.get(f"/attendance/api/users/alice/{query}")
+                response, body = async_to_sync(get)(f"/attendance/async/api/users/alice/{query}")
+                self.assertEqual(response.status_code, expected.status_code)
+                expected_body = b"".join(expected.streaming_content) if expected.streaming else expected.content
+                self.assertEqual(body, expected_body)
+                self.assertEqual(response.headers.get("Link"),
+                                 expected.headers.get("Link", "").replace("/attendance/", "/attendance/async/") or None)
+
+    def test_calendar_without_limit(self):
+        pages = self.get_pages("/attendance/api/users/alice/?calendar=1")
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(pages[0][0], {"date": "2020-03-02", "first_ts": "2020-03-02T09:00:00"})
+
+
+class StreamingResponseTest(GardenViewTestCase):
+    def setUp(self):
+        super().setUp()
+        days = [START_DATE + timedelta(days=n) for n in range(4)]
+        self.garden.save_slack_messages(
+            [commit_message(kst(day, hour), "alice") for day in days for hour in (9, 13)]
+            + [commit_message(kst(days[1], 23), "bob"), commit_message(kst(days[3], 2), "bob")])
+
+    def assert_stream_matches(self, url):
+        expected = self.client.get(url)
+        streamed = self.client.get(url + ("&" if "?" in url else "?") + "stream=1")
+
+        self.assertFalse(expected.streaming)
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed["Content-Type"], expected["Content-Type"])
+        self.assertEqual(b"".join(streamed.streaming_content), expected.content)
+
+    def test_gets(self):
+        self.assert_stream_matches("/attendance/api/gets")
+
+    def test_user_api(self):
+        for url in ("/attendance/api/users/alice/", "/attendance/api/users/bob/",
+                    "/attendance/api/users/carol/", "/attendance/api/users/alice/?from=2020-03-03&to=2020-03-04",
+                    "/attendance/api/users/alice/?limit=2"):
+            with self.subTest(url=url):
+                self.assert_stream_matches(url)
+
+    def test_rows_are_closed_when_response_stops(self):
+        closed = []
+
+        def rows():
+            try:
+                for n in range(10):
+                    yield n, {"n": n}
+            finally:
+                closed.append(True)
+
+        chunks = iter_json_array(rows(), lambda n, item: item)
+        self.assertEqual([next(chunks), next(chunks)], ["[", '{"n": 0}'])
+        # 클라이언트가 끊으면 응답 iterator 가 닫힘
+        chunks.close()
+        self.assertEqual(closed, [True])
+
+
+def read_testdata(name):
+    with open(os.path.join(TESTDATA_DIR, name)) as file:
+        return json.load(file)
+
+
+@override_settings(ATTENDANCE_RUN_JOBS_INLINE=True)
+class SlackEventsTest(GardenViewTestCase):
+    """attendance/testdata 에 저장해둔 Events API payload 를 서명해서 보냄"""
+    config_fields = {"channel_id": "C0GARDEN5"}
+    url = "/attendance/slack/events"
+
+    def setUp(self):
+        super().setUp()
+        self.payloads = {payload.get("event_id", payload["type"]): payload
+                         for payload in read_testdata("slack_events.json")}
+
+    def post_event(self, payload, secret=None):
+        body = json.dumps(payload)
+        timestamp = str(int(time.time()))
+        verifier = SignatureVerifier(secret or self.config.slack_signing_secret)
+        return self.client.post(self.url, body, content_type="application/json",
+                                HTTP_X_SLACK_REQUEST_TIMESTAMP=timestamp,
+                                HTTP_X_SLACK_SIGNATURE=verifier.generate_signature(timestamp=timestamp, body=body))
+
+    def stored_ts(self):
+        rows = self.garden.storage.connect().execute("SELECT ts FROM slack_messages ORDER BY ts")
+        return [ts for ts, in rows]
+
+    def test_url_verification(self):
+        payload = self.payloads["url_verification"]
+        response = self.post_event(payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"challenge": payload["challenge"]})
+
+    def test_commit_messages_are_stored(self):
+        for event_id in ("Ev0GARDEN501", "Ev0GARDEN502"):
+            self.assertEqual(self.post_event(self.payloads[event_id]).status_code, 200)
+        # Slack 이 같은 이벤트를 다시 보내도 한번만 저장
+        self.assertEqual(self.post_event(self.payloads["Ev0GARDEN501"]).status_code, 200)
+
+        self.assertEqual(self.stored_ts(), ["1583200800.000100", "1583204400.000200"])
+        self.assertEqual(len(self.garden.find_attendance_days("alice")), 1)
+        commits = next(iter(self.garden.find_attendance_by_user("alice").values()))
+        self.assertIn("javascript - date - moment", commits[0]["message"][0])
+        self.assertEqual(len(self.garden.find_attendance_days("bob")), 1)
+
+    def test_ignored_events(self):
+        for event_id in ("Ev0GARDEN503", "Ev0GARDEN504"):
+            self.assertEqual(self.post_event(self.payloads[event_id]).status_code, 200)
+        self.assertEqual(self.stored_ts(), [])
+
+    def test_wrong_secret_is_rejected(self):
+        response = self.post_event(self.payloads["Ev0GARDEN501"], secret="not-the-signing-secret")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.stored_ts(), [])
+
+    def test_recorded_bad_signature_is_rejected(self):
+        recorded = read_testdata("slack_event_bad_signature.json")
+        headers = {"HTTP_" + name.upper().replace("-", "_"): value
+                   for name, value in recorded["headers"].items() if name != "Content-Type"}
+        response = self.client.post(self.url, recorded["body"], content_type="application/json", **headers)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.stored_ts(), [])
+
+    def test_get_is_not_allowed(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
@@ -1,14 +1,27 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 app_name = 'attendance'
 urlpatterns = [
     path('', views.index, name='index'), # 출석부 첫화면
+    path('api/pool', views.pool_stats, name='pool_stats'), # PostgreSQL 커넥션 풀 통계
+    path('metrics', views.metrics, name='metrics'), # Prometheus 메트릭
     path('api/users/', views.users, name='users'), # 정원사들 리스트
     path('api/gets', views.gets, name='get'), # 전체 출석부 조회. 리스트. 유저별.
+    path('api/stats', views.stats, name='stats'), # 출석부 통계
+    path('api/delta', views.delta, name='delta'), # since 버전 이후 바뀐 출석 기록
+    path('api/leaderboard', views.leaderboard, name='leaderboard'), # 출석 순위. 연속 출석일 포함
     path('collect/', views.collect, name='collect'), # slack_messages 수집
+    path('collect/<job_id>', views.collect_status, name='collect_status'), # slack_messages 수집 작업 상태
+    path('slack/events', views.slack_events, name='slack_events'), # Slack Events API 메시지 수신
     path('get/<date>', views.get, name='get'), # 특정일의 출석부 조회. 날짜기준
 
     path('users/<user>/', views.user, name='user'), # 유저별 출석부 데이터 페이지
     path('api/users/<user>/', views.user_api, name='user'), # 특정 유저의 출석 데이터
+
+    # ASGI(uvicorn) 로 띄웠을 때 쓰는 비동기 API. 응답은 위와 같음
+    path('async/api/gets', async_views.gets, name='async_gets'),
+    path('async/collect/', async_views.collect, name='async_collect'),
+    path('async/get/<date>', async_views.get, name='async_get'),
+    path('async/api/users/<user>/', async_views.user_api, name='async_user'),
 ]
@@ -1,40 +1,79 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotAllowed, \
+    StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import patch_vary_headers
+from slack_sdk.signature import SignatureVerifier
 from datetime import datetime, timedelta
-from .garden import Garden
+from .garden_config import get_config, get_garden
+from . import jobs
+from .columnar import columnar_response, wants_columnar
+from .http_cache import cached_api
+from .matrix import AttendanceMatrix
+from .metrics import render_metrics
+from .stats import build_stats
+import json
 import pprint
-import markdown
-import re
-from .markdown_slack_extension import SlackMarkdownExtension
+from .markdown_slack_extension import render_slack_markdown, slack_to_html
+
+
+def wants_stream(request):
+    """?stream=1 이면 전체를 만들어서 보내지 않고 만드는 대로 보냄"""
+    return request.GET.get("stream") == "1"
+
+
+def iter_json_array(rows, to_item):
+    """
+    JSON 배열을 원소 하나씩 인코딩. JsonResponse 와 같은 결과
+    응답이 끝나거나 중간에 끊기면 rows 도 닫아서 DB 연결을 바로 반납
+    @param rows DB cursor 를 읽는 generator
+    @param to_item row 를 JSON 으로 보낼 원소로
+    """
+    encoder = DjangoJSONEncoder()
+    try:
+        yield "["
+        for idx, row in enumerate(rows):
+            yield (", " if idx else "") + encoder.encode(to_item(*row))
+        yield "]"
+    finally:
+        close = getattr(rows, "close", None)
+        if close is not None:
+            close()
+
+
+def streaming_json_response(rows, to_item):
+    return StreamingHttpResponse(iter_json_array(rows, to_item), content_type="application/json")
 
 
 def process_slack_links(text):
     """
     Slack 링크 포맷 <url|text>를 HTML 링크로 변환
     """
-    # <url|text> 패턴을 찾아서 <a href="url">text</a>로 변환
-    pattern = r'<([^|>]+)\|([^>]+)>'
-    def replace_link(match):
-        url = match.group(1)
-        text = match.group(2)
-        # 백틱으로 둘러싸인 텍스트는 <code> 태그로 변환
-        text = re.sub(r'`([^`]+)`', r'<code>\1</code>', text)
-        return f'<a href="{url}">{text}</a>'
-    
-    return re.sub(pattern, replace_link, text)
+    return slack_to_html(text)
 
 
 def index(request):
-    garden = Garden()
     context = {
-        "gardening_days": garden.get_gardening_days()
+        "gardening_days": get_config().gardening_days
     }
     return render(request, 'attendance/index.html', context)
 
 
+# PostgreSQL 커넥션 풀 통계
+def pool_stats(request):
+    garden = get_garden()
+    return JsonResponse(garden.get_pool_stats())
+
+
+# Prometheus 메트릭. 요청/DB/Slack/Markdown 시간 히스토그램
+def metrics(request):
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # 정원사들 리스트
 def users(request):
-    garden = Garden()
+    garden = get_garden()
     users = garden.get_member()
     return JsonResponse(users, safe=False)
 
@@ -46,44 +85,176 @@ def daterange(start_date, end_date):
 
 # 유저별 출석부
 def user(request, user):
-    garden = Garden()
+    config = get_config()
     context = {
         "user": user,
-        "gardening_days": garden.get_gardening_days()
+        "start_date": config.start_date,
+        "gardening_days": config.gardening_days
     }
 
     return render(request, 'attendance/users.html', context)
 
 
+def render_commits(date, commits):
+    for commit in commits:
+        commit["message"][0] = render_slack_markdown(commit["message"][0])
+        # commit["message"][0] = "<br>".join(commit["message"][0].split("\n"))
+    return {"date": date, "commits": commits}
+
+
+def parse_date_param(request, name):
+    """YYYY-MM-DD 쿼리 파라미터. 없으면 None, 형식이 틀리면 ValueError"""
+    value = request.GET.get(name)
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def parse_user_api_params(request):
+    """
+    user_api 쿼리 파라미터. async_views.user_api 도 같이 씀
+    @return (from_date, to_date, limit). 형식이 틀리면 400 응답 본문을 메시지로 ValueError
+    """
+    try:
+        from_date = parse_date_param(request, "from")
+        to_date = parse_date_param(request, "to")
+        after = parse_date_param(request, "after")
+        limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+    except ValueError:
+        raise ValueError("from, to, after: YYYY-MM-DD, limit: number")
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be positive")
+
+    if after and (from_date is None or from_date <= after):
+        from_date = after + timedelta(days=1)
+    return from_date, to_date, limit
+
+
+def paginate_days(request, days, limit):
+    """
+    limit + 1 일까지 읽은 출석일에서 이번 페이지의 출석일과 다음 페이지 Link 헤더
+    @return (days, next_link). 마지막 페이지면 next_link 는 None
+    """
+    if len(days) <= limit:
+        return days, None
+
+    days = days[:limit]
+    params = request.GET.copy()
+    params["after"] = days[-1][0].strftime("%Y-%m-%d")
+    return days, f'<{request.path}?{params.urlencode()}>; rel="next"'
+
+
+def calendar_response(days):
+    return JsonResponse([{"date": day, "first_ts": first_ts} for day, first_ts in days], safe=False)
+
+
+def commits_response(result):
+    return JsonResponse([render_commits(date, commits) for (date, commits) in result.items()], safe=False)
+
+
+def with_next_link(response, next_link):
+    if next_link:
+        response.headers["Link"] = next_link
+    return response
+
+
 # 유저의 출석데이터
+# ?from=YYYY-MM-DD&to=YYYY-MM-DD 기간의 출석일만
+# ?calendar=1 이면 커밋 내용 없이 [{date, first_ts}] (달력용)
+# ?limit=N 이면 N일씩. 다음 페이지는 Link 헤더 (rel="next", ?after=마지막 날짜)
+# ?stream=1 이면 하루씩 DB 에서 읽어서 바로 보냄
+@cached_api
 def user_api(request, user):
-    garden = Garden()
-    result = garden.find_attendance_by_user(user)
+    garden = get_garden()
 
-    output = []
-    for (date, commits) in result.items():
-        for commit in commits:
-            commit["message"][0] = markdown.markdown(commit["message"][0], extensions=[SlackMarkdownExtension()])
-            # commit["message"][0] = "<br>".join(commit["message"][0].split("\n"))
-        output.append({"date": date, "commits": commits})
+    try:
+        from_date, to_date, limit = parse_user_api_params(request)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
 
-    return JsonResponse(output, safe=False)
+    next_link = None
+    days = None
+    if limit:
+        # 이번 페이지의 날짜들을 출석부에서 정하고 그 기간의 메시지만 읽음. 하나 더 읽어서 다음 페이지 확인
+        days, next_link = paginate_days(request, garden.find_attendance_days(user, from_date, to_date, limit + 1),
+                                        limit)
+
+    if request.GET.get("calendar") == "1":
+        if days is None:
+            days = garden.find_attendance_days(user, from_date, to_date)
+        return with_next_link(calendar_response(days), next_link)
+
+    if days is not None:
+        if not days:
+            return JsonResponse([], safe=False)
+        from_date, to_date = days[0][0], days[-1][0]
+
+    if wants_stream(request):
+        response = streaming_json_response(garden.iter_attendance_by_user(user, from_date, to_date), render_commits)
+    else:
+        response = commits_response(garden.find_attendance_by_user(user, from_date, to_date))
+
+    return with_next_link(response, next_link)
 
 
 # slack_messages 수집
+# 수집은 백그라운드 작업으로 돌리고 작업 id 를 바로 반환. 진행상황은 collect/<job_id> 로 확인
 def collect(request):
     oldest = datetime.strptime(request.GET.get('start'), "%Y-%m-%d").timestamp()
     latest = datetime.strptime(request.GET.get('end'), "%Y-%m-%d").timestamp()
 
-    garden = Garden()
-    garden.collect_slack_messages(oldest, latest)
+    garden = get_garden()
+    job, created = jobs.submit_collect(garden.collect_slack_messages, oldest, latest)
+
+    result = job.to_dict()
+    result["created"] = created
+    return JsonResponse(result, status=202)
+
+
+# slack_messages 수집 작업 상태
+def collect_status(request, job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return JsonResponse({"error": "job not found"}, status=404)
+
+    return JsonResponse(job.to_dict())
 
-    return JsonResponse({})
+
+# Slack Events API. 채널에 올라온 메시지를 바로 저장
+# Slack 은 3초 안에 응답을 받아야 하므로 저장은 백그라운드에서 함
+@csrf_exempt
+def slack_events(request):
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    garden = get_garden()
+    if not garden.slack_signing_secret:
+        return HttpResponseForbidden()
+
+    verifier = SignatureVerifier(garden.slack_signing_secret)
+    if not verifier.is_valid_request(request.body, request.headers):
+        return HttpResponseForbidden()
+
+    payload = json.loads(request.body)
+
+    # Event Subscriptions 에 Request URL 등록할 때 확인용
+    if payload.get("type") == "url_verification":
+        return JsonResponse({"challenge": payload.get("challenge")})
+
+    event = payload.get("event") or {}
+    # 새로 올라온 메시지만 저장. 수정/삭제 등의 subtype 은 주기적인 수집에서 맞춤
+    if (payload.get("type") == "event_callback"
+            and event.get("type") == "message"
+            and event.get("channel") == garden.channel_id
+            and event.get("subtype") in (None, "bot_message")
+            and event.get("ts")):
+        jobs.submit_event(garden.save_slack_messages, [event])
+
+    return HttpResponse()
 
 
 # 특정일의 출석 데이터 불러오기
+@cached_api
 def get(request, date):
-    garden = Garden()
+    garden = get_garden()
     result = garden.get_attendance(datetime.strptime(date, "%Y%m%d").date())
     return JsonResponse(result, safe=False)
 
@@ -93,21 +264,81 @@ def daterange(start_date, end_date):
         yield start_date + timedelta(n)
 
 
+def format_user_attendances(user, attend_dict):
+    # convert key type datetime.date to string
+    attendances = {}
+    for (key_date, first_ts) in attend_dict.items():
+        attendances[key_date.strftime("%Y-%m-%d")] = first_ts
+
+    return {"user": user, "attendances": attendances}
+
+
 # 전체 출석부 조회
+# Accept: application/vnd.garden5.columnar+json 또는 ?format=columnar 이면 columnar 포맷 (columnar.py)
+# ?stream=1 이면 한명씩 DB 에서 읽어서 바로 보냄
+@cached_api
 def gets(request):
-    garden = Garden()
+    garden = get_garden()
 
     result = []
 
     users = garden.get_member()
+    if wants_stream(request) and not wants_columnar(request):
+        response = streaming_json_response(garden.iter_first_attendances(users), format_user_attendances)
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+    attend_dict = garden.find_first_attendances(users)
+
+    if wants_columnar(request):
+        attended_dates = [day for attendances in attend_dict.values() for day in attendances]
+        dates = []
+        if attended_dates:
+            dates = list(daterange(min(attended_dates + [garden.start_date]), max(attended_dates) + timedelta(1)))
+        return columnar_response(AttendanceMatrix.from_attendances(users, attend_dict, dates).to_columnar())
+
     for user in users:
-        attendances = garden.find_attendance_by_user(user)
+        result.append(format_user_attendances(user, attend_dict[user]))
+
+    response = JsonResponse(result, safe=False)
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+# 출석부 변경분 조회. ?since=버전 이후 바뀐 (user, 날짜, first_ts)
+# 처음이거나, 명단이 바뀌었거나, 이어붙일 수 없으면 reset 과 함께 전체
+@cached_api
+def delta(request):
+    garden = get_garden()
+
+    user = request.GET.get("user")
+    users = [user] if user else None
+    result = garden.find_attendance_changes(request.GET.get("since"), users)
+    result["changes"] = [[author_name, attendance_date.strftime("%Y-%m-%d"), first_ts]
+                         for author_name, attendance_date, first_ts in result["changes"]]
+
+    return JsonResponse(result)
+
+
+# 출석부 통계. index.html 에서 그리는 통계를 서버에서 계산
+# ?attendances=0 이면 유저별 출석 기록은 빼고 응답. 출석 기록은 api/delta 로 받는 경우
+@cached_api(vary_on_date=True)
+def stats(request):
+    garden = get_garden()
+
+    today = datetime.today().date()
+    matrix = garden.get_attendance_matrix(today)
+    result = build_stats(matrix, garden.start_date, today, int(garden.get_gardening_days()),
+                         include_attendances=request.GET.get("attendances") != "0")
+
+    return JsonResponse(result)
+
 
-        # convert key type datetime.date to string
-        for key_date in list(attendances.keys()).copy():
-            formatted_date = key_date.strftime("%Y-%m-%d")
-            attendances[formatted_date] = attendances.pop(key_date)[0]["ts"]
+# 출석 순위. 출석 횟수, 출석률, 연속 출석일
+@cached_api(vary_on_date=True)
+def leaderboard(request):
+    garden = get_garden()
 
-        result.append({"user": user, "attendances": attendances})
+    matrix = garden.get_attendance_matrix(datetime.today().date())
 
-    return JsonResponse(result, safe=False)
\ No newline at end of file
+    return JsonResponse(matrix.leaderboard(), safe=False)
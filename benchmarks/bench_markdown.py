@@ -0,0 +1,121 @@
+"""
+Slack 마크다운 렌더링 마이크로 벤치마크
+기존 방식(요청마다 Markdown 인스턴스 + 줄마다 re.sub 3번)과 공유 렌더러를 비교
+
+e.g.)
+python benchmarks/bench_markdown.py                    # benchmarks/fixtures/commit_texts.json 사용. DB 필요 없음
+python benchmarks/bench_markdown.py --corpus texts.json  # 커밋 메시지 문자열 리스트 json
+python benchmarks/bench_markdown.py --db --limit 2000    # DB 의 최근 커밋 메시지 사용
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import markdown
+from markdown.extensions import Extension
+from markdown.preprocessors import Preprocessor
+
+from attendance.markdown_slack_extension import convert_slack_markdown, slack_to_markdown
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "commit_texts.json")
+
+
+class LegacySlackPreprocessor(Preprocessor):
+    """기존 SlackPreprocessor. 줄마다 패턴 3개를 따로 적용"""
+
+    def run(self, lines):
+        new_lines = []
+        for line in lines:
+            line = re.sub(r'<(https?://[^|>]+)\|([^>]+)>', r'[\2](\1)', line)
+            line = re.sub(r'<@([A-Z0-9]+)>', r'@\1', line)
+            line = re.sub(r'<#[A-Z0-9]+\|([^>]+)>', r'#\1', line)
+            new_lines.append(line)
+        return new_lines
+
+
+class LegacySlackMarkdownExtension(Extension):
+    def extendMarkdown(self, md):
+        md.preprocessors.register(LegacySlackPreprocessor(md), 'slack', 5)
+
+
+def legacy_render(text):
+    return markdown.markdown(text, extensions=[LegacySlackMarkdownExtension()])
+
+
+def legacy_preprocess(text):
+    return LegacySlackPreprocessor().run(text.split("\n"))
+
+
+def load_corpus_from_db(limit):
+    from attendance.garden import Garden
+
+    garden = Garden()
+    conn = garden.connect_postgres()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT attachment->>'text'
+            FROM slack_messages sm,
+                 LATERAL jsonb_array_elements(sm.attachments) AS attachment
+            WHERE sm.attachments IS NOT NULL
+              AND COALESCE(attachment->>'text', '') <> ''
+            ORDER BY sm.ts DESC
+            LIMIT %s
+        """, (limit,))
+        return [text for (text,) in cursor.fetchall()]
+    finally:
+        cursor.close()
+        garden.release_postgres(conn)
+
+
+def bench(name, fn, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    per_doc = best / len(corpus) * 1e6
+    print(f"{name:<28} {best * 1000:10.2f}ms  {per_doc:8.1f}us/doc")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slack 마크다운 렌더링 벤치마크")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="커밋 메시지 문자열 리스트 json")
+    parser.add_argument("--db", action="store_true", help="--corpus 대신 DB 의 커밋 메시지 사용")
+    parser.add_argument("--limit", type=int, default=2000, help="--db 일 때 읽을 커밋 메시지 수")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.db:
+        corpus = load_corpus_from_db(args.limit)
+    else:
+        with open(args.corpus) as file:
+            corpus = json.load(file)
+
+    if not corpus:
+        print("corpus is empty")
+        return
+
+    # 결과가 같은지 먼저 확인
+    mismatches = sum(1 for text in corpus if legacy_render(text) != convert_slack_markdown(text))
+    print(f"corpus: {len(corpus)} docs, render mismatches: {mismatches}")
+
+    legacy_pre = bench("preprocess legacy", legacy_preprocess, corpus, args.repeat)
+    shared_pre = bench("preprocess single-pass", lambda text: [slack_to_markdown(line) for line in text.split("\n")],
+                       corpus, args.repeat)
+    legacy = bench("render legacy", legacy_render, corpus, args.repeat)
+    shared = bench("render shared renderer", convert_slack_markdown, corpus, args.repeat)
+
+    print(f"preprocess speedup: {legacy_pre / shared_pre:.2f}x, render speedup: {legacy / shared:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
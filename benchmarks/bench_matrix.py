@@ -0,0 +1,95 @@
+"""
+출석 비트맵 벤치마크
+합성 데이터(유저 x 날짜)로 AttendanceMatrix 와 dict 기반 계산을 비교
+
+e.g.)
+python benchmarks/bench_matrix.py --members 5000 --days 120
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.matrix import AttendanceMatrix
+
+
+def make_attendances(members, days, rate, seed):
+    random.seed(seed)
+    start_date = date(2020, 3, 2)
+    dates = [start_date + timedelta(days=n) for n in range(days)]
+    users = [f"user{n}" for n in range(members)]
+    attend_dict = {}
+    for user in users:
+        attend_dict[user] = {
+            day: datetime.combine(day, datetime.min.time()) + timedelta(minutes=random.randint(0, 27 * 60))
+            for day in dates if random.random() < rate
+        }
+    return users, dates, attend_dict
+
+
+def dict_queries(users, dates, attend_dict):
+    """기존처럼 dict 를 돌면서 계산"""
+    counts = [sum(1 for day in dates if day in attend_dict[user]) for user in users]
+    daily_counts = [sum(1 for user in users if day in attend_dict[user]) for day in dates]
+    no_shows = [user for user in users if dates[-1] not in attend_dict[user]]
+    streaks = []
+    for user in users:
+        longest = current = 0
+        for day in dates:
+            current = current + 1 if day in attend_dict[user] else 0
+            longest = max(longest, current)
+        streaks.append(longest)
+    ranks = sorted(counts, reverse=True)
+    return counts, daily_counts, no_shows, streaks, ranks
+
+
+def matrix_queries(matrix):
+    counts = matrix.counts()
+    daily_counts = matrix.daily_counts()
+    no_shows = matrix.no_shows(len(matrix.dates) - 1)
+    streaks = [matrix.longest_streak(idx) for idx in range(len(matrix.users))]
+    ranks = matrix.ranks()
+    return counts, daily_counts, no_shows, streaks, ranks
+
+
+def timed(name, fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<24} {best * 1000:10.2f}ms")
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="출석 비트맵 벤치마크")
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=0.7, help="출석 확률")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    users, dates, attend_dict = make_attendances(args.members, args.days, args.rate, args.seed)
+    print(f"members: {args.members}, days: {args.days}")
+
+    timed("matrix build", lambda: AttendanceMatrix.from_attendances(users, attend_dict, dates), args.repeat)
+    matrix = AttendanceMatrix.from_attendances(users, attend_dict, dates)
+
+    dict_time, dict_result = timed("dict queries", lambda: dict_queries(users, dates, attend_dict), args.repeat)
+    matrix_time, matrix_result = timed("matrix queries", lambda: matrix_queries(matrix), args.repeat)
+    timed("matrix leaderboard", matrix.leaderboard, args.repeat)
+
+    assert dict_result[:4] == matrix_result[:4], "results differ"
+    print(f"query speedup: {dict_time / matrix_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
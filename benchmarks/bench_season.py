@@ -0,0 +1,321 @@
+"""
+합성 시즌 데이터로 주요 함수 벤치마크
+GitHub 봇 메시지 형태의 slack_messages 를 만들어 로컬 PostgreSQL 의 별도 스키마에 넣고
+find_attendance_by_user, get_attendance, gets, user_api, send_no_show_message 를 규모별로 측정한다.
+p50/p95, 최대 메모리(tracemalloc)를 출력하고 benchmarks/results/<commit>.json 에 저장한다.
+
+시즌은 오늘 끝나도록 만들어서 send_no_show_message 가 실제처럼 오늘 출석부를 본다.
+Slack 에는 보내지 않음. API 응답 캐시와 마크다운 캐시는 매번 비우고 측정
+
+e.g.)
+DB_HOST=localhost DB_PORT=5432 DB_USER=postgres DB_PASSWORD= DB_SSLMODE=disable \\
+    python benchmarks/bench_season.py --scales 20x30 100x100 --repeat 20
+python benchmarks/bench_season.py --scales 20x30 --compare benchmarks/results/028f6cf.json
+STORAGE_BACKEND=sqlite SQLITE_PATH=:memory: python benchmarks/bench_season.py  # PostgreSQL 없이
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import replace
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "garden5.settings")
+
+import django
+
+django.setup()
+
+from django.core.cache import cache
+from django.test import Client
+
+from attendance import garden_config
+from attendance.markdown_slack_extension import render_slack_markdown
+from attendance.schema import apply_schema
+
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+
+# 메모리 측정을 빼고 반복할 횟수
+DEFAULT_REPEAT = 10
+
+
+def make_commit_text(user, repo, count, rnd):
+    lines = [f"*<https://github.com/{user}/{repo}/compare/a...b|{count} new commits>"
+             f" pushed to <https://github.com/{user}/{repo}/tree/master|`master`>*"]
+    for _ in range(count):
+        sha = "%040x" % rnd.getrandbits(160)
+        lines.append(f"<https://github.com/{user}/{repo}/commit/{sha}|`{sha[:8]}`> - "
+                     f"{rnd.choice(['fix', 'add', 'update', 'refactor'])} *{rnd.choice(['til', 'algo', 'docs'])}*")
+    return "\n".join(lines)
+
+
+def make_season(members, days, commits_per_day, max_attachments, late_night_rate, attend_rate, seed):
+    """
+    GitHub 봇이 올린 것 같은 slack 메시지들. 시즌은 오늘 끝남
+    @param commits_per_day 출석한 날 유저별 평균 메시지 수
+    @param max_attachments 메시지당 첨부파일(작성자) 최대 수. 여러명의 push 가 한 메시지에 묶인 경우
+    @param late_night_rate 00~04시 커밋 비율. 새벽 4시 규칙을 타는 메시지
+    @return (users, start_date, 메시지 리스트 ts 순)
+    """
+    rnd = random.Random(seed)
+    users = [f"gardener{n:04d}" for n in range(members)]
+    start_date = datetime.today().date() - timedelta(days=days - 1)
+
+    messages = []
+    used_ts = set()
+    for day_idx in range(days):
+        day = start_date + timedelta(days=day_idx)
+        for user in users:
+            if rnd.random() >= attend_rate:
+                continue
+            for _ in range(max(1, round(rnd.expovariate(1 / commits_per_day)))):
+                if rnd.random() < late_night_rate:
+                    # 다음날 새벽 (KST)
+                    kst = datetime.combine(day + timedelta(days=1), datetime.min.time()) + timedelta(
+                        seconds=rnd.randrange(4 * 3600))
+                else:
+                    kst = datetime.combine(day, datetime.min.time()) + timedelta(
+                        seconds=rnd.randrange(4 * 3600, 24 * 3600))
+
+                # 저장할 때 KST 로 바꾸므로 UTC 기준 epoch
+                epoch = (kst - timedelta(hours=9)).timestamp()
+                ts = f"{epoch:.6f}"
+                while ts in used_ts:
+                    epoch += 0.000001
+                    ts = f"{epoch:.6f}"
+                used_ts.add(ts)
+
+                authors = [user] + rnd.sample(users, min(len(users), rnd.randrange(max_attachments)))
+                attachments = [{
+                    "id": idx + 1,
+                    "author_name": author,
+                    "text": make_commit_text(author, "TIL", rnd.randint(1, 3), rnd),
+                    "color": "24292f",
+                    "mrkdwn_in": ["text"],
+                } for idx, author in enumerate(dict.fromkeys(authors))]
+
+                messages.append({
+                    "ts": ts,
+                    "bot_id": "BNGD110UR",
+                    "type": "message",
+                    "text": "",
+                    "user": "UNR1ZN80N",
+                    "team": "TNMAF3TT2",
+                    "bot_profile": {"id": "BNGD110UR", "name": "GitHub"},
+                    "attachments": attachments,
+                })
+
+    messages.sort(key=lambda message: float(message["ts"]))
+    return users, start_date, messages
+
+
+class RecordingSlackClient:
+    """send_no_show_message 측정용. 보내지 않고 기록만"""
+
+    def __init__(self):
+        self.sent = []
+
+    def chat_postMessage(self, **kwargs):
+        self.sent.append(kwargs)
+
+
+def install_season(users, start_date, days, schema):
+    """합성 시즌 유저/날짜로 설정을 바꿔서 view 와 Garden 이 같은 설정을 보게 함"""
+    config = replace(
+        garden_config.get_config(),
+        pg_schema=schema,
+        users=tuple(users),
+        users_with_slackname=MappingProxyType({user: {"slack": user} for user in users}),
+        start_date=start_date,
+        gardening_days=str(days),
+    )
+    garden_config._config = config
+    garden = garden_config.get_garden()
+    garden.slack_client = RecordingSlackClient()
+    return garden
+
+
+def load_season(garden, messages, batch_size=1000):
+    """스키마를 새로 만들고 수집할 때처럼 ts 순서로 저장. @return 걸린 시간(초)"""
+    if garden.storage_backend == "sqlite":
+        return load_season_sqlite(garden, messages, batch_size)
+
+    conn = garden.connect_postgres()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {garden.pg_schema} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {garden.pg_schema}")
+        apply_schema(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+        garden.release_postgres(conn)
+
+    started = time.perf_counter()
+    for idx in range(0, len(messages), batch_size):
+        garden.save_slack_messages(messages[idx:idx + batch_size])
+
+    conn = garden.connect_postgres()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("ANALYZE")
+        conn.commit()
+    finally:
+        cursor.close()
+        garden.release_postgres(conn)
+    return time.perf_counter() - started
+
+
+def load_season_sqlite(garden, messages, batch_size):
+    """STORAGE_BACKEND=sqlite 일때. PostgreSQL 없이 SQLite 파일(또는 메모리)에 저장"""
+    garden.remove_all_slack_messages()
+
+    started = time.perf_counter()
+    for idx in range(0, len(messages), batch_size):
+        garden.save_slack_messages(messages[idx:idx + batch_size])
+    garden.storage.connect().execute("ANALYZE")
+    return time.perf_counter() - started
+
+
+def clear_caches():
+    cache.clear()
+    render_slack_markdown.cache_clear()
+
+
+def measure(fn, repeat):
+    """@return {"p50", "p95", "mean", "peak_kb"} (ms)"""
+    timings = []
+    for _ in range(repeat):
+        clear_caches()
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    clear_caches()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "p50": round(timings[len(timings) // 2], 3),
+        "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "mean": round(statistics.mean(timings), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_scale(args, members, days):
+    users, start_date, messages = make_season(members, days, args.commits_per_day, args.max_attachments,
+                                              args.late_night, args.attend_rate, args.seed)
+    garden = install_season(users, start_date, days, args.schema)
+    load_seconds = load_season(garden, messages)
+
+    rnd = random.Random(args.seed)
+    client = Client(HTTP_HOST="localhost")
+    season_dates = [start_date + timedelta(days=n) for n in range(days)]
+
+    def check(response):
+        assert response.status_code == 200, response.status_code
+        response.getvalue()
+
+    cases = {
+        "find_attendance_by_user": lambda: garden.find_attendance_by_user(rnd.choice(users)),
+        "get_attendance": lambda: garden.get_attendance(rnd.choice(season_dates)),
+        "gets": lambda: check(client.get("/attendance/api/gets")),
+        "user_api": lambda: check(client.get(f"/attendance/api/users/{rnd.choice(users)}/")),
+        "send_no_show_message": garden.send_no_show_message,
+    }
+
+    results = {}
+    for name, fn in cases.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(fn, args.repeat)
+
+    return {
+        "members": members,
+        "days": days,
+        "messages": len(messages),
+        "load_seconds": round(load_seconds, 3),
+        "results": results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_scale(scale, baseline=None):
+    print(f"\n{scale['members']} members x {scale['days']} days: {scale['messages']} messages"
+          f" (loaded in {scale['load_seconds']}s)")
+    print(f"{'':<24}{'p50 ms':>10}{'p95 ms':>10}{'peak KB':>12}")
+    for name, result in scale["results"].items():
+        line = f"{name:<24}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['peak_kb']:>12.1f}"
+        before = (baseline or {}).get(name)
+        if before and before["p50"]:
+            line += f"   p50 {(result['p50'] / before['p50'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=["20x30", "100x100"], help="유저수x일수")
+    parser.add_argument("--commits-per-day", type=float, default=2.0)
+    parser.add_argument("--max-attachments", type=int, default=2)
+    parser.add_argument("--late-night", type=float, default=0.15, help="00~04시 커밋 비율")
+    parser.add_argument("--attend-rate", type=float, default=0.8)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=85)
+    parser.add_argument("--schema", default="garden5_bench", help="매번 지우고 새로 만드는 스키마")
+    parser.add_argument("--only", nargs="*", help="측정할 함수 이름들")
+    parser.add_argument("--compare", help="비교할 이전 결과 json")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    config = garden_config.get_config()
+    if config.storage_backend != "sqlite" and args.schema == config.pg_schema:
+        parser.error(f"--schema {args.schema} is the configured schema. use a separate schema for benchmarks")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            for scale in json.load(f)["scales"]:
+                baseline[(scale["members"], scale["days"])] = scale["results"]
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "options": vars(args),
+        "scales": [],
+    }
+    for spec in args.scales:
+        members, days = (int(value) for value in spec.split("x"))
+        scale = run_scale(args, members, days)
+        report["scales"].append(scale)
+        print_scale(scale, baseline.get((members, days)))
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nsaved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+동기(WSGI 경로) vs 비동기(ASGI 경로) API 부하 테스트
+같은 uvicorn 서버에서 /attendance/... 와 /attendance/async/... 를 동시 요청으로 두드려서
+처리량(req/s)과 응답시간 p50/p95 를 비교
+두 경로 모두 cached_api 를 거치므로, 기본은 요청마다 다른 쿼리 파라미터를 붙여서 둘 다 캐시를 쓰지 않고 비교.
+--cached 이면 같은 URL 을 반복해서 둘 다 캐시된 응답으로 비교
+
+e.g.)
+uvicorn garden5.asgi:application --port 8000
+python benchmarks/load_test.py --base http://localhost:8000 --concurrency 50 --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+# (이름, 동기 경로, 비동기 경로)
+ENDPOINTS = [
+    ("gets", "/attendance/api/gets", "/attendance/async/api/gets"),
+    ("get", "/attendance/get/{date}", "/attendance/async/get/{date}"),
+    ("user_api", "/attendance/api/users/{user}/", "/attendance/async/api/users/{user}/"),
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def request_urls(url, total, cached):
+    """cached 가 아니면 응답 캐시 키가 매번 달라지도록 요청 번호를 붙임"""
+    if cached:
+        return [url] * total
+    separator = "&" if "?" in url else "?"
+    return [f"{url}{separator}_={time.monotonic_ns()}-{idx}" for idx in range(total)]
+
+
+async def run(session, urls, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return elapsed, latencies, errors
+
+
+def report(name, elapsed, latencies, errors):
+    print(f"{name:<20} {len(latencies) / elapsed:>9.1f} req/s"
+          f"  p50 {percentile(latencies, 50) * 1000:>8.1f}ms"
+          f"  p95 {percentile(latencies, 95) * 1000:>8.1f}ms"
+          f"  mean {statistics.mean(latencies) * 1000:>8.1f}ms"
+          f"  errors {errors}")
+
+
+async def main(args):
+    # 조건부 요청 헤더 없이, 커넥션 수는 동시 요청 수 만큼
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(args.base, connector=connector) as session:
+        for name, sync_path, async_path in ENDPOINTS:
+            if args.only and name not in args.only:
+                continue
+            for kind, path in (("sync", sync_path), ("async", async_path)):
+                url = path.format(date=args.date, user=args.user)
+                # 워밍업. 커넥션 풀 생성 등
+                await run(session, request_urls(url, 1, args.cached), 1)
+                elapsed, latencies, errors = await run(session, request_urls(url, args.requests, args.cached),
+                                                       args.concurrency)
+                report(f"{name} {kind}", elapsed, latencies, errors)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--date", default="20200302", help="get/<date> 에 쓸 날짜")
+    parser.add_argument("--user", default="junho85", help="api/users/<user>/ 에 쓸 유저")
+    parser.add_argument("--only", nargs="*", help="gets get user_api 중 일부만")
+    parser.add_argument("--cached", action="store_true", help="같은 URL 을 반복해서 캐시된 응답으로 비교")
+    asyncio.run(main(parser.parse_args()))
@@ -41,6 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'attendance.metrics.TimingMiddleware',
+    # 응답 압축. 캐시된 API 응답은 http_cache 에서 미리 압축해둔 것을 사용
+    'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +86,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# 출석부 API 응답 캐시. 데이터 버전별로 저장하므로 수집하면 자동으로 새 응답을 만듦
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'garden5',
+    }
+}
+
+ATTENDANCE_CACHE_TIMEOUT = 60 * 60
+
+# 요청 시간 측정 비율 (0 ~ 1). Server-Timing 헤더와 /attendance/metrics
+ATTENDANCE_METRICS_SAMPLE_RATE = 1.0
+
+# Slack 이벤트 저장, 수집 작업을 백그라운드 대신 요청 안에서 실행 (테스트용)
+ATTENDANCE_RUN_JOBS_INLINE = False
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 